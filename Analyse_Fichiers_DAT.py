@@ -6,14 +6,2658 @@ from tkinter import font as tkfont
 from tkinterdnd2 import DND_FILES, TkinterDnD
 import csv
 import os
+import mmap
+import bisect
+import itertools
 import re
+import ast
+import keyword
+import string
+import json
+import math
+import hashlib
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
 from tkinter import simpledialog
 
 try:
     import pandas as pd
 except ImportError:
     pd = None
-    
+
+# =================================================================================
+# STOCKAGE DES LIGNES : IDENTIFIANTS STABLES
+# =================================================================================
+class RowStore:
+    """
+    Lignes d'une table, utilisables comme une liste (index, itération, append, insert, del...).
+    Chaque ligne porte un identifiant stable (rid) qui survit aux insertions et suppressions :
+    il sert d'iid dans le Treeview et de clé pour l'annulation et les surlignages.
+    Stockage par blocs de lignes (au plus 2 x BLOCK_SIZE) : une insertion au milieu ne décale
+    que son bloc, l'accès par position se fait par recherche dichotomique sur les débuts de blocs.
+    Les colonnes normalisées (folded) servent au filtre, à la recherche et au tri : elles sont
+    construites à la demande, tenues à jour cellule par cellule (cell_changed) et oubliées à
+    chaque changement de structure.
+    column_version(col) change à chaque modification de la colonne ou de la structure (numéros
+    uniques entre toutes les tables : un snapshot d'annulation n'en réutilise jamais).
+    Les colonnes numériques (numbers) suivent la même règle : tableaux de doubles, NaN pour
+    une cellule vide ou non numérique (tri et filtres par plage des colonnes typées du schéma).
+    """
+    BLOCK_SIZE = 1024
+    _versions = itertools.count(1)
+
+    def __init__(self, rows=(), ids=None):
+        rows = list(rows)
+        ids = list(range(len(rows))) if ids is None else list(ids)
+        self._next_id = max(ids, default=-1) + 1
+        self._build(rows, ids)
+
+    def _build(self, rows, ids):
+        """(Re)découpe des listes plates en blocs."""
+        size = self.BLOCK_SIZE
+        self._blocks = [(rows[i:i + size], ids[i:i + size]) for i in range(0, len(rows), size)]
+        self._len = len(rows)
+        self._reindex(0)
+        self._where = None # {rid: bloc}, reconstruit à la demande
+
+    def _reindex(self, start_block):
+        """Recalcule les positions de début de bloc à partir de start_block (O(nombre de blocs))."""
+        if start_block == 0:
+            self._starts = []
+            offset = 0
+        else:
+            del self._starts[start_block:]
+            rows, _ = self._blocks[start_block - 1]
+            offset = self._starts[-1] + len(rows)
+        for rows, _ in self._blocks[start_block:]:
+            self._starts.append(offset)
+            offset += len(rows)
+        self._block_pos = {id(block): b for b, block in enumerate(self._blocks)}
+        self._folded = {} # Positions décalées : colonnes normalisées à reconstruire
+        self._numbers = {}
+        self._version = next(RowStore._versions)
+        self._col_versions = {}
+
+    def _locate(self, pos):
+        """(n° de bloc, position dans le bloc) d'une position globale."""
+        if pos < 0:
+            pos += self._len
+        if not 0 <= pos < self._len:
+            raise IndexError("RowStore index out of range")
+        b = bisect.bisect_right(self._starts, pos) - 1
+        return b, pos - self._starts[b]
+
+    def _flat(self):
+        rows, ids = [], []
+        for block_rows, block_ids in self._blocks:
+            rows.extend(block_rows)
+            ids.extend(block_ids)
+        return rows, ids
+
+    # --- API liste ---
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(rows for rows, _ in self._blocks)
+
+    def __reversed__(self):
+        return itertools.chain.from_iterable(reversed(rows) for rows, _ in reversed(self._blocks))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._flat()[0][i]
+        b, j = self._locate(i)
+        return self._blocks[b][0][j]
+
+    def __setitem__(self, i, row):
+        if isinstance(i, slice):
+            raise TypeError("Affectation par tranche non supportée : utiliser insert_rows / delete_positions")
+        b, j = self._locate(i)
+        self._blocks[b][0][j] = row # Même ligne (même rid), nouveau contenu
+        self.row_changed(i)
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            self.delete_positions(range(self._len)[i])
+            return
+        b, j = self._locate(i)
+        rows, ids = self._blocks[b]
+        del rows[j]
+        rid = ids.pop(j)
+        self._len -= 1
+        if self._where is not None:
+            self._where.pop(rid, None)
+        if not rows:
+            del self._blocks[b]
+        self._reindex(b)
+
+    def append(self, row):
+        """Ajoute une ligne en fin de table et retourne son rid."""
+        return self.insert_rows(self._len, [row])[0]
+
+    def extend(self, rows):
+        return self.insert_rows(self._len, rows)
+
+    def insert(self, pos, row):
+        return self.insert_rows(pos, [row])[0]
+
+    def pop(self, i=-1):
+        row = self[i]
+        del self[i]
+        return row
+
+    def copy(self):
+        """Copie profonde (snapshot d'annulation) qui conserve les rid."""
+        rows, ids = self._flat()
+        clone = RowStore([row[:] for row in rows], ids)
+        clone._next_id = self._next_id
+        return clone
+
+    # --- Identifiants stables ---
+    def rids(self):
+        """rid de toutes les lignes, dans l'ordre des positions."""
+        return self._flat()[1]
+
+    def rid(self, pos):
+        b, j = self._locate(pos)
+        return self._blocks[b][1][j]
+
+    def position(self, rid):
+        """Position actuelle d'une ligne, None si elle a été supprimée."""
+        if self._where is None:
+            self._where = {}
+            for block in self._blocks:
+                for r in block[1]:
+                    self._where[r] = block
+        block = self._where.get(rid)
+        if block is None:
+            return None
+        b = self._block_pos[id(block)]
+        return self._starts[b] + block[1].index(rid)
+
+    def insert_rows(self, pos, rows):
+        """Insère un bloc de lignes (seul le bloc touché est décalé) ; retourne leurs rid."""
+        rows = list(rows)
+        if not rows:
+            return []
+        ids = list(range(self._next_id, self._next_id + len(rows)))
+        self._next_id += len(rows)
+        pos = max(0, min(pos, self._len))
+        # Ajout en fin de table : les colonnes normalisées restent valables, on les prolonge
+        folded = self._folded if pos == self._len else {}
+        if not self._blocks:
+            self._build(rows, ids)
+            return ids
+        if pos == self._len:
+            b = len(self._blocks) - 1
+            j = len(self._blocks[b][0])
+        else:
+            b, j = self._locate(pos)
+        block_rows, block_ids = self._blocks[b]
+        block_rows[j:j] = rows
+        block_ids[j:j] = ids
+        self._len += len(rows)
+        if self._where is not None:
+            for rid in ids:
+                self._where[rid] = self._blocks[b]
+        if len(block_rows) > 2 * self.BLOCK_SIZE:
+            # Bloc trop gros : redécoupage local
+            size = self.BLOCK_SIZE
+            pieces = [(block_rows[k:k + size], block_ids[k:k + size]) for k in range(0, len(block_rows), size)]
+            self._blocks[b:b + 1] = pieces
+            if self._where is not None:
+                for piece in pieces:
+                    for rid in piece[1]:
+                        self._where[rid] = piece
+        self._reindex(b)
+        for col, cache in folded.items():
+            cache.extend(self.fold(row[col]) if col < len(row) else "" for row in rows)
+        self._folded = folded
+        return ids
+
+    def delete_positions(self, positions):
+        """
+        Supprime les lignes indiquées en une seule passe de compactage.
+        Retourne [(position, rid, ligne)] trié, à passer à restore_rows pour annuler.
+        """
+        order = sorted(set(positions))
+        if not order:
+            return []
+        all_rows, all_ids = self._flat()
+        removed = [(p, all_ids[p], all_rows[p]) for p in order]
+        rows, ids = [], []
+        prev = 0
+        for p in order: # On recopie les tranches conservées entre deux suppressions
+            rows.extend(all_rows[prev:p])
+            ids.extend(all_ids[prev:p])
+            prev = p + 1
+        rows.extend(all_rows[prev:])
+        ids.extend(all_ids[prev:])
+        self._build(rows, ids)
+        return removed
+
+    def delete_ids(self, rids):
+        positions = (self.position(rid) for rid in rids)
+        return self.delete_positions(p for p in positions if p is not None)
+
+    def restore_rows(self, removed):
+        """Réinsère (une passe) des lignes supprimées à leurs positions et avec leurs rid d'origine."""
+        cur_rows, cur_ids = self._flat()
+        rows, ids = [], []
+        it = 0
+        for pos, rid, row in sorted(removed, key=lambda r: r[0]):
+            take = max(0, pos - len(rows))
+            rows.extend(cur_rows[it:it + take])
+            ids.extend(cur_ids[it:it + take])
+            it += take
+            rows.append(row)
+            ids.append(rid)
+        rows.extend(cur_rows[it:])
+        ids.extend(cur_ids[it:])
+        self._build(rows, ids)
+
+    # --- Colonnes normalisées (minuscules, sans espaces) ---
+    @staticmethod
+    def fold(value):
+        return "" if value is None else str(value).strip().lower()
+
+    def folded(self, col):
+        """Valeurs normalisées de la colonne col, alignées sur les positions (construites au 1er accès)."""
+        cache = self._folded.get(col)
+        if cache is None:
+            fold = self.fold
+            cache = [fold(row[col]) if col < len(row) else "" for row in self]
+            self._folded[col] = cache
+        return cache
+
+    NAN = float("nan")
+
+    @staticmethod
+    def number(value):
+        """Valeur numérique d'une cellule (virgule décimale admise), NaN si vide ou non numérique."""
+        try:
+            return float(str(value).strip().replace(",", "."))
+        except ValueError:
+            return RowStore.NAN
+
+    def numbers(self, col):
+        """Valeurs numériques de la colonne col (array de doubles), alignées sur les positions."""
+        cache = self._numbers.get(col)
+        if cache is None:
+            number = self.number
+            cache = array("d", [number(row[col]) if col < len(row) else self.NAN for row in self])
+            self._numbers[col] = cache
+        return cache
+
+    def cell_changed(self, pos, col):
+        """À appeler après l'édition d'une cellule pour garder sa valeur normalisée à jour."""
+        self._col_versions[col] = next(RowStore._versions)
+        cache = self._folded.get(col)
+        if cache is not None:
+            row = self[pos]
+            cache[pos] = self.fold(row[col]) if col < len(row) else ""
+        cache = self._numbers.get(col)
+        if cache is not None:
+            row = self[pos]
+            cache[pos] = self.number(row[col]) if col < len(row) else self.NAN
+
+    def row_changed(self, pos):
+        """Idem pour toutes les cellules d'une ligne (contenu remplacé en bloc)."""
+        self._version = next(RowStore._versions)
+        if not self._folded and not self._numbers:
+            return
+        row = self[pos]
+        for col, cache in self._folded.items():
+            cache[pos] = self.fold(row[col]) if col < len(row) else ""
+        for col, cache in self._numbers.items():
+            cache[pos] = self.number(row[col]) if col < len(row) else self.NAN
+
+    def invalidate_folded(self):
+        """Oublie les colonnes normalisées (modifications en masse non suivies cellule par cellule)."""
+        self._folded = {}
+        self._numbers = {}
+        self._version = next(RowStore._versions)
+
+    def column_version(self, col):
+        """Identifiant du contenu de la colonne : change dès qu'une de ses cellules peut avoir changé."""
+        return (self._version, self._col_versions.get(col, 0))
+
+class SelectionModel:
+    """
+    Sélection logique des lignes, par rid : indépendante de la fenêtre de lignes réellement
+    insérées dans le Treeview. Le Treeview ne fait que refléter la partie visible de la
+    sélection ; copier, supprimer, propager ou exporter travaillent sur la sélection logique.
+    """
+    # En dessous de ce nombre de lignes, on retrouve les positions rid par rid
+    DIRECT_LOOKUP = 64
+
+    def __init__(self):
+        self.rids = set()
+        self.anchor = None # rid de départ pour Maj+clic
+
+    def __len__(self):
+        return len(self.rids)
+
+    def __contains__(self, rid):
+        return rid in self.rids
+
+    def clear(self):
+        self.rids = set()
+        self.anchor = None
+
+    def replace(self, rids):
+        self.rids = set(rids)
+        if self.anchor not in self.rids:
+            self.anchor = next(iter(self.rids), None)
+
+    def sync_visible(self, visible_rids, selected_rids, additive=False):
+        """Reprend la sélection faite à la souris dans le Treeview (lignes affichées uniquement)."""
+        if additive:
+            self.rids = (self.rids - set(visible_rids)) | set(selected_rids)
+        else:
+            self.rids = set(selected_rids)
+
+    def select_all(self, data, positions):
+        self.rids = {data.rid(p) for p in positions}
+
+    def select_range(self, data, positions, rid):
+        """Sélectionne, dans l'ordre d'affichage, tout ce qui va de l'ancre jusqu'à rid."""
+        order = [data.rid(p) for p in positions]
+        try:
+            a, b = order.index(self.anchor), order.index(rid)
+        except ValueError:
+            self.rids = {rid}
+            self.anchor = rid
+            return
+        if a > b:
+            a, b = b, a
+        self.rids = set(order[a:b + 1])
+
+    def invert(self, data, positions):
+        """Inverse la sélection parmi les lignes données (les lignes filtrées)."""
+        in_view = {data.rid(p) for p in positions}
+        self.rids = in_view - self.rids
+        if self.anchor not in self.rids:
+            self.anchor = None
+
+    def positions(self, data, order):
+        """Positions sélectionnées parmi order (liste de positions), dans cet ordre."""
+        if not self.rids:
+            return []
+        if len(self.rids) <= self.DIRECT_LOOKUP:
+            wanted = {data.position(rid) for rid in self.rids}
+            return [p for p in order if p in wanted]
+        rids = self.rids
+        return [p for p in order if data.rid(p) in rids]
+
+# =================================================================================
+# INDEX DE HACHAGE : Nom -> lignes, Tagname -> ligne
+# =================================================================================
+class TableIndex:
+    """
+    Index maintenus sur le tableau principal (Nom -> index de lignes, Tagname -> index de ligne).
+    Les éditions de cellules sont répercutées immédiatement ; après une modification de
+    structure (insertion, suppression, snapshot d'undo), l'index est simplement marqué
+    invalide et reconstruit au prochain accès.
+    """
+    def __init__(self, get_data, get_headers):
+        # On passe par des accesseurs car self.data est réassigné (chargement, undo...)
+        self.get_data = get_data
+        self.get_headers = get_headers
+        self.name_col = None
+        self.tag_col = None
+        self.by_name = {}
+        self.by_tag = {}
+        self._dirty = True
+        self._sorted_names = None
+
+    def invalidate(self):
+        """À appeler après toute modification de structure (ou changement de headers)."""
+        self._dirty = True
+        self._sorted_names = None
+
+    def _ensure(self):
+        if not self._dirty:
+            return
+        self.name_col = None
+        self.tag_col = None
+        for i, h in enumerate(self.get_headers()):
+            h_low = str(h).strip().lower()
+            if h_low == "nom" and self.name_col is None:
+                self.name_col = i
+            elif h_low == "tagname" and self.tag_col is None:
+                self.tag_col = i
+
+        by_name = {}
+        by_tag = {}
+        name_col, tag_col = self.name_col, self.tag_col
+        for r_idx, row in enumerate(self.get_data()):
+            if name_col is not None and name_col < len(row):
+                key = str(row[name_col]).strip()
+                if key:
+                    by_name.setdefault(key, set()).add(r_idx)
+            if tag_col is not None and tag_col < len(row):
+                key = str(row[tag_col]).strip()
+                if key:
+                    by_tag.setdefault(key, set()).add(r_idx)
+        self.by_name = by_name
+        self.by_tag = by_tag
+        self._dirty = False
+
+    @staticmethod
+    def _move(mapping, row_idx, old, new):
+        old = str(old).strip() if old is not None else ""
+        new = str(new).strip() if new is not None else ""
+        if old == new:
+            return
+        if old and old in mapping:
+            mapping[old].discard(row_idx)
+            if not mapping[old]:
+                del mapping[old]
+        if new:
+            mapping.setdefault(new, set()).add(row_idx)
+
+    def cell_changed(self, row_idx, col_idx, old, new):
+        """Mise à jour incrémentale après l'édition d'une cellule."""
+        if self._dirty:
+            return # Sera reconstruit au prochain accès
+        if col_idx == self.name_col:
+            self._move(self.by_name, row_idx, old, new)
+            self._sorted_names = None
+        elif col_idx == self.tag_col:
+            self._move(self.by_tag, row_idx, old, new)
+
+    def row_appended(self, row_idx, row):
+        """Ajout en fin de tableau : pas besoin de reconstruire."""
+        if self._dirty:
+            return
+        if self.name_col is not None and self.name_col < len(row):
+            self._move(self.by_name, row_idx, "", row[self.name_col])
+            self._sorted_names = None
+        if self.tag_col is not None and self.tag_col < len(row):
+            self._move(self.by_tag, row_idx, "", row[self.tag_col])
+
+    def rows_for_name(self, name):
+        self._ensure()
+        return self.by_name.get(str(name).strip(), set())
+
+    def row_for_tagname(self, tagname):
+        """Renvoie l'index de la (première) ligne portant ce Tagname, ou None."""
+        self._ensure()
+        rows = self.by_tag.get(str(tagname).strip())
+        return min(rows) if rows else None
+
+    def has_name(self, name):
+        return bool(self.rows_for_name(name))
+
+    def max_tagname(self):
+        """Plus grand Tagname numérique de la table (0 si aucun)."""
+        self._ensure()
+        return max((int(tag) for tag in self.by_tag if tag.isdigit()), default=0)
+
+    def names(self):
+        """Liste triée des Noms (mise en cache jusqu'à la prochaine modification)."""
+        self._ensure()
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.by_name)
+        return self._sorted_names
+
+    def rows_matching(self, col_idx, predicate):
+        """
+        Lignes dont la clé indexée vérifie predicate (on teste chaque valeur distincte une seule fois).
+        Renvoie None si col_idx n'est ni la colonne Nom ni la colonne Tagname.
+        """
+        self._ensure()
+        if col_idx is None:
+            return None
+        if col_idx == self.name_col:
+            mapping = self.by_name
+        elif col_idx == self.tag_col:
+            mapping = self.by_tag
+        else:
+            return None
+        rows = set()
+        for key, idxs in mapping.items():
+            if predicate(key):
+                rows.update(idxs)
+        return rows
+
+def find_duplicates(rows, key_indices=None, skip=()):
+    """
+    Groupes de lignes en double, en un seul passage : {clé: [positions]} (au moins deux positions).
+    key_indices : colonnes formant la clé (valeurs sans espaces autour, clé entièrement vide ignorée) ;
+    None : ligne entière. Les positions de skip (ligne de titres) ne sont pas comptées.
+    """
+    if key_indices is None:
+        keys = map(tuple, rows)
+    else:
+        columns = [[str(row[i]).strip() if i < len(row) else "" for row in rows] for i in key_indices]
+        keys = zip(*columns)
+    seen = {}
+    groups = {}
+    for pos, key in enumerate(keys):
+        first = seen.setdefault(key, pos)
+        if first != pos:
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [first, pos]
+            else:
+                group.append(pos)
+    if key_indices is not None:
+        groups.pop(("",) * len(key_indices), None)
+    if skip:
+        skip = set(skip)
+        groups = {key: kept for key, kept in ((k, [p for p in g if p not in skip]) for k, g in groups.items()) if len(kept) > 1}
+    return groups
+
+class ValueDictionary:
+    """
+    Dictionnaires de valeurs par colonne : valeur (sans espaces autour) -> ensemble de rid.
+    Construit au premier accès à une colonne, tenu à jour à chaque édition de cellule et à chaque
+    ajout en fin de table ; un autre changement de structure l'invalide (reconstruit à la demande),
+    comme TableIndex.
+    Un filtre « Class dans {ALA, ACM} » est l'union de deux listes de rid, sans parcours du tableau.
+    """
+    def __init__(self, get_data):
+        self.get_data = get_data
+        self._columns = {}
+        self._positions = None # rid -> position, valable jusqu'au prochain changement de structure
+
+    def invalidate(self):
+        self._columns = {}
+        self._positions = None
+
+    @staticmethod
+    def key(value):
+        return "" if value is None else str(value).strip()
+
+    def postings(self, col):
+        mapping = self._columns.get(col)
+        if mapping is None:
+            data = self.get_data()
+            key = self.key
+            mapping = {}
+            for row, rid in zip(data, data.rids()):
+                mapping.setdefault(key(row[col]) if col < len(row) else "", set()).add(rid)
+            self._columns[col] = mapping
+        return mapping
+
+    def counts(self, col):
+        """Valeurs distinctes de la colonne et leur nombre de lignes."""
+        return {value: len(rids) for value, rids in self.postings(col).items()}
+
+    def cell_changed(self, rid, col, old, new):
+        mapping = self._columns.get(col)
+        if mapping is None:
+            return
+        old, new = self.key(old), self.key(new)
+        if old == new:
+            return
+        rids = mapping.get(old)
+        if rids is not None:
+            rids.discard(rid)
+            if not rids:
+                del mapping[old]
+        mapping.setdefault(new, set()).add(rid)
+
+    def row_appended(self, rid, row):
+        """Ajout en fin de table : les colonnes déjà construites sont prolongées."""
+        key = self.key
+        for col, mapping in self._columns.items():
+            mapping.setdefault(key(row[col]) if col < len(row) else "", set()).add(rid)
+        if self._positions is not None:
+            self._positions[rid] = len(self._positions)
+
+    def positions(self, col, values):
+        """Positions des lignes dont la valeur de col est dans values (union des listes de rid)."""
+        mapping = self.postings(col)
+        if self._positions is None:
+            self._positions = {rid: pos for pos, rid in enumerate(self.get_data().rids())}
+        where = self._positions
+        result = set()
+        for value in values:
+            result.update(where[rid] for rid in mapping.get(value, ()))
+        return result
+
+class ReplaceEngine:
+    """
+    Rechercher / Remplacer compilé une seule fois, limité éventuellement à certaines colonnes.
+    scan() calcule toutes les modifications sans toucher aux données (comptage + aperçu) ;
+    l'appelant les applique ensuite en une seule entrée d'annulation et un seul rafraîchissement.
+    """
+    PREVIEW_LIMIT = 200
+
+    def __init__(self, search, replace="", regex=False, whole_word=False, case_sensitive=False):
+        self.search = search
+        self.regex = regex
+        pattern = search if regex else re.escape(search)
+        if whole_word:
+            pattern = rf"\b(?:{pattern})\b"
+        # Un motif regex invalide lève re.error : à l'appelant de l'afficher
+        self.pattern = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+        # Recherche texte simple insensible à la casse : on peut lire les colonnes normalisées
+        plain = not (regex or whole_word or case_sensitive) and search == search.strip()
+        self.needle = search.lower() if plain else None
+        # En mode texte, le remplacement est littéral (pas d'interprétation des \1, \n...)
+        self._repl = replace if regex else (lambda m: replace)
+
+    def matches(self, value):
+        return self.pattern.search(str(value)) is not None
+
+    def sub(self, value):
+        """Renvoie (nouvelle valeur, nombre d'occurrences remplacées)."""
+        return self.pattern.subn(self._repl, str(value))
+
+    def row_matches(self, data, pos, cols):
+        """Vrai si une des colonnes cols de la ligne pos correspond."""
+        if self.needle is not None and isinstance(data, RowStore):
+            needle = self.needle
+            return any(needle in data.folded(c)[pos] for c in cols)
+        row = data[pos]
+        return any(self.pattern.search(str(row[c])) for c in cols if c < len(row))
+
+    @staticmethod
+    def columns(headers, scope=None):
+        """Index des colonnes ciblées : None (= toutes) si scope est vide."""
+        if not scope:
+            return None
+        if isinstance(scope, str):
+            scope = [scope]
+        return [i for i, h in enumerate(headers) if h in scope]
+
+    def scan(self, data, positions=None, col_indices=None, index=None):
+        """
+        Parcourt les lignes demandées (toutes par défaut) et renvoie (changes, occurrences)
+        avec changes = [(position, col_idx, ancienne valeur, nouvelle valeur)].
+        Si un TableIndex couvre l'unique colonne ciblée, seules les lignes dont la clé
+        correspond sont examinées.
+        """
+        if positions is None:
+            positions = range(len(data))
+        if (index is not None and col_indices is not None and len(col_indices) == 1
+                and not self.regex and self.search == self.search.strip()):
+            candidates = index.rows_matching(col_indices[0], self.pattern.search)
+            if candidates is not None:
+                positions = [p for p in positions if p in candidates]
+
+        changes = []
+        occurrences = 0
+        subn, repl = self.pattern.subn, self._repl
+        needle = self.needle if isinstance(data, RowStore) else None
+        for pos in positions:
+            row = data[pos]
+            cols = range(len(row)) if col_indices is None else col_indices
+            for c in cols:
+                if c >= len(row):
+                    continue
+                if needle is not None and needle not in data.folded(c)[pos]:
+                    continue
+                old = row[c]
+                old_str = str(old)
+                new, n = subn(repl, old_str)
+                if n and new != old_str:
+                    changes.append((pos, c, old, new))
+                    occurrences += n
+        return changes, occurrences
+
+    @staticmethod
+    def preview(changes, headers, limit=PREVIEW_LIMIT):
+        """Lignes lisibles décrivant les premières modifications prévues."""
+        lines = []
+        for pos, c, old, new in changes[:limit]:
+            col = headers[c] if c < len(headers) else f"Col_{c+1}"
+            lines.append(f"Ligne {pos + 1} · {col} : {old} → {new}")
+        if len(changes) > limit:
+            lines.append(f"... et {len(changes) - limit} autres cellules")
+        return lines
+
+# Mots reconnus comme en-tête dans une table de correspondance (ligne ignorée)
+RENAME_HEADER_WORDS = {"ancien", "nouveau", "old", "new", "avant", "après", "apres", "source", "cible"}
+
+def read_sheet_rows(path):
+    """Lignes (listes de textes) d'une feuille CSV (séparateur ; ou ,) ou XLSX, sans interprétation."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xls'):
+        if pd is None:
+            raise RuntimeError("Pandas n'est pas installé.")
+        return pd.read_excel(path, header=None, dtype=str).fillna("").values.tolist()
+    with open(path, 'r', encoding='latin-1', errors='replace') as f:
+        sample = f.read(1024)
+        f.seek(0)
+        delimiter = ',' if ',' in sample and ';' not in sample else ';'
+        return list(csv.reader(f, delimiter=delimiter))
+
+def read_rename_mapping(path):
+    """
+    Lit une table de correspondance à deux colonnes (ancien ; nouveau) en CSV ou XLSX.
+    Une éventuelle ligne d'en-tête est ignorée ; en cas de doublon, la dernière ligne l'emporte.
+    """
+    rows = read_sheet_rows(path)
+
+    mapping = {}
+    for i, row in enumerate(rows):
+        if len(row) < 2:
+            continue
+        old, new = str(row[0]).strip(), str(row[1]).strip()
+        if i == 0 and (old.lower() in RENAME_HEADER_WORDS or new.lower() in RENAME_HEADER_WORDS):
+            continue
+        if old and old != new:
+            mapping[old] = new
+    return mapping
+
+class BulkRenamer:
+    """
+    Renommage en masse à partir d'une table ancien -> nouveau, en une seule passe par cellule.
+    Mode "cell" : la cellule entière (aux espaces près) doit valoir l'ancien nom.
+    Mode "substring" : automate d'Aho-Corasick construit une fois ; en cas de chevauchement,
+    la correspondance la plus à gauche puis la plus longue l'emporte (PMP_10 avant PMP_1).
+    Les remplacements ne s'enchaînent pas (A -> B puis B -> C ne donne pas C).
+    """
+    def __init__(self, mapping, mode="cell"):
+        self.mapping = dict(mapping)
+        self.mode = mode
+        self.hits = dict.fromkeys(self.mapping, 0)
+        if mode == "substring":
+            self._build()
+
+    def _build(self):
+        # goto : transitions, fail : liens d'échec, term : clé se terminant sur le nœud,
+        # link : nœud terminal le plus proche en suivant les liens d'échec
+        goto, fail, term, link = [{}], [0], [None], [0]
+        for key in self.mapping:
+            node = 0
+            for ch in key:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    term.append(None)
+                    link.append(0)
+                    goto[node][ch] = nxt
+                node = nxt
+            term[node] = key
+
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0)
+                target = fail[child]
+                link[child] = target if term[target] is not None else link[target]
+                queue.append(child)
+        self._goto, self._fail, self._term, self._link = goto, fail, term, link
+
+    def _matches(self, text):
+        """Toutes les occurrences (début, -longueur, clé) trouvées en une passe sur text."""
+        goto, fail, term, link = self._goto, self._fail, self._term, self._link
+        node = 0
+        found = []
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            out = node if term[node] is not None else link[node]
+            while out:
+                key = term[out]
+                found.append((i - len(key) + 1, -len(key), key))
+                out = link[out]
+        return found
+
+    def rename(self, value):
+        """Renvoie (nouvelle valeur, clés appliquées)."""
+        text = str(value)
+        if self.mode == "cell":
+            key = text.strip()
+            if key in self.mapping:
+                return self.mapping[key], [key]
+            return text, []
+
+        found = self._matches(text)
+        if not found:
+            return text, []
+        found.sort()
+        parts, used, pos = [], [], 0
+        for start, _, key in found:
+            if start < pos:
+                continue # Chevauche une correspondance déjà retenue
+            parts.append(text[pos:start])
+            parts.append(self.mapping[key])
+            used.append(key)
+            pos = start + len(key)
+        parts.append(text[pos:])
+        return "".join(parts), used
+
+    def scan(self, data, positions=None, col_indices=None):
+        """
+        Même contrat que ReplaceEngine.scan : renvoie (changes, occurrences) sans modifier data.
+        self.hits compte ensuite les remplacements par ancien nom.
+        """
+        self.hits = dict.fromkeys(self.mapping, 0)
+        if positions is None:
+            positions = range(len(data))
+        changes = []
+        occurrences = 0
+        hits = self.hits
+        for pos in positions:
+            row = data[pos]
+            cols = range(len(row)) if col_indices is None else col_indices
+            for c in cols:
+                if c >= len(row):
+                    continue
+                old = row[c]
+                new, used = self.rename(old)
+                if used and new != str(old):
+                    changes.append((pos, c, old, new))
+                    occurrences += len(used)
+                    for key in used:
+                        hits[key] += 1
+        return changes, occurrences
+
+class FillPattern:
+    """
+    Modèle de remplissage d'une colonne, analysé une seule fois :
+      {n} / {n:03d}   compteur : start, start + step, ...
+      {i}             rang dans la série (0, 1, 2...)
+      {Nom}           valeur d'une autre colonne de la même ligne (format possible : {Eqt_Index:04d})
+    Les accolades littérales s'écrivent {{ et }} ; les accès d'attribut ou d'index sont refusés.
+    """
+    def __init__(self, template, headers, start=1, step=1):
+        self.template = template
+        self.start = start
+        self.step = step
+        parts = []
+        # string.Formatter lève ValueError sur une accolade non fermée
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if literal:
+                parts.append((None, literal, ""))
+            if field is None:
+                continue
+            if conversion:
+                raise ValueError(f"Conversion !{conversion} non supportée")
+            if field in ("n", "i"):
+                parts.append((field, None, spec))
+            elif field in headers:
+                parts.append((headers.index(field), None, spec))
+            else:
+                raise ValueError(f"Colonne inconnue : {{{field}}}")
+        self._parts = parts
+
+    @staticmethod
+    def literal(text):
+        """Modèle qui recopie text tel quel."""
+        return str(text).replace("{", "{{").replace("}", "}}")
+
+    @staticmethod
+    def _format(value, spec):
+        if not spec:
+            return str(value)
+        if isinstance(value, str):
+            # Valeur de cellule (texte) avec un format numérique : conversion préalable
+            if spec[-1] in "bcdoxXn":
+                value = int(value.strip() or 0)
+            elif spec[-1] in "eEfFgG%":
+                value = float(value.strip() or 0)
+        return format(value, spec)
+
+    def values(self, data, positions):
+        """Valeurs de la série pour les lignes données (dans cet ordre), en une passe."""
+        parts, fmt = self._parts, self._format
+        if all(key is None for key, _, _ in parts):
+            constant = "".join(literal for _, literal, _ in parts)
+            return [constant] * len(positions)
+        out = []
+        for k, pos in enumerate(positions):
+            row = data[pos]
+            chunks = []
+            for key, literal, spec in parts:
+                if key is None:
+                    chunks.append(literal)
+                elif key == "n":
+                    chunks.append(fmt(self.start + k * self.step, spec))
+                elif key == "i":
+                    chunks.append(fmt(k, spec))
+                else:
+                    try:
+                        chunks.append(fmt(row[key] if key < len(row) else "", spec))
+                    except ValueError as e:
+                        raise ValueError(f"Ligne {pos + 1} : {e}")
+            out.append("".join(chunks))
+        return out
+
+def _to_number(value):
+    """Conversion tolérante d'une cellule en nombre ("" -> 0, virgule décimale acceptée)."""
+    text = str(value).strip().replace(",", ".")
+    if not text:
+        return 0
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+class ColumnExpression:
+    """
+    Colonne calculée : sous-ensemble vérifié de la syntaxe Python, compilé une seule fois.
+      - colonnes par leur nom (Nom, Eqt_Index, n1...) ou col("Nom avec espaces") ;
+      - textes, nombres, + - * / // %, comparaisons, and / or / not, a if condition else b ;
+      - fonctions : num, int, str, upper, lower, strip, len, replace, left, right, pad, join,
+        path(sep) (= join(sep, n1, ..., n11)).
+    Les cellules sont du texte : écrire num(Eqt_Index) + 100 pour calculer.
+    """
+    FUNCTIONS = {
+        "num": _to_number,
+        "int": lambda v: int(_to_number(v)),
+        "str": lambda v: ColumnExpression.text(v),
+        "upper": lambda v: str(v).upper(),
+        "lower": lambda v: str(v).lower(),
+        "strip": lambda v: str(v).strip(),
+        "len": lambda v: len(str(v)),
+        "replace": lambda v, old, new: str(v).replace(str(old), str(new)),
+        "left": lambda v, n: str(v)[:ColumnExpression.width(n)],
+        "right": lambda v, n: str(v)[len(str(v)) - ColumnExpression.width(n):] if ColumnExpression.width(n) > 0 else "",
+        "pad": lambda v, width, fill="0": str(v).rjust(ColumnExpression.width(width), (str(fill) or " ")[0]),
+        "join": lambda sep, *values: str(sep).join(t for t in map(str, values) if t.strip()),
+    }
+    ALLOWED_NODES = (
+        ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+        ast.Constant, ast.Name, ast.Call, ast.Load,
+        ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+        ast.USub, ast.UAdd, ast.Not, ast.And, ast.Or,
+        ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    )
+
+    def __init__(self, text, headers):
+        self.text_source = text
+        self.headers = list(headers)
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Syntaxe invalide : {e.msg}")
+        body = self._rewrite(tree.body)
+
+        # lambda _r: <expression>, compilée une fois puis appelée ligne par ligne
+        wrapper = ast.parse("lambda _r: None", mode="eval")
+        wrapper.body.body = body
+        ast.fix_missing_locations(wrapper)
+        env = {"__builtins__": {}, "_len": len, "_num_op": self._num_op}
+        env.update(self.FUNCTIONS)
+        self._fn = eval(compile(wrapper, "<colonne calculée>", "eval"), env)
+
+    def _column(self, name):
+        if name not in self.headers:
+            raise ValueError(f"Colonne inconnue : {name}")
+        idx = self.headers.index(name)
+        return ast.parse(f"(_r[{idx}] if _len(_r) > {idx} else '')", mode="eval").body
+
+    def _rewrite(self, node):
+        """Vérifie chaque nœud et remplace les noms de colonnes par l'accès à la cellule."""
+        if not isinstance(node, self.ALLOWED_NODES):
+            raise ValueError(f"Construction non autorisée : {type(node).__name__}")
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (str, int, float, bool, type(None))):
+                raise ValueError("Constante non autorisée")
+            return node
+        if isinstance(node, ast.Name):
+            return self._column(node.id)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mult, ast.Mod)):
+            # "x" * 10**9 ou "%999999999d" % 1 : texte géant, refusé à l'exécution
+            op = "*" if isinstance(node.op, ast.Mult) else "%"
+            return ast.Call(func=ast.Name(id="_num_op", ctx=ast.Load()),
+                            args=[ast.Constant(value=op), self._rewrite(node.left), self._rewrite(node.right)],
+                            keywords=[])
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise ValueError("Appel de fonction non autorisé")
+            name = node.func.id
+            args = node.args
+            if name == "col":
+                if len(args) != 1 or not isinstance(args[0], ast.Constant) or not isinstance(args[0].value, str):
+                    raise ValueError('col() attend un nom de colonne entre guillemets : col("Nom")')
+                return self._column(args[0].value)
+            if name == "path":
+                sep = self._rewrite(args[0]) if args else ast.Constant(value="\\")
+                levels = [self._column(self.headers[i]) for i in level_column_indices(self.headers) if i != -1]
+                return ast.Call(func=ast.Name(id="join", ctx=ast.Load()), args=[sep] + levels, keywords=[])
+            if name not in self.FUNCTIONS:
+                raise ValueError(f"Fonction inconnue : {name}")
+            node.args = [self._rewrite(a) for a in args]
+            return node
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                setattr(node, field, [self._rewrite(v) if isinstance(v, ast.AST) else v for v in value])
+            elif isinstance(value, ast.AST):
+                setattr(node, field, self._rewrite(value))
+        return node
+
+    MAX_WIDTH = 1000 # Longueur maximale demandée à pad / left / right
+
+    @staticmethod
+    def width(value):
+        """Longueur passée à pad / left / right : entier borné (sinon #ERR sur la ligne)."""
+        n = int(_to_number(value))
+        if abs(n) > ColumnExpression.MAX_WIDTH:
+            raise ValueError(f"Longueur {n} hors limite (max {ColumnExpression.MAX_WIDTH})")
+        return n
+
+    @staticmethod
+    def _num_op(op, left, right):
+        """* et % réservés aux nombres (pas de répétition ni de formatage de texte)."""
+        if isinstance(left, str) or isinstance(right, str):
+            raise ValueError(f"{op} s'applique aux nombres : écrire num(...) pour une cellule")
+        return left * right if op == "*" else left % right
+
+    @staticmethod
+    def text(value):
+        """Résultat -> texte de cellule (7.0 -> "7", True -> "1", None -> "")."""
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def evaluate(self, data, positions):
+        """
+        Évalue l'expression sur les lignes données, en un lot.
+        Renvoie (valeurs, nombre d'erreurs, (position, exception) de la première erreur).
+        """
+        fn, text = self._fn, self.text
+        values = []
+        errors = 0
+        first_error = None
+        for pos in positions:
+            try:
+                values.append(text(fn(data[pos])))
+            except Exception as e:
+                errors += 1
+                if first_error is None:
+                    first_error = (pos, e)
+                values.append("#ERR")
+        return values, errors, first_error
+
+def column_stats(values, top_n=20, bins=10):
+    """
+    Statistiques d'une colonne (valeurs texte) : nombre de lignes, de cellules vides, de valeurs
+    distinctes, les top_n valeurs les plus fréquentes et, pour les valeurs numériques,
+    min / max / histogramme en bins intervalles égaux.
+    """
+    counts = {}
+    for value in values:
+        key = str(value).strip()
+        counts[key] = counts.get(key, 0) + 1
+    empty = counts.pop("", 0)
+
+    numbers = []
+    for key, count in counts.items():
+        try:
+            number = float(key.replace(",", "."))
+        except ValueError:
+            continue
+        if math.isfinite(number): # "inf", "nan"... restent du texte
+            numbers.append((number, count))
+
+    stats = {
+        "rows": len(values),
+        "empty": empty,
+        "distinct": len(counts),
+        "top": sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:top_n],
+        "numeric": sum(c for _, c in numbers),
+        "min": None, "max": None, "histogram": [],
+    }
+    if numbers:
+        low = min(n for n, _ in numbers)
+        high = max(n for n, _ in numbers)
+        stats["min"], stats["max"] = low, high
+        # Divisions avant soustraction : pas de dépassement entre -1e308 et 1e308
+        width = high / bins - low / bins if high > low else 1
+        if not width > 0: # Écart trop faible (sous-normal)
+            width = 1
+        histogram = [0] * bins
+        for number, count in numbers:
+            k = number / width - low / width
+            histogram[min(bins - 1, max(0, int(k))) if math.isfinite(k) else bins - 1] += count
+        stats["histogram"] = [(low + k * width, low + (k + 1) * width, c) for k, c in enumerate(histogram)]
+    return stats
+
+def read_dat_rows(path, skip_first_line=False):
+    """
+    Lecture brute d'un fichier .DAT (séparateur ',', latin-1).
+    Renvoie (première_ligne ou None, lignes).
+    """
+    first_line = None
+    rows = []
+    with open(path, 'r', encoding='latin-1') as f:
+        reader = csv.reader(f, delimiter=',', quotechar='"')
+        if skip_first_line:
+            try:
+                first_line = next(reader)
+            except StopIteration:
+                first_line = None
+        for row in reader:
+            rows.append(row)
+    return first_line, rows
+
+def detect_dat_headers(rows, schema=None):
+    """
+    Renvoie la ligne de titres d'un .DAT, ou [] : avec un schéma, la ligne (parmi les premières)
+    qui contient le plus de noms de colonnes connus ; sinon la première ligne contenant du texte.
+    """
+    if schema is not None:
+        headers = schema.detect_headers(rows)
+        if headers:
+            return headers
+    for row in rows:
+        if any(any(c.isalpha() for c in cell) for cell in row if isinstance(cell, str)):
+            return row
+    return []
+
+# Noms possibles des colonnes de niveau (chemin n1..n11)
+LEVEL_COLUMN_NAMES = ("n{}", "Chemin n{}", "N{}", "Level {}")
+
+def level_column_indices(headers, depth=11):
+    """Index des colonnes de niveau n1..n11 (variantes de nom comprises), -1 si absente."""
+    indices = []
+    for i in range(1, depth + 1):
+        found = -1
+        for pattern in LEVEL_COLUMN_NAMES:
+            name = pattern.format(i)
+            if name in headers:
+                found = headers.index(name)
+                break
+        indices.append(found)
+    return indices
+
+def row_path(row, level_indices):
+    """Chemin (n1..n11) d'une ligne, niveaux vides en fin retirés."""
+    path = [str(row[idx]).strip() if idx != -1 and idx < len(row) else "" for idx in level_indices]
+    while path and path[-1] == "":
+        path.pop()
+    return path
+
+def branch_positions(data, level_indices, path):
+    """Positions des lignes dont le chemin commence par path."""
+    checks = [(level_indices[k] if k < len(level_indices) else -1, value) for k, value in enumerate(path)]
+    result = []
+    for pos, row in enumerate(data):
+        for idx, value in checks:
+            cell = str(row[idx]).strip() if idx != -1 and idx < len(row) else ""
+            if cell != value:
+                break
+        else:
+            result.append(pos)
+    return result
+
+# =================================================================================
+# SCHÉMAS DES MODULES : TYPES, BORNES, VALEURS ADMISES ET PAR DÉFAUT
+# =================================================================================
+class ColumnSpec:
+    """
+    Colonne déclarée d'un module. kind : "text", "int", "float" ou "enum" (choices = valeurs
+    admises). Les cellules restent du texte : parse / check les interprètent selon le type
+    déclaré ; une cellule vide est toujours admise (colonne non renseignée pour cette classe).
+    """
+    def __init__(self, name, kind="text", minimum=None, maximum=None, choices=None, default="", description=""):
+        self.name = name
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = tuple(choices) if choices is not None else None
+        self.default = default
+        self.description = description
+
+    @property
+    def numeric(self):
+        return self.kind in ("int", "float")
+
+    def parse(self, value):
+        """Valeur typée de la cellule, None si elle est vide ; ValueError si elle est invalide."""
+        text = "" if value is None else str(value).strip()
+        if text == "":
+            return None
+        if self.kind == "int":
+            return int(text)
+        if self.kind == "float":
+            return float(text.replace(",", "."))
+        return text
+
+    def check(self, value):
+        """Message d'anomalie pour la valeur de la cellule, ou None si elle est conforme."""
+        try:
+            typed = self.parse(value)
+        except ValueError:
+            return "entier attendu" if self.kind == "int" else "nombre attendu"
+        if typed is None:
+            return None
+        if self.choices is not None and typed not in self.choices:
+            return f"valeur '{typed}' hors de ({', '.join(map(str, self.choices))})"
+        if self.minimum is not None and typed < self.minimum or self.maximum is not None and typed > self.maximum:
+            low = "" if self.minimum is None else self.minimum
+            high = "" if self.maximum is None else self.maximum
+            return f"valeur {typed} hors de [{low} ; {high}]"
+        return None
+
+class ModuleSchema:
+    """
+    Colonnes connues d'un module (ColumnSpec par nom). Sert au tri numérique, aux filtres par plage,
+    à la détection de la ligne de titres et à la validation ; une colonne absente du schéma reste
+    traitée comme du texte.
+    """
+    HEADER_SCAN_ROWS = 20
+    HEADER_MIN_MATCHES = 3
+
+    def __init__(self, key, columns, names=()):
+        self.key = key
+        self.columns = {spec.name: spec for spec in columns}
+        self.names = set(self.columns) | set(names) # Noms reconnus dans une ligne de titres
+
+    def spec(self, name):
+        return self.columns.get(name)
+
+    def numeric(self, name):
+        spec = self.columns.get(name)
+        return spec is not None and spec.numeric
+
+    def descriptions(self):
+        return {name: spec.description for name, spec in self.columns.items() if spec.description}
+
+    def detect_headers(self, rows):
+        """Ligne (parmi les HEADER_SCAN_ROWS premières) portant le plus de noms connus, ou []."""
+        best, best_count = [], self.HEADER_MIN_MATCHES - 1
+        names = self.names
+        for row in itertools.islice(rows, self.HEADER_SCAN_ROWS):
+            count = sum(1 for cell in row if isinstance(cell, str) and cell.strip() in names)
+            if count > best_count:
+                best, best_count = row, count
+        return best
+
+def parse_range_filter(text):
+    """
+    Filtre numérique "10..20", ">5", ">=5", "<5", "<=5" ou "=5" -> fonction(nombre) -> bool,
+    None si le texte n'est pas une plage (filtre texte habituel). NaN (cellule vide) ne passe jamais.
+    """
+    text = text.strip().replace(",", ".")
+    try:
+        if ".." in text:
+            low, high = text.split("..", 1)
+            low = float(low) if low.strip() else float("-inf")
+            high = float(high) if high.strip() else float("inf")
+            return lambda v: low <= v <= high
+        for op, test in ((">=", lambda v, x: v >= x), ("<=", lambda v, x: v <= x),
+                         (">", lambda v, x: v > x), ("<", lambda v, x: v < x), ("=", lambda v, x: v == x)):
+            if text.startswith(op):
+                bound = float(text[len(op):])
+                return lambda v: test(v, bound)
+    except ValueError:
+        return None
+    return None
+
+# Descriptions des colonnes du varexp (aide de la fenêtre de création de variable)
+VAREXP_COLUMN_DESCRIPTIONS = {
+    "Description": "Description de la variable",
+    "Inhibited": "Variable inhibée (I ou vide)",
+    "Simulated": "Variable simulée (S ou vide)",
+    "Saved": "Variable sauvegardée (P ou vide)",
+    "Broadcast": "Accès distant (0 ou 1)",
+    "PermanentScan" : "Scrutation permanente pour synoptique (tous postes = 0, poste serveur = 2, aucun = 1)",
+    "Recorder": "Variable magnétorisée (1 ou 0)",
+    "Log0_1": "Variable consignée de 0 vers 1 (1 ou 0)",
+    "Log1_0": "Variable consignée de 1 vers 0 (1 ou 0)",
+    "WithInitialValue": "Variable avec valeur initiale (1 ou 0)",
+    "InitialValue": "Valeur initiale (float)",
+    "ServerListName": "Nom de la liste serveur",
+    "ClientListName": "Nom de la liste client",
+    "Source": "Source de la variable (Interne = I, OPCUA = U, SNMP = S, Equipement = E, ...)",
+    "BrowsingLevel": "Niveau de recherche (entre 0 et 29)",
+    "AlarmAcknowledgmentLevel": "Niveau d'acquittement (entre 0 et 29)",
+    "AlarmMaskLevel": "Niveau de masquage (entre 0 et 29)",
+    "AlarmMaintenanceLevel": "Niveau de prise en compte (entre 0 et 29)",
+    "Eqt_NetworkName": "Nom du réseau",
+    "Eqt_EqtName": "Nom de l'équipement",
+    "Eqt_FrameName": "Nom de la trame",
+    "Eqt_Type": "Type de la trame (bit = B, mot = M, I, U)",
+    "Eqt_Index": "Offset octet",
+    "Eqt_IndexComp": "Offset bit",
+    "Eqt_SizeBit": "Taille de la varible en bit (1 si B, 32 si M, 16 si I ou U)",
+    "ExtBinary": "Enable les attributs étendus (0 ou vide)",
+    "AlarmLevel": "Priorité (entre 0 et 29)",
+    "AlarmActiveAt1": "Déclenchement Positive ou Négative (1 ou 0)",
+    "AlarmTemporization": "Temporisation en secondes des alarmes (int)",
+    "Unit": "Unité de la mesure",
+    "MinimumValue": "Valeur min",
+    "MaximumValue": "Valeur max",
+    "Format": "Format du rendu de la mesure",
+    "ControlMinimumValue": "Valeur minimale de commande de registre",
+    "ControlMaximumValue": "Valeur maximale de commande de registre",
+    "RegisterCommandLevel": "Niveau de commande de registre",
+    "Counter_StepSize": "Valeur de pas (int)",
+    "Counter_Type": "Type de compteur : Décrémental ou Incrémental (0 ou 1)",
+    "Counter_CountBitName": "Variable état associé (nom)",
+    "Counter_CountBitTransition": "Enclenchement de l'état associé (à 0 ou à 1)",
+    "Counter_ResetBitName": "Variable bit d'initialisation (nom)",
+    "Counter_ResetBitTransition": "Enclenchement du bit d'initialisation (à 0 ou à 1)",
+    "Chrono_Period": "Période d'incrémentation du chrono (100 = 1 sec, 6000 = 1 min, ...)",
+    "Chrono_Type": "Type du chrono (1)",
+    "Chrono_EnableBitName": "Variable de déclenchement (nom)",
+    "Chrono_EnableBitTransition": "Enclenchement du chrono sur la variable de déclenchement à 1 ou 0 (1 ou 0)",
+    "Chrono_ResetBitName": "Variable d'initialisation (nom)",
+    "Chrono_ResetBitTransition": "Initialisation du chrono sur la variable d'initialisation à 1 ou 0 (1 ou 0)",
+    "ThresholdHysterisis": "Hysteresis (float)",
+    "ThresholdValue": "Valeur de seuil (float)",
+    "ThresholdHigh": "Seuil haut (1 ou 0)",
+    "ThresholdSource": "Variable reliée au seuil",
+    "ThresholdSystem": "Type de seuil (ppphaut|pphaut|phaut|haut = 0, pphaut|phaut|haut|bas = 1, phaut|haut|bas|pbas = 2, haut|bas|pbas|ppbas = 3 sinon 4)",
+    "ThresholdTypeInSystem": "Type de variable seuil (de 0 à 3 du seuil le plus haut à celui le plus bas)",
+    "TextSize": "Taille maximum de la chaîne de caractère en octets (int)",
+    "TextCommandLevel": "Niveau de commande (entre 0 et 29)",
+    "OPCUA_NetworkName": "Nom du réseau OPCUA",
+    "OPCUA_ClientName": "Nom du client OPCUA",
+    "OPCUA_MonitoringName": "Nom groupe de scrutation",
+    "OPCUA_Identifier": "Identificateur de la variable sur le serveur OPCUA",
+    "SNMP_NetworkName": "Nom du réseau SNMP",
+    "SNMP_DeviceName": "Nom de l'équipement",
+    "SNMP_ScanGroupName": "Nom du groupe de scrutation",
+    "SNMP_DataType": "Type de données SNMP",
+    "SNMP_OID": "OID SNMP",
+    "SNMP_DisableReading": "Désactivation lecture (0 ou 1)",
+    "SNMP_WithInitialValue": "SNMP avec valeur initiale (0 ou 1)",
+    "SNMP_InitialValue": "Valeur Initiale (int ou vide)",
+    "SNMP_RemoveNoPrintableCharacters": "Suppression des caractère spéciaux (0 ou 1)",
+}
+
+def _varexp_schema():
+    """Colonnes typées du varexp ; les niveaux de masquage / prise en compte / acquittement
+    admettent -1 et -2 (valeurs des modèles de VAREXP_TEMPLATES)."""
+    level = lambda name, low=0: ColumnSpec(name, "int", low, 29, default="0")
+    flag = lambda name, default="0": ColumnSpec(name, "int", choices=(0, 1), default=default)
+    integer = lambda name, low=0, high=None, default="": ColumnSpec(name, "int", low, high, default=default)
+    number = lambda name, default="": ColumnSpec(name, "float", default=default)
+    columns = [
+        ColumnSpec("Class", "enum", choices=("CMD", "BIT", "ACM", "ALA", "REG", "CTV", "TXT", "CXT", "CHR")),
+        integer("Tagname", 1),
+        ColumnSpec("Inhibited", "enum", choices=("I",)),
+        ColumnSpec("Simulated", "enum", choices=("S",)),
+        ColumnSpec("Saved", "enum", choices=("P",)),
+        ColumnSpec("PermanentScan", "int", choices=(0, 1, 2), default="2"),
+        ColumnSpec("Eqt_Type", "enum", choices=("B", "M", "I", "U")),
+        ColumnSpec("Eqt_SizeBit", "int", choices=(1, 16, 32)),
+        integer("Eqt_Index"), integer("Eqt_IndexComp"),
+        level("BrowsingLevel"), level("AlarmLevel"), level("TextCommandLevel"),
+        level("BitCommandLevel"), level("RegisterCommandLevel"),
+        level("AlarmAcknowledgmentLevel", -2), level("AlarmMaskLevel", -2), level("AlarmMaintenanceLevel", -2),
+        integer("AlarmTemporization", default="0"), integer("Chrono_Period", 1, default="100"),
+        integer("Counter_StepSize"), integer("TextSize", 1, default="132"), integer("Textsize", 1, default="132"),
+        integer("ThresholdSystem", 0, 4), integer("ThresholdTypeInSystem", 0, 3),
+        integer("StationOrAssociationNumber", default="0"), integer("DeadbandType", default="0"),
+        number("InitialValue"), number("MinimumValue"), number("MaximumValue"), number("ScaledValue"),
+        number("DeviceMinimumValue"), number("DeviceMaximumValue"), number("ControlMinimumValue"),
+        number("ControlMaximumValue"), number("DeadbandValue"), number("ThresholdValue"),
+        number("ThresholdHysterisis"), number("SNMP_InitialValue"),
+    ] + [flag(name) for name in (
+        "Broadcast", "Recorder", "Log0_1", "Log1_0", "WithInitialValue", "AlarmActiveAt1", "ExtBinary",
+        "UseExtendedAttributes", "Counter_Type", "Counter_CountBitTransition", "Counter_ResetBitTransition",
+        "Chrono_EnableBitTransition", "Chrono_ResetBitTransition", "ThresholdHigh", "SNMP_DisableReading",
+        "SNMP_WithInitialValue", "SNMP_RemoveNoPrintableCharacters", "MessageAlarm")]
+    for spec in columns:
+        spec.description = VAREXP_COLUMN_DESCRIPTIONS.get(spec.name, "")
+    columns += [ColumnSpec(name, description=text) for name, text in VAREXP_COLUMN_DESCRIPTIONS.items()
+                if name not in {spec.name for spec in columns}]
+    names = ["Nom", "Source", "Description", "DescriptionAlt", "Domain", "Nature", "Unit", "Format"]
+    names += [f"n{i}" for i in range(1, 12)]
+    return ModuleSchema("varexp", columns, names)
+
+# Schéma de chaque module (les titres des modules autres que le varexp sont imposés par DatEditor)
+MODULE_SCHEMAS = {
+    "varexp": _varexp_schema(),
+    "comm": ModuleSchema("comm", [
+        ColumnSpec("Quantité", "int", 0), ColumnSpec("Numéro de DB", "int", 0),
+    ]),
+    "event": ModuleSchema("event", [
+        ColumnSpec("Activation bit (0 = 1>0 ou 1 = 0>1 ou 2 = expression)", "int", choices=(0, 1, 2)),
+    ]),
+    "exprv": ModuleSchema("exprv", []),
+    "cyclic": ModuleSchema("cyclic", [
+        ColumnSpec("Nombre de secondes de cycle", "int", 1),
+        ColumnSpec("1 si activation ou bit d'activation 0 sinon", "int", choices=(0, 1)),
+    ]),
+    "vartreat": ModuleSchema("vartreat", [
+        ColumnSpec("Filtre de branche (1 ou 0)", "int", choices=(0, 1)),
+        ColumnSpec("Niveau d'alarme min", "int", 0, 29),
+        ColumnSpec("Niveau d'alarme max", "int", 0, 29),
+    ]),
+}
+
+# =================================================================================
+# CONTRÔLE DU VAREXP : RÈGLES DÉRIVÉES DU SCHÉMA ET DES MODÈLES DE CLASSE
+# =================================================================================
+# Noms de variable et éléments de chemin admis (création de variable, contrôle du varexp)
+VAREXP_NAME_RE = re.compile(r'^[A-Za-z0-9_]+$')
+
+class VarexpLinter:
+    """
+    Règles de contrôle des lignes du varexp : types / bornes / valeurs admises du schéma,
+    champs propres à une classe (colonnes renseignées par le modèle de la classe et présentes
+    dans au plus la moitié des modèles : Chrono_Period pour CHR, AlarmLevel pour ALA...),
+    Eqt_SizeBit cohérent avec Eqt_Type, listes serveur / client renseignées, syntaxe des noms.
+    check_table travaille colonne par colonne (chaque valeur distincte n'est vérifiée qu'une
+    fois) ; check_row donne le même résultat pour une seule ligne (revalidation après édition).
+    Résultat : {position: {colonne: message}}, comme DatEditor.cell_issues.
+    """
+    SIZE_BITS = {"B": "1", "M": "32", "I": "16", "U": "16"}
+    REQUIRED_LISTS = ("ServerListName", "ClientListName")
+    NAME_COLUMNS = ("Nom",) + tuple(f"n{i}" for i in range(1, 12))
+
+    def __init__(self, schema, templates):
+        self.schema = schema
+        share = {}
+        for template in templates.values():
+            for col in template:
+                share[col] = share.get(col, 0) + 1
+        self.required = {
+            cls: [col for col, value in template.items() if value != "" and share[col] * 2 <= len(templates)]
+            for cls, template in templates.items()
+        }
+
+    def check_row(self, headers, row):
+        return self.check_table(headers, [row]).get(0, {})
+
+    def check_table(self, headers, data):
+        issues = {}
+        positions = {h: i for i, h in enumerate(headers)}
+        columns = {}
+        # Ligne de titres (gardée dans les lignes du varexp) : jamais contrôlée
+        title_rows = [pos for pos, row in enumerate(data) if row is headers or row == headers]
+
+        def add(pos, col, message):
+            issues.setdefault(pos, {}).setdefault(col, message)
+
+        def column(name):
+            values = columns.get(name)
+            if values is None and name in positions:
+                i = positions[name]
+                values = [str(row[i]).strip() if i < len(row) else "" for row in data]
+                for pos in title_rows:
+                    values[pos] = ""
+                columns[name] = values
+            return values
+
+        # Types, bornes, valeurs admises (une vérification par valeur distincte)
+        for name, spec in self.schema.columns.items():
+            if spec.kind == "text" or name not in positions:
+                continue
+            seen = {}
+            for pos, value in enumerate(column(name)):
+                if value:
+                    message = seen[value] if value in seen else seen.setdefault(value, spec.check(value))
+                    if message:
+                        add(pos, name, message)
+
+        # Syntaxe du Nom et des éléments de chemin
+        for name in self.NAME_COLUMNS:
+            values = column(name)
+            if values is None:
+                continue
+            for pos, value in enumerate(values):
+                if value and not VAREXP_NAME_RE.match(value):
+                    add(pos, name, "seuls les lettres, chiffres et '_' sont autorisés")
+
+        # Taille en bits imposée par le type de trame
+        types, sizes = column("Eqt_Type"), column("Eqt_SizeBit")
+        if types is not None and sizes is not None:
+            for pos, (eqt_type, size) in enumerate(zip(types, sizes)):
+                expected = self.SIZE_BITS.get(eqt_type)
+                if expected and size and size != expected:
+                    add(pos, "Eqt_SizeBit", f"{expected} attendu pour Eqt_Type = {eqt_type}")
+
+        # Listes serveur / client obligatoires
+        for name in self.REQUIRED_LISTS:
+            values = column(name)
+            if values is None:
+                continue
+            for pos, value in enumerate(values):
+                if not value and pos not in title_rows:
+                    add(pos, name, "liste obligatoire non renseignée")
+
+        # Champs propres à la classe
+        classes = column("Class")
+        if classes is not None:
+            by_class = {}
+            for pos, cls in enumerate(classes):
+                by_class.setdefault(cls, []).append(pos)
+            for cls, class_positions in by_class.items():
+                for name in self.required.get(cls, ()):
+                    values = column(name)
+                    if values is None:
+                        continue
+                    for pos in class_positions:
+                        if not values[pos]:
+                            add(pos, name, f"obligatoire pour la classe {cls}")
+        return issues
+
+# =================================================================================
+# PARSEUR D'EXPRESSIONS(Exprv / Event / Vartreat) AVEC CACHE D'AST
+# =================================================================================
+class ExpressionParser:
+    """
+    Tokenizer + parseur (précédence d'opérateurs) pour les colonnes "Expression".
+    Les résultats sont mis en cache par texte d'expression : une même expression,
+    répétée sur des centaines de lignes, n'est analysée qu'une seule fois.
+    AST : tuples ('num', v) / ('str', v) / ('var', nom) / ('call', nom, [args])
+          / ('unary', op, x) / ('binary', op, g, d).
+    """
+    TOKEN_RE = re.compile(r"""
+        (?P<ws>\s+)
+      | (?P<num>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+      | (?P<str>"[^"]*"|'[^']*')
+      | (?P<name>[A-Za-z_][A-Za-z0-9_.]*)
+      | (?P<op>==|!=|<>|<=|>=|&&|\|\||<<|>>|\*\*|[-+*/%<>=!&|^~])
+      | (?P<lpar>\()
+      | (?P<rpar>\))
+      | (?P<comma>,)
+      | (?P<bad>.)
+    """, re.VERBOSE)
+
+    WORD_OPERATORS = {"AND", "OR", "XOR", "NOT", "MOD"}
+    BINARY_PRECEDENCE = {
+        "OR": 1, "||": 1, "|": 1,
+        "XOR": 2, "^": 2,
+        "AND": 3, "&&": 3, "&": 3,
+        "==": 4, "=": 4, "!=": 4, "<>": 4, "<": 4, ">": 4, "<=": 4, ">=": 4,
+        "<<": 5, ">>": 5,
+        "+": 6, "-": 6,
+        "*": 7, "/": 7, "%": 7, "MOD": 7,
+        "**": 8
+    }
+    UNARY_OPERATORS = {"NOT", "!", "~", "-", "+"}
+    CACHE_LIMIT = 100000
+
+    class ParseError(Exception):
+        pass
+
+    def __init__(self):
+        self._cache = {}
+        self.lock = threading.Lock()
+
+    def tokenize(self, text):
+        """Liste de (type, valeur, position). Lève ParseError sur un caractère inconnu."""
+        tokens = []
+        for m in self.TOKEN_RE.finditer(text):
+            kind = m.lastgroup
+            value = m.group()
+            if kind == "ws":
+                continue
+            if kind == "bad":
+                raise self.ParseError(f"Opérateur ou caractère inconnu '{value}' (position {m.start() + 1})")
+            if kind == "name" and value.upper() in self.WORD_OPERATORS:
+                kind, value = "op", value.upper()
+            tokens.append((kind, value, m.start()))
+        return tokens
+
+    def parse(self, text):
+        """
+        Renvoie (ast, variables, erreur) pour un texte d'expression.
+        variables : tuple des noms de variables référencés ; erreur : message ou None.
+        """
+        text = str(text)
+        result = self._cache.get(text)
+        if result is not None:
+            return result
+
+        try:
+            tokens = self.tokenize(text)
+            if not tokens:
+                raise self.ParseError("Expression vide")
+
+            # Équilibrage des parenthèses (hors chaînes) avant l'analyse proprement dite
+            depth = 0
+            for kind, _, where in tokens:
+                if kind == "lpar":
+                    depth += 1
+                elif kind == "rpar":
+                    depth -= 1
+                    if depth < 0:
+                        raise self.ParseError(f"Parenthèse fermante sans ouvrante (position {where + 1})")
+            if depth > 0:
+                raise self.ParseError(f"Parenthèses non équilibrées ({depth} non fermée(s))")
+            variables = []
+            pos, ast = self._parse_expr(tokens, 0, 0, variables)
+            if pos < len(tokens):
+                raise self.ParseError(f"Élément inattendu '{tokens[pos][1]}' (position {tokens[pos][2] + 1})")
+            result = (ast, tuple(dict.fromkeys(variables)), None)
+        except self.ParseError as e:
+            result = (None, (), str(e))
+
+        with self.lock:
+            if len(self._cache) >= self.CACHE_LIMIT:
+                self._cache.clear()
+            self._cache[text] = result
+        return result
+
+    def _parse_expr(self, tokens, pos, min_prec, variables):
+        pos, left = self._parse_unary(tokens, pos, variables)
+        while pos < len(tokens):
+            kind, value, _ = tokens[pos]
+            prec = self.BINARY_PRECEDENCE.get(value) if kind == "op" else None
+            if prec is None or prec < min_prec:
+                break
+            # '**' est associatif à droite, les autres à gauche
+            next_min = prec if value == "**" else prec + 1
+            pos, right = self._parse_expr(tokens, pos + 1, next_min, variables)
+            left = ("binary", value, left, right)
+        return pos, left
+
+    def _parse_unary(self, tokens, pos, variables):
+        if pos >= len(tokens):
+            raise self.ParseError("Expression incomplète (opérande manquant en fin d'expression)")
+        kind, value, where = tokens[pos]
+        if kind == "op":
+            if value in self.UNARY_OPERATORS:
+                pos, operand = self._parse_unary(tokens, pos + 1, variables)
+                return pos, ("unary", value, operand)
+            raise self.ParseError(f"Opérateur '{value}' inattendu (position {where + 1})")
+        return self._parse_primary(tokens, pos, variables)
+
+    def _parse_primary(self, tokens, pos, variables):
+        kind, value, where = tokens[pos]
+        if kind == "num":
+            return pos + 1, ("num", value)
+        if kind == "str":
+            return pos + 1, ("str", value[1:-1])
+        if kind == "lpar":
+            pos, inner = self._parse_expr(tokens, pos + 1, 0, variables)
+            if pos >= len(tokens) or tokens[pos][0] != "rpar":
+                raise self.ParseError(f"Parenthèse fermante attendue (position {where + 1})")
+            return pos + 1, inner
+        if kind == "name":
+            # Appel de fonction : NOM( args )
+            if pos + 1 < len(tokens) and tokens[pos + 1][0] == "lpar":
+                args = []
+                pos += 2
+                if pos < len(tokens) and tokens[pos][0] == "rpar":
+                    return pos + 1, ("call", value, args)
+                while True:
+                    pos, arg = self._parse_expr(tokens, pos, 0, variables)
+                    args.append(arg)
+                    if pos < len(tokens) and tokens[pos][0] == "comma":
+                        pos += 1
+                        continue
+                    if pos < len(tokens) and tokens[pos][0] == "rpar":
+                        return pos + 1, ("call", value, args)
+                    raise self.ParseError(f"',' ou ')' attendu dans l'appel de '{value}'")
+            variables.append(value)
+            return pos + 1, ("var", value)
+        raise self.ParseError(f"Élément inattendu '{value}' (position {where + 1})")
+
+    def validate(self, text, known_names):
+        """
+        Liste des messages d'erreur pour une expression (syntaxe + variables inconnues).
+        Sans noms connus (varexp.dat absent), seule la syntaxe est vérifiée.
+        """
+        if not str(text).strip():
+            return []
+        _, variables, error = self.parse(text)
+        if error:
+            return [error]
+        if not known_names:
+            return []
+        unknown = [v for v in variables if v not in known_names]
+        if unknown:
+            return [f"Variable(s) inconnue(s) : {', '.join(unknown)}"]
+        return []
+
+    def validate_tables(self, tables, known_names, columns):
+        """
+        Validation en lot : tables = {module: (headers, lignes)}, columns = {module: [colonnes]}.
+        Renvoie [(module, ligne, colonne, expression, message)].
+        """
+        issues = []
+        verdicts = {} # Texte -> messages (les expressions identiques ne sont vérifiées qu'une fois)
+        for key, (headers, rows) in tables.items():
+            targets = [(headers.index(c), c) for c in columns.get(key, []) if c in headers]
+            for r_idx, row in enumerate(rows):
+                for c_idx, c_name in targets:
+                    if c_idx >= len(row):
+                        continue
+                    text = row[c_idx]
+                    if not text or not text.strip():
+                        continue
+                    messages = verdicts.get(text)
+                    if messages is None:
+                        messages = verdicts[text] = self.validate(text, known_names)
+                    for msg in messages:
+                        issues.append((key, r_idx, c_name, text, msg))
+        return issues
+
+# =================================================================================
+# INDEX DE RÉFÉRENCES CROISÉES (OÙ EST UTILISÉE UNE VARIABLE ?)
+# =================================================================================
+class ReferenceIndex:
+    """
+    Index projet : nom de variable -> [(module, ligne, colonne)] construit en découpant
+    en jetons les colonnes qui référencent des variables dans event / exprv / cyclic / vartreat.
+    L'index est mis en cache sur disque (JSON) et rafraîchi fichier par fichier :
+    seuls les fichiers dont la date ou la taille a changé sont relus.
+    """
+    # Un nom de variable : lettres, chiffres, '_' et '.' comme séparateur de branche
+    TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*")
+    CACHE_VERSION = 1
+
+    def __init__(self, modules):
+        # modules : {clé module: (nom de fichier, headers, [colonnes à indexer])}
+        self.modules = modules
+        self.folder = None
+        self.files = {}      # clé module -> {"mtime", "size", "refs": {jeton: [[ligne, colonne], ...]}}
+        self.overlays = {}   # clé module -> refs calculées sur les données en mémoire (non enregistrées)
+        self.by_token = {}
+        self.by_leaf = {}
+        self.lock = threading.Lock()
+
+    # ---------- Cache disque ----------
+    def _cache_path(self):
+        digest = hashlib.md5(os.path.abspath(self.folder).lower().encode("utf-8")).hexdigest()
+        return os.path.join(os.path.expanduser("~"), ".analyseur_dat", f"refs_{digest}.json")
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_path(), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") == self.CACHE_VERSION:
+                return payload.get("files", {})
+        except Exception:
+            pass
+        return {}
+
+    def _save_cache(self):
+        try:
+            path = self._cache_path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.CACHE_VERSION, "folder": self.folder, "files": self.files}, f)
+        except Exception as e:
+            print(f"Cache des références non enregistré : {e}")
+
+    # ---------- Construction ----------
+    @classmethod
+    def tokenize_rows(cls, rows, headers, columns):
+        """Découpe les colonnes à indexer en jetons : {jeton: [[ligne, colonne], ...]}."""
+        targets = [(headers.index(c), c) for c in columns if c in headers]
+        refs = {}
+        find_tokens = cls.TOKEN_RE.findall
+        for r_idx, row in enumerate(rows):
+            for c_idx, c_name in targets:
+                if c_idx >= len(row) or not row[c_idx]:
+                    continue
+                for token in set(find_tokens(str(row[c_idx]))):
+                    refs.setdefault(token.strip("."), []).append([r_idx, c_name])
+        return refs
+
+    def set_folder(self, folder):
+        """Change de projet : recharge le cache disque correspondant."""
+        with self.lock:
+            if folder == self.folder:
+                return
+            self.folder = folder
+            self.files = self._load_cache() if folder else {}
+            self.overlays = {}
+            self._merge()
+
+    def refresh(self):
+        """Relit uniquement les fichiers modifiés depuis la dernière indexation."""
+        if not self.folder:
+            return 0
+        changed = 0
+        with self.lock:
+            for key, (filename, headers, columns) in self.modules.items():
+                path = os.path.join(self.folder, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    if key in self.files:
+                        del self.files[key]
+                        changed += 1
+                    continue
+                entry = self.files.get(key)
+                if entry and entry.get("mtime") == st.st_mtime and entry.get("size") == st.st_size:
+                    continue
+                try:
+                    _, rows = read_dat_rows(path)
+                except Exception as e:
+                    print(f"Indexation impossible de {path} : {e}")
+                    continue
+                self.files[key] = {"mtime": st.st_mtime, "size": st.st_size,
+                                   "refs": self.tokenize_rows(rows, headers, columns)}
+                changed += 1
+            if changed:
+                self._merge()
+                self._save_cache()
+        return changed
+
+    def set_overlay(self, key, rows, headers):
+        """Indexe les données en mémoire d'un module (modifications non enregistrées)."""
+        if key not in self.modules:
+            return
+        with self.lock:
+            self.overlays[key] = self.tokenize_rows(rows, headers, self.modules[key][2])
+            self._merge()
+
+    def clear_overlay(self, key):
+        with self.lock:
+            if self.overlays.pop(key, None) is not None:
+                self._merge()
+
+    def _merge(self):
+        by_token = {}
+        for key in self.modules:
+            refs = self.overlays.get(key)
+            if refs is None:
+                refs = self.files.get(key, {}).get("refs", {})
+            for token, hits in refs.items():
+                lst = by_token.setdefault(token, [])
+                lst.extend((key, r_idx, c_name) for r_idx, c_name in hits)
+        by_leaf = {}
+        for token in by_token:
+            if "." in token:
+                by_leaf.setdefault(token.rsplit(".", 1)[1], []).append(token)
+        self.by_token = by_token
+        self.by_leaf = by_leaf
+
+    # ---------- Requête ----------
+    def where_used(self, names):
+        """
+        Renvoie les références [(module, ligne, colonne, jeton)] aux noms donnés.
+        Un nom simple (sans '.') correspond aussi aux noms complets qui se terminent par lui.
+        """
+        results = set()
+        with self.lock:
+            for name in names:
+                name = str(name).strip()
+                if not name:
+                    continue
+                tokens = [name]
+                if "." not in name:
+                    tokens += self.by_leaf.get(name, [])
+                for token in tokens:
+                    for key, r_idx, c_name in self.by_token.get(token, []):
+                        results.add((key, r_idx, c_name, token))
+        order = list(self.modules)
+        return sorted(results, key=lambda r: (order.index(r[0]), r[1], r[2]))
+
+# =================================================================================
+# FUSION À TROIS VOIES (CHANGEMENTS EXTERNES SUR DISQUE)
+# =================================================================================
+def key_column_index(headers, name):
+    """Index de la colonne (insensible à la casse), -1 si absente."""
+    for i, h in enumerate(headers):
+        if str(h).lower() == name.lower():
+            return i
+    return -1
+
+def row_keys(rows, key_idx):
+    """
+    Clé stable de chaque ligne : (valeur de la colonne clé, rang d'occurrence).
+    Sans colonne clé (key_idx = -1), la ligne entière sert de clé.
+    """
+    seen = {}
+    keys = []
+    for row in rows:
+        value = row[key_idx].strip() if 0 <= key_idx < len(row) else tuple(row)
+        n = seen.get(value, 0)
+        seen[value] = n + 1
+        keys.append((value, n))
+    return keys
+
+def keyed_row_hashes(rows, key_idx):
+    """{clé de ligne: hash du contenu} : photo d'un fichier servant de base à la fusion."""
+    return {key: hash(tuple(row)) for key, row in zip(row_keys(rows, key_idx), rows)}
+
+def merge_external_changes(base, local_rows, remote_rows, key_idx):
+    """
+    Fusion à trois voies, ligne par ligne (clé + hash) :
+    base = photo du fichier au chargement, local_rows = table en mémoire (modifiée en place),
+    remote_rows = nouveau contenu du fichier.
+    Une ligne changée sur disque et intacte en mémoire est reprise ; changée des deux côtés,
+    la version locale est gardée et signalée en conflit.
+    local_rows est un RowStore (les lignes conservées gardent leur rid).
+    Retourne (mapping ancienne position -> nouvelle ou -1, {position: ligne disque ou None}, stats).
+    """
+    stats = {"updated": 0, "added": 0, "deleted": 0, "conflicts": 0}
+    local_keys = row_keys(local_rows, key_idx)
+    local_pos = {key: i for i, key in enumerate(local_keys)}
+    remote = dict(zip(row_keys(remote_rows, key_idx), remote_rows))
+
+    conflicts = {}
+    appended = []
+    for key, row in remote.items():
+        remote_hash = hash(tuple(row))
+        base_hash = base.get(key)
+        if remote_hash == base_hash:
+            continue # Inchangée sur disque
+        pos = local_pos.get(key)
+        if pos is None:
+            # Nouvelle sur disque (ou supprimée ici mais modifiée sur disque : reprise et signalée)
+            appended.append((list(row), base_hash is not None))
+            continue
+        local_hash = hash(tuple(local_rows[pos]))
+        if local_hash == remote_hash:
+            continue
+        if local_hash == base_hash:
+            local_rows[pos][:] = row
+            local_rows.row_changed(pos)
+            stats["updated"] += 1
+        else:
+            conflicts[pos] = row
+
+    deleted = set()
+    for key, base_hash in base.items():
+        if key in remote:
+            continue
+        pos = local_pos.get(key)
+        if pos is None:
+            continue
+        if hash(tuple(local_rows[pos])) == base_hash:
+            deleted.add(pos)
+        else:
+            conflicts[pos] = None # Supprimée sur disque, modifiée ici
+
+    mapping = []
+    kept = 0
+    for i in range(len(local_rows)):
+        if i in deleted:
+            mapping.append(-1)
+        else:
+            mapping.append(kept)
+            kept += 1
+    conflicts = {mapping[pos]: row for pos, row in conflicts.items()}
+    local_rows.delete_positions(deleted)
+    for row, is_conflict in appended:
+        if is_conflict:
+            conflicts[len(local_rows)] = row
+        local_rows.append(row)
+
+    stats["deleted"] = len(deleted)
+    stats["added"] = len(appended)
+    stats["conflicts"] = len(conflicts)
+    return mapping, conflicts, stats
+
+# Clés de jointure proposées pour l'import avec fusion
+UPSERT_KEYS = ("Nom", "Tagname", "Chemin complet")
+
+def upsert_key_function(headers, key):
+    """Fonction ligne -> clé de jointure (None si vide) ; None si la table n'a pas la colonne clé."""
+    if key == "Chemin complet":
+        levels = level_column_indices(headers)
+        if all(idx == -1 for idx in levels):
+            return None
+        return lambda row: tuple(row_path(row, levels)) or None
+    idx = key_column_index(headers, key)
+    if idx == -1:
+        return None
+    return lambda row: (str(row[idx]).strip() if idx < len(row) else "") or None
+
+def plan_upsert(headers, rows, incoming_headers, incoming_rows, key):
+    """
+    Import avec fusion : jointure par hachage des lignes importées sur la clé choisie.
+    Seules les colonnes présentes dans le fichier (titres identiques, casse ignorée) sont mises à jour,
+    y compris avec une valeur vide ; une clé inconnue donne une nouvelle ligne. Une clé répétée
+    dans le fichier : la dernière ligne l'emporte ; répétée dans la table : ligne ignorée (ambiguë).
+    Deux passages linéaires, rien n'est modifié : retourne le plan (changements, nouvelles lignes
+    sous forme {index de colonne: valeur}, positions absentes du fichier, compteurs).
+    """
+    local_key = upsert_key_function(headers, key)
+    incoming_key = upsert_key_function(incoming_headers, key)
+    if local_key is None or incoming_key is None:
+        raise ValueError(f"Colonne clé '{key}' absente de la table ou du fichier importé")
+
+    by_title = {}
+    for i, h in enumerate(headers):
+        by_title.setdefault(str(h).strip().lower(), i)
+    columns, ignored = [], []
+    for j, title in enumerate(incoming_headers):
+        i = by_title.get(str(title).strip().lower())
+        if i is None:
+            ignored.append(str(title))
+        else:
+            columns.append((j, i))
+
+    where, ambiguous = {}, set()
+    for pos, row in enumerate(rows):
+        if row == headers:
+            continue # Ligne de titres du varexp
+        k = local_key(row)
+        if k is None:
+            continue
+        if k in where:
+            ambiguous.add(k)
+        else:
+            where[k] = pos
+
+    latest, order, repeated = {}, [], 0
+    for row in incoming_rows:
+        k = incoming_key(row)
+        if k is None:
+            continue
+        if k in latest:
+            repeated += 1
+        else:
+            order.append(k)
+        latest[k] = row
+
+    changes, new_rows, matched = [], [], set()
+    updated = skipped = 0
+    for k in order:
+        row = latest[k]
+        values = [(i, str(row[j]).strip() if j < len(row) else "") for j, i in columns]
+        if k in ambiguous:
+            skipped += 1
+            continue
+        pos = where.get(k)
+        if pos is None:
+            new_rows.append(dict(values))
+            continue
+        matched.add(pos)
+        local = rows[pos]
+        changed = False
+        for i, new in values:
+            old = local[i] if i < len(local) else ""
+            if str(old).strip() != new: # Espaces autour de la valeur locale : pas un changement
+                changes.append((pos, i, old, new))
+                changed = True
+        updated += changed
+
+    return {
+        "changes": changes,
+        "new_rows": new_rows,
+        "missing": sorted(pos for k, pos in where.items() if pos not in matched and k not in ambiguous),
+        "matched": len(matched),
+        "updated": updated,
+        "ambiguous": skipped,
+        "repeated": repeated,
+        "ignored": ignored,
+    }
+
+# =================================================================================
+# COMPARAISON DE TEXTE : DIFF PAR LIGNES (PATIENCE + MYERS)
+# =================================================================================
+# Au-delà de ce coût d'édition (lignes ajoutées + supprimées), une zone sans ligne unique
+# commune est traitée comme un bloc remplacé : temps et mémoire de Myers bornés (O(D²))
+MYERS_MAX_EDITS = 1000
+
+def _myers_pairs(a, b, a_lo, a_hi, b_lo, b_hi, max_edits=MYERS_MAX_EDITS):
+    """
+    Paires (i, j) de lignes communes (plus courte édition, algorithme de Myers) sur deux plages ;
+    [] si la plus courte édition dépasse max_edits. Seule la tranche v[-d..d] est gardée à
+    chaque étape pour la remontée du chemin.
+    """
+    n, m = a_hi - a_lo, b_hi - b_lo
+    if abs(n - m) > max_edits:
+        return []
+    limit = min(n + m, max_edits)
+    offset = limit + 1
+    v = [-1] * (2 * limit + 3)
+    v[offset + 1] = 0
+    trace = []
+    found = False
+    for d in range(limit + 1):
+        trace.append(v[offset - d - 1:offset + d + 2]) # État après l'étape d-1, diagonales -d-1..d+1
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                found = True
+                break
+        if found:
+            break
+    if not found:
+        return []
+
+    # Remontée du chemin : les diagonales sont les lignes communes
+    pairs = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            pairs.append((a_lo + x, b_lo + y))
+        if d > 0:
+            x, y = prev_x, prev_y
+    return pairs
+
+def _patience_pairs(a, b):
+    """
+    Lignes communes de a et b (séquences d'identifiants) : préfixe / suffixe communs, ancres sur
+    les lignes uniques des deux côtés (patience), puis Myers dans les petites zones restantes.
+    """
+    pairs = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            pairs.append((a_lo, b_lo))
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+            pairs.append((a_hi, b_hi))
+        if a_lo >= a_hi or b_lo >= b_hi:
+            continue
+
+        # Lignes présentes une seule fois de chaque côté
+        seen_a, seen_b = {}, {}
+        for i in range(a_lo, a_hi):
+            seen_a[a[i]] = -1 if a[i] in seen_a else i
+        for j in range(b_lo, b_hi):
+            seen_b[b[j]] = -1 if b[j] in seen_b else j
+        unique = [(i, seen_b[line]) for line, i in seen_a.items() if i != -1 and seen_b.get(line, -1) != -1]
+
+        if not unique:
+            pairs.extend(_myers_pairs(a, b, a_lo, a_hi, b_lo, b_hi))
+            continue
+
+        # Plus longue suite croissante (tri patience) des ancres, dans l'ordre de a
+        unique.sort()
+        tails, tail_idx, back = [], [], [-1] * len(unique)
+        for n, (_, j) in enumerate(unique):
+            k = bisect.bisect_left(tails, j)
+            if k == len(tails):
+                tails.append(j)
+                tail_idx.append(n)
+            else:
+                tails[k] = j
+                tail_idx[k] = n
+            back[n] = tail_idx[k - 1] if k else -1
+        anchors = []
+        n = tail_idx[-1]
+        while n != -1:
+            anchors.append(unique[n])
+            n = back[n]
+        anchors.reverse()
+
+        prev_i, prev_j = a_lo, b_lo
+        for i, j in anchors:
+            pairs.append((i, j))
+            stack.append((prev_i, i, prev_j, j))
+            prev_i, prev_j = i + 1, j + 1
+        stack.append((prev_i, a_hi, prev_j, b_hi))
+    pairs.sort()
+    return pairs
+
+def text_diff_opcodes(a_lines, b_lines):
+    """
+    Diff par lignes de deux textes, au format de difflib (tag, i1, i2, j1, j2) avec
+    tag dans "equal", "replace", "delete", "insert". Les lignes sont d'abord remplacées par
+    des identifiants entiers (une ligne = un entier) : les comparaisons portent sur ces entiers.
+    """
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+
+    opcodes = []
+    i = j = 0
+    for pi, pj in _patience_pairs(a, b) + [(len(a), len(b))]:
+        if i < pi or j < pj:
+            tag = "replace" if i < pi and j < pj else ("delete" if i < pi else "insert")
+            opcodes.append((tag, i, pi, j, pj))
+        if pi < len(a):
+            if opcodes and opcodes[-1][0] == "equal":
+                _, i1, _, j1, _ = opcodes[-1]
+                opcodes[-1] = ("equal", i1, pi + 1, j1, pj + 1)
+            else:
+                opcodes.append(("equal", pi, pi + 1, pj, pj + 1))
+        i, j = pi + 1, pj + 1
+    return opcodes
+
+# =================================================================================
+# ÉDITEUR RAPIDE : FICHIERS VOLUMINEUX (MMAP) ET COLORATION SYNTAXIQUE
+# =================================================================================
+class LargeTextFile:
+    """
+    Fichier texte volumineux ouvert en mmap (lecture seule) pour l'éditeur rapide.
+    - Index des lignes par blocs : nombre de fins de ligne avant chaque bloc de CHUNK octets
+      (bytes.count), la position exacte d'une ligne est retrouvée dans son bloc à la demande.
+    - Modifications : remplacements de plages de lignes d'origine {début: (fin exclue, octets)}.
+      L'enregistrement écrit sur place si les tailles sont inchangées, sinon recopie le fichier
+      par blocs en insérant les plages modifiées.
+    """
+    CHUNK = 1 << 20
+    ENCODING = "latin-1"
+
+    def __init__(self, path):
+        self.path = path
+        self.patches = {}
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+        # Fins de ligne avant chaque bloc
+        self._before = []
+        total = 0
+        for start in range(0, self.size, self.CHUNK):
+            self._before.append(total)
+            total += self.mm[start:start + self.CHUNK].count(b"\n")
+        ends_with_newline = self.size and self.mm[self.size - 1:self.size] == b"\n"
+        self.line_count = total + (0 if ends_with_newline else 1)
+        self._block = (None, [])
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self._file.close()
+
+    def _newlines(self, block):
+        """Positions des fins de ligne d'un bloc (le dernier bloc consulté est gardé)."""
+        if self._block[0] != block:
+            positions = []
+            start = block * self.CHUNK
+            end = min(self.size, start + self.CHUNK)
+            pos = self.mm.find(b"\n", start, end)
+            while pos != -1:
+                positions.append(pos)
+                pos = self.mm.find(b"\n", pos + 1, end)
+            self._block = (block, positions)
+        return self._block[1]
+
+    def line_offset(self, line):
+        """Offset du début de la ligne (0-based) ; line_count -> taille du fichier."""
+        if line <= 0:
+            return 0
+        if line >= self.line_count:
+            return self.size
+        # La ligne commence après la fin de ligne n° line - 1
+        nth = line - 1
+        block = bisect.bisect_right(self._before, nth) - 1
+        return self._newlines(block)[nth - self._before[block]] + 1
+
+    def line_at(self, offset):
+        """Ligne (0-based) contenant l'offset donné."""
+        block = min(offset // self.CHUNK, len(self._before) - 1)
+        if block < 0:
+            return 0
+        return self._before[block] + bisect.bisect_left(self._newlines(block), offset)
+
+    def covering(self, first, last):
+        """Étend [first, last) pour couvrir entièrement les plages modifiées qui le chevauchent."""
+        changed = True
+        while changed:
+            changed = False
+            for start, (end, _) in self.patches.items():
+                if start < last and end > first and (start < first or end > last):
+                    first, last = min(first, start), max(last, end)
+                    changed = True
+        return first, last
+
+    def text(self, first, last):
+        """Texte des lignes [first, last), modifications non enregistrées comprises."""
+        parts = []
+        pos = first
+        for start in sorted(k for k in self.patches if first <= k < last):
+            end, data = self.patches[start]
+            parts.append(self.mm[self.line_offset(pos):self.line_offset(start)])
+            parts.append(data)
+            pos = end
+        parts.append(self.mm[self.line_offset(pos):self.line_offset(last)])
+        return b"".join(parts).decode(self.ENCODING)
+
+    def set_text(self, first, last, text):
+        """Remplace le texte des lignes d'origine [first, last) (couvrant les plages déjà modifiées)."""
+        for start in [k for k in self.patches if first <= k < last]:
+            del self.patches[start]
+        data = text.encode(self.ENCODING, errors="replace")
+        if data != self.mm[self.line_offset(first):self.line_offset(last)]:
+            self.patches[first] = (last, data)
+
+    def save(self):
+        """Écrit les plages modifiées puis rouvre le fichier. Renvoie le nombre de plages écrites."""
+        if not self.patches:
+            return 0
+        edits = [(self.line_offset(start), self.line_offset(end), data)
+                 for start, (end, data) in sorted(self.patches.items())]
+        count = len(edits)
+        if all(end - start == len(data) for start, end, data in edits):
+            # Tailles inchangées : seules les plages modifiées sont écrites
+            self.close()
+            with open(self.path, "r+b") as f:
+                for start, _, data in edits:
+                    f.seek(start)
+                    f.write(data)
+        else:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as out:
+                pos = 0
+                for start, end, data in edits + [(self.size, self.size, b"")]:
+                    for chunk_start in range(pos, start, self.CHUNK):
+                        out.write(self.mm[chunk_start:min(start, chunk_start + self.CHUNK)])
+                    out.write(data)
+                    pos = end
+            self.close()
+            os.replace(tmp_path, self.path)
+        self.patches = {}
+        self._open()
+        return count
+
+    def find(self, pattern, start=0):
+        """Offset de la prochaine occurrence (regex sur octets) à partir de start, ou None."""
+        match = pattern.search(self.mm, start)
+        return match.start() if match else None
+
+    def replace_all(self, pattern, replacement):
+        """Remplace toutes les occurrences (regex sur octets) par recopie en flux. Renvoie le nombre."""
+        if self.patches:
+            raise RuntimeError("Enregistrer les modifications avant de tout remplacer.")
+        count = 0
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            pos = 0
+            for match in pattern.finditer(self.mm):
+                out.write(self.mm[pos:match.start()])
+                out.write(replacement)
+                pos = match.end()
+                count += 1
+            for chunk_start in range(pos, self.size, self.CHUNK):
+                out.write(self.mm[chunk_start:chunk_start + self.CHUNK])
+        if not count:
+            os.remove(tmp_path)
+            return 0
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+        return count
+
+class SyntaxHighlighter:
+    """
+    Coloration syntaxique d'un tk.Text limitée aux lignes visibles (+ MARGIN).
+    Les tokens sont calculés ligne par ligne et mis en cache par texte de ligne ; une ligne n'est
+    recolorée que si son texte a changé depuis la dernière passe : coût constant par frappe,
+    quelle que soit la taille du fichier. Modes : "dat", "python", "ini" (analyse ligne à ligne,
+    les chaînes multi-lignes Python ne sont pas suivies).
+    """
+    MARGIN = 50
+    CACHE_SIZE = 20000
+    STYLES = {
+        "comment": {"foreground": "#7f8c8d"},
+        "string": {"foreground": "#27ae60"},
+        "number": {"foreground": "#2980b9"},
+        "keyword": {"foreground": "#8e44ad"},
+        "separator": {"foreground": "#e67e22"},
+        "section": {"foreground": "#c0392b"},
+        "key": {"foreground": "#2c3e50"},
+    }
+    PATTERNS = {
+        "python": (r"(?P<comment>#.*)"
+                   r"|(?P<string>[rbfuRBFU]{0,2}(?:\"(?:[^\"\\]|\\.)*\"?|'(?:[^'\\]|\\.)*'?))"
+                   r"|(?P<keyword>\b(?:" + "|".join(keyword.kwlist) + r")\b)"
+                   r"|(?P<number>\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b)"),
+        "ini": (r"(?P<comment>^\s*[;#].*)"
+                r"|(?P<section>^\s*\[[^\]]*\])"
+                r"|(?P<key>^[^=:;#\[]+?(?=\s*[=:]))"
+                r"|(?P<string>\"[^\"]*\"?)"
+                r"|(?P<number>\b\d+(?:\.\d+)?\b)"),
+        "dat": (r"(?P<string>\"(?:[^\"]|\"\")*\"?)"
+                r"|(?P<separator>[;,\t])"
+                r"|(?P<number>(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.]))"),
+    }
+    EXTENSIONS = {".py": "python", ".pyw": "python", ".ini": "ini", ".cfg": "ini", ".conf": "ini"}
+
+    def __init__(self, text_widget, mode="dat"):
+        self.text = text_widget
+        self.pattern = re.compile(self.PATTERNS[mode])
+        self._tokens = {}  # texte de ligne -> [(style, début, fin)]
+        self._applied = {} # n° de ligne -> texte coloré lors de la dernière passe
+        self._pending = False
+        self._tags = ["syn_" + name for name in self.STYLES]
+        for name, style in self.STYLES.items():
+            text_widget.tag_configure("syn_" + name, **style)
+            text_widget.tag_lower("syn_" + name) # Sous la sélection et les résultats de recherche
+
+    @classmethod
+    def mode_for(cls, path):
+        return cls.EXTENSIONS.get(os.path.splitext(path)[1].lower(), "dat")
+
+    def tokens(self, line):
+        spans = self._tokens.get(line)
+        if spans is None:
+            if len(self._tokens) >= self.CACHE_SIZE:
+                self._tokens.clear()
+            spans = [(m.lastgroup, m.start(), m.end()) for m in self.pattern.finditer(line)]
+            self._tokens[line] = spans
+        return spans
+
+    def schedule(self, *args):
+        """Demande une passe (regroupée : une seule par cycle d'inactivité)."""
+        if not self._pending:
+            self._pending = True
+            self.text.after_idle(self.highlight_visible)
+
+    def reset(self):
+        """Contenu remplacé : toutes les lignes visibles seront recolorées."""
+        self._applied.clear()
+        self.schedule()
+
+    def highlight_visible(self):
+        self._pending = False
+        text = self.text
+        try:
+            first = int(text.index("@0,0").split(".")[0])
+            last = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+            end_line = int(text.index("end-1c").split(".")[0])
+        except tk.TclError:
+            return # Fenêtre fermée
+        first = max(1, first - self.MARGIN)
+        last = min(end_line, last + self.MARGIN)
+        if len(self._applied) >= self.CACHE_SIZE:
+            self._applied.clear()
+        lines = text.get(f"{first}.0", f"{last}.end").split("\n")
+        for number, line in enumerate(lines, start=first):
+            if self._applied.get(number) == line:
+                continue
+            for tag in self._tags:
+                text.tag_remove(tag, f"{number}.0", f"{number}.end")
+            for style, start, end in self.tokens(line):
+                text.tag_add("syn_" + style, f"{number}.{start}", f"{number}.{end}")
+            self._applied[number] = line
+
+# =================================================================================
+# PROJET : CHARGEMENT CONCURRENT DES SIX MODULES
+# =================================================================================
+class ModuleTable:
+    """Table d'un module telle que lue sur disque."""
+    def __init__(self, key, path, headers, first_line, data, mtime, size):
+        self.key = key
+        self.path = path
+        self.headers = headers
+        self.first_line = first_line
+        self.data = data
+        self.mtime = mtime
+        self.size = size
+        self.base = {} # Photo {clé de ligne: hash} pour la fusion des changements externes
+
+class DatProject:
+    """
+    Dossier projet : les fichiers .DAT des modules sont lus et analysés en parallèle
+    dès la sélection du dossier. Les boutons de module basculent ensuite entre des tables
+    déjà en mémoire, et les fonctions transverses (références, validation) y ont accès.
+    specs = {module: (nom_fichier, titres_imposés ou None, sauter_première_ligne, colonne_clé)}
+    """
+    def __init__(self, folder, specs):
+        self.folder = folder
+        self.specs = specs
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(specs)))
+
+    def start(self):
+        for key in self.specs:
+            self.reload(key)
+
+    def reload(self, key):
+        """(Re)lit un module en arrière-plan (ex : après abandon ou enregistrement de ses modifications)."""
+        with self.lock:
+            self.futures[key] = self.executor.submit(self._load, key)
+
+    def _load(self, key):
+        filename, force_headers, skip_first_line, key_column = self.specs[key]
+        path = os.path.join(self.folder, filename)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        first_line, rows = read_dat_rows(path, skip_first_line)
+        headers = list(force_headers) if force_headers else detect_dat_headers(rows, MODULE_SCHEMAS.get(key))
+        table = ModuleTable(key, path, headers, first_line, rows, stat.st_mtime, stat.st_size)
+        table.base = keyed_row_hashes(rows, key_column_index(headers, key_column))
+        return table
+
+    def loaded_table(self, key):
+        """Table du module si sa lecture est terminée (sans attendre), sinon None."""
+        with self.lock:
+            future = self.futures.get(key)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def drop(self, key):
+        """Libère la table d'un module (elle sera relue à la prochaine demande)."""
+        with self.lock:
+            self.futures.pop(key, None)
+
+    def table(self, key):
+        """Table du module (attend la fin de sa lecture). None si le fichier est absent."""
+        with self.lock:
+            future = self.futures.get(key)
+        if future is None:
+            if key not in self.specs:
+                return None
+            self.reload(key)
+            return self.table(key)
+        return future.result() # Relève l'éventuelle erreur de lecture
+
+    def pending(self):
+        with self.lock:
+            return sum(1 for f in self.futures.values() if not f.done())
+
+    def summary(self):
+        """(modules chargés, fichiers absents, {module: erreur}) une fois tout lu."""
+        loaded, missing, errors = [], [], {}
+        with self.lock:
+            futures = dict(self.futures)
+        for key, future in futures.items():
+            if future.exception() is not None:
+                errors[key] = future.exception()
+            elif future.result() is None:
+                missing.append(self.specs[key][0])
+            else:
+                loaded.append(key)
+        return loaded, missing, errors
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# =================================================================================
+# CACHE LRU DES MODULES OUVERTS (TABLE + ÉTAT DE LA VUE + ANNULATION)
+# =================================================================================
+class ModuleState:
+    """Table d'un module et état de sa vue : colonnes, filtres, tri, défilement, pile d'annulation."""
+    def __init__(self, key, path, headers, first_line, data):
+        self.key = key
+        self.path = path
+        self.headers = headers
+        self.first_line = first_line
+        self.data = data
+        self.visible_columns = [h for h in headers if h and "unnamed" not in h.lower()]
+        self.filtered_indices = list(range(len(data)))
+        self.sort_state = {}
+        self.undo_stack = []
+        self.modified = False
+        self.last_tagname = None # Calculé à la première activation
+        self.filters = None      # [(colonne, texte)] des trois filtres
+        self.logic_mode = "ET"
+        self.focus_idx = None    # Position (dans filtered_indices) de la première ligne visible
+        self.selection = SelectionModel()
+        self.virtual_columns = {} # Colonnes virtuelles (lecture seule) : nom -> fonction(positions)
+        self.value_filters = {} # Filtres par valeurs : colonne -> valeurs retenues
+        self.mtime = None        # Fichier sur disque correspondant à self.base (surveillance)
+        self.size = None
+        self.base = {}
+
+    def estimated_size(self):
+        """Empreinte mémoire approximative (octets), estimée sur un échantillon de lignes."""
+        if not self.data:
+            return 0
+        step = max(1, len(self.data) // 200)
+        sample = self.data[::step]
+        per_row = sum(64 + sum(49 + len(str(c)) for c in row) for row in sample) / len(sample)
+        return int(per_row * len(self.data))
+
+class ModuleCache:
+    """
+    Modules ouverts, du moins au plus récemment utilisé, bornés par un budget mémoire.
+    Un module modifié (non enregistré) n'est jamais évincé.
+    on_evict(module) est appelé pour chaque module évincé.
+    """
+    def __init__(self, budget_bytes, on_evict=None):
+        self.budget = budget_bytes
+        self.on_evict = on_evict
+        self.states = OrderedDict()
+        self.sizes = {}
+
+    def get(self, key):
+        state = self.states.get(key)
+        if state is not None:
+            self.states.move_to_end(key)
+        return state
+
+    def peek(self, key):
+        return self.states.get(key)
+
+    def put(self, state):
+        self.states[state.key] = state
+        self.states.move_to_end(state.key)
+        self.sizes[state.key] = state.estimated_size()
+        self._evict(keep=state.key)
+
+    def dirty(self):
+        return [state for state in self.states.values() if state.modified]
+
+    def clear(self):
+        self.states.clear()
+        self.sizes.clear()
+
+    def _evict(self, keep):
+        total = sum(self.sizes.values())
+        for key in list(self.states):
+            if total <= self.budget:
+                break
+            if key == keep or self.states[key].modified:
+                continue
+            del self.states[key]
+            total -= self.sizes.pop(key)
+            if self.on_evict:
+                self.on_evict(key)
+
 # =================================================================================
 # NOUVELLE CLASSE : TABLEAU AUTONOME POUR LA COMPARAISON
 # =================================================================================
@@ -25,7 +2669,7 @@ class TableWidget(tk.Frame):
     def __init__(self, parent, title="Tableau", accent_color="#3498db"):
         super().__init__(parent, bg="#ecf0f1")
         self.accent_color = accent_color
-        self.data = []
+        self.data = RowStore()
         self.headers = []
         self.visible_columns = []
         self.filtered_indices = []
@@ -96,7 +2740,7 @@ class TableWidget(tk.Frame):
             
             # Mise à jour des données
             self.headers = list(df.columns)
-            self.data = df.values.tolist()
+            self.data = RowStore(df.values.tolist())
             
             # Mise à jour de l'affichage
             self.visible_columns = self.headers.copy()
@@ -109,8 +2753,7 @@ class TableWidget(tk.Frame):
     def save_state(self):
         """Sauvegarde l'état actuel des données pour le CTRL+Z"""
         # On garde une copie profonde des données
-        import copy
-        state = copy.deepcopy(self.data)
+        state = self.data.copy()
         self.undo_stack.append(state)
         # On limite la pile à 10 retours en arrière pour ne pas saturer la mémoire
         if len(self.undo_stack) > 10:
@@ -123,8 +2766,7 @@ class TableWidget(tk.Frame):
             return
             
         # On récupère l'état précédent
-        last_data = self.undo_stack.pop()
-        self.data = last_data
+        self._restore_undo(self.undo_stack.pop())
         
         # On rafraichit
         self.filtered_indices = list(range(len(self.data)))
@@ -175,22 +2817,13 @@ class TableWidget(tk.Frame):
                 messagebox.showwarning("Attention", "Le champ 'Rechercher' est vide.", parent=top)
                 return
             
-            # Sauvegarde pour le Undo
-            self.save_state()
-            
-            count = 0
-            # On parcourt TOUT le tableau
-            for row_idx, row in enumerate(self.data):
-                for col_idx, cell_val in enumerate(row):
-                    val_str = str(cell_val)
-                    if txt_find in val_str:
-                        # Remplacement
-                        new_val = val_str.replace(txt_find, txt_replace)
-                        self.data[row_idx][col_idx] = new_val
-                        count += 1
+            # On parcourt TOUT le tableau (motif compilé une seule fois)
+            engine = ReplaceEngine(txt_find, txt_replace, case_sensitive=True)
+            changes, count = engine.scan(self.data)
             
             if count > 0:
-                self.refresh_tree()
+                # Une seule entrée d'annulation pour tout le lot
+                self._apply_replacements(changes)
                 messagebox.showinfo("Succès", f"{count} occurrences remplacées.", parent=top)
                 top.destroy()
             else:
@@ -222,7 +2855,7 @@ class TableWidget(tk.Frame):
         ext = os.path.splitext(path)[1].lower()
         
         # Réinitialisation
-        self.data = []
+        self.data = RowStore()
         self.headers = []
         self.all_sheets = {}
         self.sheet_combo.set('')
@@ -311,6 +2944,7 @@ class TableWidget(tk.Frame):
             else:
                 if not self.headers: self.headers = []
 
+            self.data = RowStore(self.data)
             self.visible_columns = self.headers.copy()
             self.filtered_indices = list(range(len(self.data)))
             self.refresh_tree()
@@ -354,16 +2988,16 @@ class TableWidget(tk.Frame):
         found = False
         
         # 3. Boucle de recherche
+        # Colonnes normalisées (cache partagé) : pas de .lower() par cellule
+        columns = [self.data.folded(c) for c in range(len(self.headers))] if term == term.strip() else None
         for i in range(start_idx, len(indices_to_check)):
             real_row_idx = indices_to_check[i]
-            row_data = self.data[real_row_idx]
             
             # On cherche dans chaque colonne de la ligne
-            is_match = False
-            for cell in row_data:
-                if term_lower in str(cell).lower():
-                    is_match = True
-                    break
+            if columns is not None:
+                is_match = any(term_lower in col[real_row_idx] for col in columns)
+            else:
+                is_match = any(term_lower in str(cell).lower() for cell in self.data[real_row_idx])
             
             if is_match:
                 # TROUVÉ !
@@ -407,7 +3041,7 @@ class TableWidget(tk.Frame):
                 if pd is None:
                     messagebox.showerror("Erreur", "Pandas requis pour Excel.", parent=self)
                     return
-                df = pd.DataFrame(self.data, columns=self.headers)
+                df = pd.DataFrame(list(self.data), columns=self.headers)
                 df.to_excel(path, index=False)
             else:
                 with open(path, 'w', newline='', encoding='utf-8') as f:
@@ -437,14 +3071,22 @@ class TableWidget(tk.Frame):
                     values.append(val)
                 except ValueError:
                     values.append("")
-            self.tree.insert("", "end", iid=str(i), values=values)
+            self.tree.insert("", "end", iid=self._iid(i), values=values)
+
+    def _iid(self, real_index):
+        """iid Treeview d'une ligne : son identifiant stable (rid), pas sa position."""
+        return str(self.data.rid(real_index))
+
+    def _row_index(self, iid):
+        """Position actuelle dans self.data de la ligne d'iid donné."""
+        return self.data.position(int(iid))
 
     def edit_cell(self, event):
         item_id = self.tree.identify_row(event.y)
         column = self.tree.identify_column(event.x)
         if not item_id or not column: return
 
-        row_index = int(item_id)
+        row_index = self._row_index(item_id)
         col_num = int(column.replace('#', '')) - 1
         display_cols = [c for c in self.headers if c in self.visible_columns]
         if col_num < 0 or col_num >= len(display_cols): return
@@ -464,6 +3106,7 @@ class TableWidget(tk.Frame):
         def save_edit(e):
             new_val = entry.get()
             self.data[row_index][real_col_index] = new_val
+            self.data.cell_changed(row_index, real_col_index)
             self.tree.set(item_id, column, new_val)
             entry.destroy()
             
@@ -517,32 +3160,25 @@ class TableWidget(tk.Frame):
 
     def find_next_and_replace(self, search_text, replace_text, do_replace=False):
         if not search_text: return 0
-        search_lower = search_text.lower()
+        engine = ReplaceEngine(search_text, replace_text)
         start_idx = self.last_search_index + 1
         
         replaced = False
         if do_replace and self.last_search_index != -1 and self.last_search_index < len(self.data):
-             row = self.data[self.last_search_index]
-             changed = False
-             for c_idx, cell in enumerate(row):
-                 if search_lower in str(cell).lower():
-                     pattern = re.compile(re.escape(search_text), re.IGNORECASE)
-                     new_val = pattern.sub(replace_text, str(cell))
-                     if new_val != str(cell):
-                         self.data[self.last_search_index][c_idx] = new_val
-                         changed = True
-             if changed:
+             changes, _ = engine.scan(self.data, [self.last_search_index])
+             if changes:
+                 self._record_replacements(changes)
                  self.refresh_row(self.last_search_index)
                  replaced = True
 
+        cols = range(len(self.headers))
         for i in range(start_idx, len(self.data)):
-            row = self.data[i]
-            row_str = " ".join([str(x).lower() for x in row])
-            if search_lower in row_str:
+            if engine.row_matches(self.data, i, cols):
                 self.last_search_index = i
-                self.tree.selection_set(str(i))
-                self.tree.see(str(i))
-                self.tree.focus(str(i))
+                iid = self._iid(i)
+                self.tree.selection_set(iid)
+                self.tree.see(iid)
+                self.tree.focus(iid)
                 return 1 
         
         if start_idx > 0:
@@ -552,7 +3188,8 @@ class TableWidget(tk.Frame):
         return 0
 
     def refresh_row(self, index):
-        if str(index) in self.tree.get_children():
+        iid = self._iid(index)
+        if self.tree.exists(iid):
             row = self.data[index]
             display_cols = [c for c in self.headers if c in self.visible_columns]
             values = []
@@ -563,26 +3200,31 @@ class TableWidget(tk.Frame):
                     values.append(val)
                 except ValueError:
                     values.append("")
-            self.tree.item(str(index), values=values)
+            self.tree.item(iid, values=values)
 
     def replace_all(self, search_text, replace_text):
-        count = 0
-        search_lower = search_text.lower()
-        for r_idx, row in enumerate(self.data):
-            changed = False
-            for c_idx, cell in enumerate(row):
-                cell_str = str(cell)
-                if search_lower in cell_str.lower():
-                    pattern = re.compile(re.escape(search_text), re.IGNORECASE)
-                    new_val = pattern.sub(replace_text, cell_str)
-                    if new_val != cell_str:
-                        self.data[r_idx][c_idx] = new_val
-                        changed = True
-            if changed:
-                count += 1
-        if count > 0:
+        """Remplace partout (insensible à la casse) ; renvoie le nombre de lignes modifiées."""
+        changes, _ = ReplaceEngine(search_text, replace_text).scan(self.data)
+        self._apply_replacements(changes)
+        return len({pos for pos, _, _, _ in changes})
+
+    def _record_replacements(self, changes):
+        """Écrit les changements calculés par ReplaceEngine.scan et empile une seule entrée d'annulation."""
+        undo_batch = []
+        for row_idx, col_idx, old, new in changes:
+            self.data[row_idx][col_idx] = new
+            self.data.cell_changed(row_idx, col_idx)
+            undo_batch.append(("cell", self.data.rid(row_idx), col_idx, old))
+        if undo_batch:
+            self.undo_stack.append(undo_batch)
+            if len(self.undo_stack) > 20:
+                self.undo_stack.pop(0)
+
+    def _apply_replacements(self, changes):
+        """Applique un lot de remplacements avec un seul rafraîchissement de la grille."""
+        if changes:
+            self._record_replacements(changes)
             self.refresh_tree()
-        return count
     
     # =========================================================================
     #  TABLEWIDGET (COMPARAISON) - MENU CONTEXTUEL & INSERTION
@@ -682,7 +3324,7 @@ class TableWidget(tk.Frame):
         # Variables d'état pour le bouton "Suivant"
         col_idx = self.headers.index(col_name)
         # On convertit les IDs treeview en index entiers triés
-        self.search_indices = sorted([int(item) for item in selected_items])
+        self.search_indices = sorted([self._row_index(item) for item in selected_items])
         self.current_search_pos = 0
 
         def do_replace_next():
@@ -705,18 +3347,20 @@ class TableWidget(tk.Frame):
                         # Remplacement (Undo snapshot possible ici si besoin, mais lourd pour du pas à pas)
                         new_val = current_val.replace(find_str, repl_str)
                         self.data[r_idx][col_idx] = new_val
+                        self.data.cell_changed(r_idx, col_idx)
                         
                         # Update visuel
-                        if str(r_idx) in self.tree.get_children():
-                            vals = list(self.tree.item(str(r_idx), 'values'))
+                        iid = self._iid(r_idx)
+                        if self.tree.exists(iid):
+                            vals = list(self.tree.item(iid, 'values'))
                             # On doit trouver l'index visuel
                             display_cols = [c for c in self.headers if c in self.visible_columns]
                             if col_name in display_cols:
                                 v_idx = display_cols.index(col_name)
                                 vals[v_idx] = new_val
-                                self.tree.item(str(r_idx), values=vals)
-                                self.tree.see(str(r_idx)) # Scroll vers l'élément
-                                self.tree.selection_set(str(r_idx)) # Focus visuel
+                                self.tree.item(iid, values=vals)
+                                self.tree.see(iid) # Scroll vers l'élément
+                                self.tree.selection_set(iid) # Focus visuel
                         
                         self.current_search_pos = i + 1 # Prêt pour le suivant
                         match_found = True
@@ -731,20 +3375,13 @@ class TableWidget(tk.Frame):
             repl_str = entry_replace.get()
             if not find_str: return
 
-            count = 0
-            # Pour TableWidget, on peut ajouter save_full_state_for_undo() ici si implémenté
-            if hasattr(self, 'save_full_state_for_undo'):
-                self.save_full_state_for_undo()
-
-            for r_idx in self.search_indices:
-                if r_idx < len(self.data) and col_idx < len(self.data[r_idx]):
-                    current_val = str(self.data[r_idx][col_idx])
-                    if find_str in current_val:
-                        self.data[r_idx][col_idx] = current_val.replace(find_str, repl_str)
-                        count += 1
+            engine = ReplaceEngine(find_str, repl_str, case_sensitive=True)
+            positions = [r for r in self.search_indices if r < len(self.data)]
+            changes, _ = engine.scan(self.data, positions, [col_idx])
+            count = len(changes)
             
             if count > 0:
-                self.refresh_tree()
+                self._apply_replacements(changes)
                 messagebox.showinfo("Succès", f"{count} occurrences remplacées.", parent=top)
                 top.destroy()
             else:
@@ -763,7 +3400,7 @@ class TableWidget(tk.Frame):
 
     def save_full_state_for_undo(self):
         """Sauvegarde une copie complète pour le Ctrl+Z."""
-        snapshot = [row[:] for row in self.data]
+        snapshot = self.data.copy()
         self.undo_stack.append(snapshot)
         if len(self.undo_stack) > 20:
             self.undo_stack.pop(0)
@@ -773,35 +3410,54 @@ class TableWidget(tk.Frame):
         if not self.undo_stack:
             return
 
-        last_action = self.undo_stack.pop()
-        
-        # Restauration brutale (Snapshot)
-        self.data = last_action
+        self._restore_undo(self.undo_stack.pop())
         
         # Reset affichage
         self.filtered_indices = list(range(len(self.data)))
         self.refresh_tree()
         messagebox.showinfo("Undo", "Action annulée.", parent=self)
 
+    def _restore_undo(self, last_action):
+        """Applique une entrée de la pile d'annulation : snapshot complet ou lot d'actions par rid."""
+        if isinstance(last_action, RowStore):
+            # Restauration brutale (Snapshot)
+            self.data = last_action
+            return
+        inserted = []
+        for action in reversed(last_action):
+            if action[0] == "cell":
+                _, rid, col_idx, old_value = action
+                row_idx = self.data.position(rid)
+                if row_idx is not None:
+                    self.data[row_idx][col_idx] = old_value
+                    self.data.cell_changed(row_idx, col_idx)
+            elif action[0] == "insert":
+                # Lot d'insertions : on retire simplement les lignes ajoutées
+                inserted.append(action[1])
+        if inserted:
+            self.data.delete_ids(inserted)
+
     def insert_rows(self, target_row_id, count, position='below'):
         """Insère des lignes vides."""
         try:
-            self.save_full_state_for_undo() # Sauvegarde avant modif
-
-            target_idx = int(target_row_id)
+            target_idx = self._row_index(target_row_id)
             insert_idx = target_idx if position == 'above' else target_idx + 1
             
             empty_row = [""] * len(self.headers)
             new_rows = [list(empty_row) for _ in range(count)]
             
-            self.data[insert_idx:insert_idx] = new_rows
+            # Insertion par bloc : seul le bloc touché est décalé, pas tout le tableau
+            new_ids = self.data.insert_rows(insert_idx, new_rows)
+            self.undo_stack.append([("insert", rid) for rid in new_ids])
+            if len(self.undo_stack) > 20:
+                self.undo_stack.pop(0)
             
             self.filtered_indices = list(range(len(self.data)))
             self.refresh_tree()
             
             try:
-                self.tree.see(str(insert_idx))
-                self.tree.selection_set(str(insert_idx))
+                self.tree.see(str(new_ids[0]))
+                self.tree.selection_set(str(new_ids[0]))
             except: pass
             
         except Exception as e:
@@ -819,7 +3475,7 @@ class TableWidget(tk.Frame):
             
             lines = []
             for item in selected_items:
-                r_idx = int(item)
+                r_idx = self._row_index(item)
                 row_vals = []
                 # On boucle de la colonne de début à la colonne de fin
                 for i in range(idx_s, idx_e + 1):
@@ -850,7 +3506,7 @@ class TableWidget(tk.Frame):
             rows_to_paste = [line.split('\t') for line in content.splitlines()]
             if not rows_to_paste: return
 
-            start_r = int(start_row_id)
+            start_r = self._row_index(start_row_id)
             start_c = self.headers.index(start_col_name)
 
             for r_off, row_data in enumerate(rows_to_paste):
@@ -865,6 +3521,7 @@ class TableWidget(tk.Frame):
                     while len(self.data[curr_r]) <= curr_c: self.data[curr_r].append("")
                     self.data[curr_r][curr_c] = val
 
+            self.data.invalidate_folded()
             self.refresh_tree()
             messagebox.showinfo("Succès", "Données collées.", parent=self)
         except Exception as e:
@@ -878,7 +3535,7 @@ class TableWidget(tk.Frame):
             col_index = self.headers.index(col_name)
             
             # 2. Valeur source
-            row_index = int(source_item_id)
+            row_index = self._row_index(source_item_id)
             source_value = self.data[row_index][col_index] if col_index < len(self.data[row_index]) else ""
             
             # Préparation pour incrémentation
@@ -905,7 +3562,7 @@ class TableWidget(tk.Frame):
             selected_items = self.tree.selection()
             
             for i, item_id in enumerate(selected_items):
-                target_idx = int(item_id) # L'ID du treeview correspond à l'index dans self.data
+                target_idx = self._row_index(item_id) # L'iid du treeview est le rid stable de la ligne
                 
                 # Calcul de la nouvelle valeur
                 new_val = source_value
@@ -921,6 +3578,7 @@ class TableWidget(tk.Frame):
                     self.data[target_idx].append("")
                 
                 self.data[target_idx][col_index] = str(new_val)
+                self.data.cell_changed(target_idx, col_index)
                 
                 # B. Mise à jour visuelle (Treeview)
                 # On récupère les valeurs actuelles affichées pour ne changer que la cellule cible
@@ -1080,7 +3738,64 @@ class DatEditor:
         "Variable Nombre d'alarmes masquées par expression", "Variable Nombre d'alarmes présentes et en mode prise en compte",
         "Variable Nombre d'alarmes au repos et en mode prise en compte", "Nombre d'alarmes inhibées"
     ]
+
+    # Fichier .DAT de chaque module dans le dossier projet
+    MODULE_FILES = {
+        "varexp": "varexp.dat",
+        "comm": "COMM.DAT",
+        "event": "EVENT.DAT",
+        "exprv": "Exprv.DAT",
+        "cyclic": "CYCLIC.DAT",
+        "vartreat": "VARTREAT.DAT"
+    }
+
+    # Colonne identifiant une ligne lors de la fusion des changements externes (sinon "Nom")
+    MODULE_KEY_COLUMNS = {"varexp": "Tagname"}
+
+    # Période de surveillance des fichiers du projet (ms)
+    WATCH_INTERVAL_MS = 2000
+
+    # Conduite à tenir si des doublons (Tagname, Nom + chemin) existent au moment d'enregistrer
+    DUPLICATE_POLICIES = ("Avertir", "Bloquer", "Renuméroter les Tagnames")
+
+    # Éditeur rapide : au-delà de cette taille, fichier en mmap et affichage par fenêtre de lignes
+    LARGE_TEXT_BYTES = 20 * 1024 * 1024
+    LARGE_TEXT_WINDOW = 2000
+
+    # Budget mémoire des modules gardés ouverts (cache LRU)
+    MODULE_CACHE_BUDGET = 512 * 1024 * 1024
+
+    # Bouton de création associé à chaque module (le COMM n'en a pas)
+    MODULE_CREATE_BUTTONS = {
+        "varexp": "create_var",
+        "event": "create_event",
+        "exprv": "create_exprv",
+        "cyclic": "create_cyclic",
+        "vartreat": "create_vartreat"
+    }
+
+    # Colonnes des autres modules qui référencent des variables du varexp (index "où est utilisée")
+    REFERENCE_COLUMNS = {
+        "event": ["Variable scrutée", "Variable bit activation", "Expression (si expression)"],
+        "exprv": ["Variable activation", "Variable", "Expression"],
+        "cyclic": ["Variable d'activation"],
+        "vartreat": ["Expression"] + [h for h in VARTREAT_DEFAULT_HEADERS if h.startswith("Variable ")]
+    }
+
+    # Colonnes "Expression" validées par le parseur d'expressions
+    EXPRESSION_COLUMNS = {
+        "event": ["Expression (si expression)"],
+        "exprv": ["Expression"],
+        "vartreat": ["Expression"]
+    }
     
+    # Colonnes virtuelles prédéfinies (jamais stockées dans self.data) : nom -> méthode(positions)
+    BUILTIN_VIRTUAL_COLUMNS = {
+        "Ligne": "_virtual_line_numbers",
+        "Chemin": "_virtual_branch_paths",
+        "Écarts modèle": "_virtual_template_deviations",
+    }
+
     VAREXP_TEMPLATES = {
         "CMD": {
             "Source": "I", "Broadcast": "0", "StationOrAssociationNumber": "0",
@@ -1203,10 +3918,13 @@ class DatEditor:
         self._configure_styles()
     
         # Données
-        self.data = []
+        self.data = RowStore()
         self.headers = []
         self.filtered_indices = []
         self.visible_columns = []
+        # Colonnes virtuelles en lecture seule : nom -> fonction(positions) -> valeurs affichées
+        self.virtual_columns = {}
+        self.value_filters = {} # Filtres par valeurs : colonne -> valeurs retenues
         self.first_line = None
         self.selected_folder = None
         self.modified = False
@@ -1217,6 +3935,59 @@ class DatEditor:
         # Undo stack
         self.undo_stack = []
         # self.copy_undo_stack_size = None # SUPPRIMÉ POUR CORRECTION BUG UNDO
+
+        # Index de hachage Nom / Tagname (recherche O(1), contrôle des doublons)
+        self.index = TableIndex(lambda: self.data, lambda: self.headers)
+        # Valeurs distinctes par colonne (filtres par valeurs sur les titres)
+        self.value_index = ValueDictionary(lambda: self.data)
+
+        # Statistiques de colonnes : index de colonne -> (version de colonne, signature du filtre, stats)
+        self.column_stats_cache = {}
+
+        # Sélection logique (par rid), indépendante de la fenêtre affichée
+        self.selection = SelectionModel()
+        self._pushed_selection = set()
+        self._additive_click = False
+
+        # Module actuellement affiché ('varexp', 'event'... ou None pour un fichier quelconque)
+        self.current_module = None
+
+        # Projet (six modules lus en parallèle à la sélection du dossier)
+        self.project = None
+
+        # Modules ouverts : on bascule de l'un à l'autre sans perte (modifications, filtres, annulation)
+        self.module_cache = ModuleCache(self.MODULE_CACHE_BUDGET, on_evict=self._on_module_evicted)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Surveillance des fichiers du projet (modifiés par d'autres outils)
+        self._watch_pending = set()
+        self.root.after(self.WATCH_INTERVAL_MS, self._watch_project)
+
+        # Index "où est utilisée" sur les modules qui référencent des variables
+        module_headers = {
+            "event": self.EVENT_DEFAULT_HEADERS,
+            "exprv": self.EXPRV_DEFAULT_HEADERS,
+            "cyclic": self.CYCLIC_DEFAULT_HEADERS,
+            "vartreat": self.VARTREAT_DEFAULT_HEADERS
+        }
+        self.references = ReferenceIndex({
+            key: (self.MODULE_FILES[key], module_headers[key], cols)
+            for key, cols in self.REFERENCE_COLUMNS.items()
+        })
+
+        # Parseur d'expressions (cache d'AST) et anomalies trouvées : {module: {ligne: {colonne: message}}}
+        self.expr_parser = ExpressionParser()
+        self.cell_issues = {}
+        self._known_names = None
+
+        # Contrôle du varexp : anomalies trouvées par module {module: {ligne: {colonne: message}}}
+        # (sous-ensemble de cell_issues, revalidé ligne par ligne après chaque édition)
+        self.varexp_linter = VarexpLinter(MODULE_SCHEMAS["varexp"], self.VAREXP_TEMPLATES)
+        self.lint_issues = {}
+        self._lint_pending = None
+
+        # Contrôle des doublons (Tagname, Nom + chemin) avant chaque enregistrement
+        self.duplicate_policy = tk.StringVar(value=self.DUPLICATE_POLICIES[0])
         
         # ---- Frame principale ----
         main_frame = tk.Frame(root, bg=self.COLORS["bg_light"])
@@ -1264,6 +4035,7 @@ class DatEditor:
         # ---------------------------------------------------
         self.buttons['open_any'] = self._create_nav_button(nav_content, "Ouvrir autre fichier", self.open_any_dat_file)
         self.buttons['save'] = self._create_nav_button(nav_content, "Enregistrer sous...", self.save_file, bg_color=self.COLORS["success"])
+        self.buttons['save_all'] = self._create_nav_button(nav_content, "Tout enregistrer", self.save_all_modules, bg_color=self.COLORS["success"])
         self.buttons['global_search'] = self._create_nav_button(
             nav_content, 
             "Recherche Globale", 
@@ -1291,6 +4063,14 @@ class DatEditor:
         self.buttons['create_exprv'] = self._create_nav_button(nav_content, "Créer Expression", lambda: self.open_create_generic('exprv'), state="disabled")
         self.buttons['create_cyclic'] = self._create_nav_button(nav_content, "Créer Cyclic", lambda: self.open_create_generic('cyclic'), state="disabled")
         self.buttons['create_vartreat'] = self._create_nav_button(nav_content, "Créer Synthèse", lambda: self.open_create_generic('vartreat'), state="disabled")
+
+        self._add_nav_separator(nav_content)
+
+        # Groupe Analyse
+        self._add_nav_label(nav_content, "Analyse")
+        self.buttons['validate_expr'] = self._create_nav_button(nav_content, "Valider expressions", self.open_expression_validation)
+        self.buttons['lint'] = self._create_nav_button(nav_content, "Contrôler le varexp", self.open_varexp_lint)
+        self.buttons['duplicates'] = self._create_nav_button(nav_content, "Doublons", self.open_duplicate_finder)
         
         # ================= ZONE SUPÉRIEURE : Filtres (Gauche) + Outils (Droite) =================
         top_container = tk.Frame(content_frame, bg=self.COLORS["bg_light"])
@@ -1370,9 +4150,14 @@ class DatEditor:
 
         self.buttons['columns'] = create_tool_button(tools_inner, "Colonnes", self.select_columns)
         self.buttons['search'] = create_tool_button(tools_inner, "Rechercher", self.open_search_replace)
+        self.buttons['rename'] = create_tool_button(tools_inner, "Renommage", self.open_bulk_rename)
+        self.buttons['upsert'] = create_tool_button(tools_inner, "Import fusion", self.open_upsert_import)
+        self.buttons['compute'] = create_tool_button(tools_inner, "Calcul", self.open_computed_column_window)
+        self.buttons['stats'] = create_tool_button(tools_inner, "Statistiques", self.open_column_stats)
         self.buttons['top'] = create_tool_button(tools_inner, "▲ Haut", self.scroll_top, color="#95a5a6")
         self.buttons['bottom'] = create_tool_button(tools_inner, "▼ Bas", self.scroll_bottom, color="#95a5a6")
         self.buttons['compare'] = create_tool_button(tools_inner, "Comparaison", self.open_compare_window, color="#8e44ad")
+        self.buttons['goto'] = create_tool_button(tools_inner, "Aller à...", self.open_goto_variable)
 
     
         # ---- Table + Scrollbars ----
@@ -1414,6 +4199,7 @@ class DatEditor:
         # Configurer les tags pour les couleurs alternées
         self.tree.tag_configure('oddrow', background="white")
         self.tree.tag_configure('evenrow', background=self.COLORS["row_alt"])
+        self.tree.tag_configure('issue', background="#fadbd8") # Ligne avec anomalie (expression, validation...)
 
         # Bande droite fixe (contexte visuel)
         self.right_band = tk.Frame(frame_table_parent, width=20, bg="#ecf0f1")
@@ -1424,9 +4210,14 @@ class DatEditor:
         self.root.bind("<Control-v>", self.paste_rows)
         self.root.bind("<Control-z>", self.undo)
         self.root.bind("<Delete>", self.delete_selected_rows)
+        self.root.bind("<Control-g>", lambda e: self.open_goto_variable())
+        self.root.bind("<F8>", lambda e: self.goto_next_issue())
+        self.root.bind("<Shift-F8>", lambda e: self.goto_next_issue(-1))
         self.tree.bind('<Double-1>', self.edit_cell)
         self.tree.bind('<Button-3>', self.show_context_menu) # Windows / Linux
         self.tree.bind('<Button-2>', self.show_context_menu) # MacOS
+        self.tree.bind('<Button-1>', self._on_tree_click)
+        self.tree.bind('<Control-a>', lambda e: self.select_all_filtered())
     
         # ================= BARRE DE STATUT =================
         self.status_var = tk.StringVar()
@@ -1444,7 +4235,7 @@ class DatEditor:
         status_bar.pack(side="bottom", fill="x")
     
         # Mises à jour automatiques
-        self.tree.bind("<<TreeviewSelect>>", lambda e: self.update_status_bar())
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
         self.tree.bind("<Motion>", lambda e: self.update_status_bar())
         
         self.editing_entry = None  
@@ -1523,7 +4314,7 @@ class DatEditor:
         self.cell_templates = {} 
         
         for idx, row in enumerate(self.data):
-            iid = str(idx)
+            iid = self._iid(idx)
             self.cell_templates[iid] = {col: row[self.headers.index(col)] for col in self.visible_columns if col in self.headers}
     
     def browse_folder(self):
@@ -1547,6 +4338,7 @@ class DatEditor:
             if folder_selected:
                 self.path_entry.delete(0, tk.END)
                 self.path_entry.insert(0, folder_selected)
+                self.load_from_entry()
                 
         except Exception as e:
             messagebox.showerror("Erreur Explorateur", 
@@ -1567,17 +4359,65 @@ class DatEditor:
         if not os.path.exists(path):
             messagebox.showerror("Erreur", f"Le chemin spécifié n'existe pas ou est inaccessible :\n{path}")
             return
+
+        if not self._check_unsaved_modules():
+            return
             
         # On enregistre le chemin dans la variable que votre programme utilise déjà
         self.selected_folder = path
+
+        # Index des références : cache disque + relecture des seuls fichiers modifiés (en arrière-plan)
+        self.references.set_folder(path)
+        threading.Thread(target=self.references.refresh, daemon=True).start()
         
         # On met à jour l'interface si nécessaire
         self.root.title(f"Éditeur .DAT - {self.selected_folder}")
         
-        # On appelle la fonction de chargement Varexp par défaut (ou un message de succès)
-        messagebox.showinfo("Dossier validé", "Le dossier est défini. Cliquez maintenant sur 'Varexp' ou un autre module.")
-        # Optionnel : décommenter la ligne ci-dessous si vous voulez charger automatiquement un module
-        # self.load_varexp()
+        # Lecture des six modules en parallèle : les boutons basculeront ensuite entre tables en mémoire
+        self.open_project(path)
+
+    def open_project(self, folder):
+        """Lance la lecture concurrente de tous les modules du dossier et suit son avancement."""
+        if self.project:
+            self.project.close()
+        # Les modules de l'ancien projet ont été enregistrés ou abandonnés (_check_unsaved_modules)
+        self.module_cache.clear()
+        if self.current_module is not None:
+            self._show_table([], None, [])
+            self.highlight_module_button(None)
+            self.undo_stack = []
+        self.project = DatProject(folder, self._module_specs())
+        self.project.start()
+        self.status_var.set(f"Chargement du projet ({len(self.MODULE_FILES)} modules en parallèle)...")
+        self._poll_project(self.project, time.perf_counter())
+
+    def _poll_project(self, project, t0):
+        if project is not self.project:
+            return # Un autre dossier a été choisi entre-temps
+        if project.pending():
+            self.root.after(100, lambda: self._poll_project(project, t0))
+            return
+        loaded, missing, errors = project.summary()
+        text = f"Projet chargé : {len(loaded)} module(s) en {time.perf_counter() - t0:.2f} s"
+        if missing:
+            text += f" | Absents : {', '.join(missing)}"
+        if errors:
+            text += f" | Illisibles : {', '.join(self.MODULE_FILES[k] for k in errors)}"
+        self.status_var.set(text)
+
+    def _module_specs(self):
+        """{module: (nom_fichier, titres_imposés ou None, sauter_première_ligne, colonne_clé)}"""
+        forced = {
+            "comm": self.COMM_DEFAULT_HEADERS,
+            "event": self.EVENT_DEFAULT_HEADERS,
+            "exprv": self.EXPRV_DEFAULT_HEADERS,
+            "cyclic": self.CYCLIC_DEFAULT_HEADERS,
+            "vartreat": self.VARTREAT_DEFAULT_HEADERS
+        }
+        return {
+            key: (filename, forced.get(key), key in ("varexp", "comm"), self.MODULE_KEY_COLUMNS.get(key, "Nom"))
+            for key, filename in self.MODULE_FILES.items()
+        }
 
     def open_compare_window(self):
         """
@@ -1589,6 +4429,12 @@ class DatEditor:
         comp_win.title("Comparateur Universel (Excel, CSV, DAT)")
         comp_win.geometry("1600x900")
         
+        # Fichiers texte (.py, .ini...) : comparaison ligne à ligne dans une fenêtre dédiée
+        comp_toolbar = tk.Frame(comp_win, bg="#ecf0f1", pady=4)
+        comp_toolbar.pack(fill="x")
+        tk.Button(comp_toolbar, text="Comparer des fichiers texte...", command=self.open_text_compare_window,
+                  bg="#8e44ad", fg="white", relief="flat", padx=10).pack(side="left", padx=5)
+
         # 2. Utilisation d'un PanedWindow pour redimensionner gauche/droite
         paned = tk.PanedWindow(comp_win, orient=tk.HORIZONTAL, sashrelief=tk.RAISED, sashwidth=4)
         paned.pack(fill="both", expand=True)
@@ -1619,13 +4465,33 @@ class DatEditor:
                 path = path[1:-1]
             return path
 
+        def is_text_file(path):
+            return os.path.splitext(path)[1].lower() not in ['.xlsx', '.xls', '.csv', '.dat']
+
+        text_compare = {"win": None, "set_path": None} # Une seule comparaison texte par fenêtre
+
+        def drop_text(side, path):
+            """Fichier non tabulaire (.py, .ini...) : côté de la comparaison texte déjà ouverte, sinon nouvelle."""
+            if text_compare["win"] is not None and text_compare["win"].winfo_exists():
+                text_compare["set_path"](side, path)
+                text_compare["win"].lift()
+            else:
+                kwargs = {"left_path": path} if side == "left" else {"right_path": path}
+                text_compare["win"], text_compare["set_path"] = self.open_text_compare_window(**kwargs)
+
         def drop_left(event):
             path = clean_path(event.data)
+            if is_text_file(path):
+                drop_text("left", path)
+                return
             # On appelle la nouvelle méthode créée à l'étape 1
             table_left.load_from_path(path)
 
         def drop_right(event):
             path = clean_path(event.data)
+            if is_text_file(path):
+                drop_text("right", path)
+                return
             table_right.load_from_path(path)
 
         # Activation DND sur les frames conteneurs
@@ -1635,13 +4501,196 @@ class DatEditor:
         frame_right.drop_target_register(DND_FILES)
         frame_right.dnd_bind('<<Drop>>', drop_right)
         
+    def open_text_compare_window(self, left_path=None, right_path=None):
+        """
+        Comparaison de deux fichiers texte (.py, .ini...) ligne à ligne (text_diff_opcodes),
+        vue côte à côte synchronisée : seules les lignes visibles sont écrites dans les widgets.
+        Renvoie (fenêtre, set_path(côté, chemin)) pour y déposer d'autres fichiers.
+        """
+        win = tk.Toplevel(self.root)
+        win.title("Comparaison de fichiers texte")
+        win.geometry("1500x850")
+
+        paths = {"left": left_path, "right": right_path}
+        lines = {"left": [], "right": []}
+        # Lignes alignées : (n° ligne gauche ou -1, n° ligne droite ou -1, type), début des blocs modifiés
+        state = {"rows": [], "hunks": [], "top": 0}
+
+        toolbar = tk.Frame(win, bg="#ecf0f1", pady=5, padx=5)
+        toolbar.pack(fill="x")
+        path_vars = {side: tk.StringVar(value="(glissez ou choisissez un fichier)") for side in paths}
+        summary_var = tk.StringVar(value="")
+
+        body = tk.Frame(win)
+        body.pack(fill="both", expand=True)
+        texts = {}
+        for col, side in enumerate(("left", "right")):
+            frame = tk.Frame(body)
+            frame.grid(row=0, column=col, sticky="nsew")
+            body.columnconfigure(col, weight=1)
+            tk.Label(frame, textvariable=path_vars[side], anchor="w", bg="#dfe6e9", font=("Segoe UI", 8)).pack(fill="x")
+            txt = tk.Text(frame, wrap="none", font=("Consolas", 10), state="disabled", cursor="arrow")
+            txt.pack(fill="both", expand=True)
+            txt.tag_config("lineno", foreground="#95a5a6")
+            txt.tag_config("delete", background="#fadbd8")
+            txt.tag_config("insert", background="#d5f5e3")
+            txt.tag_config("replace", background="#fdebd0")
+            txt.tag_config("filler", background="#ecf0f1")
+            texts[side] = txt
+        body.rowconfigure(0, weight=1)
+        vsb = ttk.Scrollbar(body, orient="vertical")
+        vsb.grid(row=0, column=2, sticky="ns")
+        line_height = tkfont.Font(font=("Consolas", 10)).metrics("linespace")
+
+        def visible_rows():
+            return max(1, texts["left"].winfo_height() // line_height)
+
+        def render(*args):
+            """Écrit uniquement les lignes alignées visibles dans les deux panneaux."""
+            rows = state["rows"]
+            count = visible_rows()
+            top = state["top"] = max(0, min(state["top"], len(rows) - count))
+            for side, pos in (("left", 0), ("right", 1)):
+                source = lines[side]
+                txt = texts[side]
+                txt.configure(state="normal")
+                txt.delete("1.0", tk.END)
+                for row in rows[top:top + count]:
+                    number, kind = row[pos], row[2]
+                    if number == -1:
+                        txt.insert(tk.END, " " * 7 + "\n", "filler")
+                        continue
+                    tag = () if kind == "equal" else (kind,)
+                    txt.insert(tk.END, f"{number + 1:>6} ", ("lineno",) + tag)
+                    txt.insert(tk.END, source[number] + "\n", tag)
+                txt.configure(state="disabled")
+            if rows:
+                vsb.set(top / len(rows), min(1.0, (top + count) / len(rows)))
+            else:
+                vsb.set(0, 1)
+
+        def scroll_to(top):
+            state["top"] = int(top)
+            render()
+
+        def on_scrollbar(action, value, unit=None):
+            if action == "moveto":
+                scroll_to(float(value) * len(state["rows"]))
+            elif action == "scroll":
+                step = visible_rows() if unit == "pages" else 1
+                scroll_to(state["top"] + int(value) * step)
+
+        def on_wheel(event):
+            delta = -3 if (getattr(event, "num", None) == 4 or event.delta > 0) else 3
+            scroll_to(state["top"] + delta)
+            return "break"
+
+        vsb.configure(command=on_scrollbar)
+        for txt in texts.values():
+            txt.bind("<MouseWheel>", on_wheel)
+            txt.bind("<Button-4>", on_wheel)
+            txt.bind("<Button-5>", on_wheel)
+            txt.bind("<Configure>", render)
+
+        def jump(direction):
+            hunks = state["hunks"]
+            if not hunks:
+                return
+            current = state["top"] + 3
+            if direction > 0:
+                target = next((h for h in hunks if h > current), hunks[0])
+            else:
+                target = next((h for h in reversed(hunks) if h < current), hunks[-1])
+            scroll_to(target - 3)
+
+        def compare():
+            if not (paths["left"] and paths["right"]):
+                render()
+                return
+            # Lecture et diff en arrière-plan ; seul le dernier calcul demandé est affiché
+            state["generation"] = generation = state.get("generation", 0) + 1
+            summary_var.set("Comparaison en cours...")
+            selected = dict(paths)
+
+            def worker():
+                start = time.perf_counter()
+                try:
+                    read = {}
+                    for side in selected:
+                        with open(selected[side], "r", encoding="latin-1", errors="replace") as f:
+                            read[side] = f.read().splitlines()
+                except Exception as e:
+                    win.after(0, lambda e=e: messagebox.showerror("Erreur", f"Impossible de lire le fichier :\n{e}", parent=win))
+                    return
+                rows, hunks = [], []
+                stats = {"equal": 0, "replace": 0, "delete": 0, "insert": 0}
+                for tag, i1, i2, j1, j2 in text_diff_opcodes(read["left"], read["right"]):
+                    if tag != "equal":
+                        hunks.append(len(rows))
+                    stats[tag] += max(i2 - i1, j2 - j1)
+                    for k in range(max(i2 - i1, j2 - j1)):
+                        rows.append((i1 + k if i1 + k < i2 else -1, j1 + k if j1 + k < j2 else -1, tag))
+                elapsed = time.perf_counter() - start
+                try:
+                    win.after(0, lambda: show(generation, read, rows, hunks, stats, elapsed))
+                except (tk.TclError, RuntimeError):
+                    pass # Fenêtre fermée entre-temps
+
+            threading.Thread(target=worker, daemon=True).start()
+
+        def show(generation, read, rows, hunks, stats, elapsed):
+            if generation != state["generation"] or not win.winfo_exists():
+                return
+            lines.update(read)
+            state["rows"], state["hunks"], state["top"] = rows, hunks, 0
+            summary_var.set(f"{len(hunks)} bloc(s) différent(s) : {stats['replace']} modifiée(s), "
+                            f"{stats['delete']} supprimée(s), {stats['insert']} ajoutée(s) "
+                            f"({elapsed:.2f} s)")
+            render()
+            if hunks:
+                jump(1)
+
+        def set_path(side, path):
+            if not path:
+                return
+            if path.startswith('{') and path.endswith('}'):
+                path = path[1:-1]
+            paths[side] = path
+            path_vars[side].set(path)
+            compare()
+
+        for side, label in (("left", "Gauche..."), ("right", "Droite...")):
+            tk.Button(toolbar, text=label, relief="flat", padx=8,
+                      command=lambda s=side: set_path(s, filedialog.askopenfilename(parent=win))).pack(side="left", padx=3)
+            texts[side].drop_target_register(DND_FILES)
+            texts[side].dnd_bind('<<Drop>>', lambda e, s=side: set_path(s, e.data))
+        tk.Button(toolbar, text="▲ Différence précédente", command=lambda: jump(-1), relief="flat", padx=8).pack(side="left", padx=(15, 3))
+        tk.Button(toolbar, text="▼ Différence suivante", command=lambda: jump(1), relief="flat", padx=8).pack(side="left", padx=3)
+        tk.Label(toolbar, textvariable=summary_var, bg="#ecf0f1", fg="#2c3e50").pack(side="left", padx=15)
+        tk.Button(toolbar, text="Fermer", command=win.destroy, bg="#95a5a6", fg="white", relief="flat", padx=10).pack(side="right", padx=5)
+        win.bind("<F7>", lambda e: jump(1))
+        win.bind("<Shift-F7>", lambda e: jump(-1))
+
+        for side in paths:
+            if paths[side]:
+                path_vars[side].set(paths[side])
+        compare()
+        return win, set_path
+
     def open_text_viewer(self, file_path, target_line=None):
         """
         Ouvre un Éditeur de texte simple pour les fichiers non-tabulaires (.py, .txt, .ini...).
         Permet la modification, l'enregistrement et la recherche/remplacement.
+        Les fichiers volumineux passent par open_large_text_viewer.
         """
+        try:
+            if os.path.getsize(file_path) >= self.LARGE_TEXT_BYTES:
+                self.open_large_text_viewer(file_path, target_line)
+                return
+        except OSError:
+            pass
         filename = os.path.basename(file_path)
-        
+
         # Création fenêtre
         viewer = tk.Toplevel(self.root)
         viewer.title(f"Éditeur Rapide - {filename}")
@@ -1727,6 +4776,7 @@ class DatEditor:
                     if txt_area.get(sel_start, sel_end).lower() == target.lower():
                         txt_area.delete(sel_start, sel_end)
                         txt_area.insert(sel_start, ent_replace.get())
+                        highlighter.schedule()
                         do_find() # Passe automatiquement au suivant
                 except tk.TclError:
                     # Rien n'est sélectionné, on lance juste une recherche
@@ -1749,9 +4799,10 @@ class DatEditor:
                     txt_area.insert(idx, replacement)
                     
                     # On avance l'index de la longueur du nouveau mot
-                    idx = f"{idx}+{len(replacement)}c" 
+                    idx = f"{idx}+{len(replacement)}c"
                     count += 1
-                    
+
+                highlighter.schedule()
                 messagebox.showinfo("Succès", f"{count} remplacements effectués.", parent=top)
 
             # Boutons d'action
@@ -1783,15 +4834,20 @@ class DatEditor:
         frame_txt.pack(fill="both", expand=True)
         
         txt_area = tk.Text(frame_txt, wrap="none", font=("Consolas", 10), undo=True)
-        
+
+        # Coloration des seules lignes visibles (défilement, frappe, redimensionnement)
+        highlighter = SyntaxHighlighter(txt_area, SyntaxHighlighter.mode_for(file_path))
+
         vsb = ttk.Scrollbar(frame_txt, orient="vertical", command=txt_area.yview)
         hsb = ttk.Scrollbar(frame_txt, orient="horizontal", command=txt_area.xview)
-        txt_area.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-        
+        txt_area.configure(yscrollcommand=lambda *args: (vsb.set(*args), highlighter.schedule()), xscrollcommand=hsb.set)
+        txt_area.bind("<KeyRelease>", highlighter.schedule)
+        txt_area.bind("<Configure>", highlighter.schedule)
+
         vsb.pack(side="right", fill="y")
         hsb.pack(side="bottom", fill="x")
         txt_area.pack(side="left", fill="both", expand=True)
-        
+
         # Binds Raccourcis
         viewer.bind("<Control-s>", save_changes)
         viewer.bind("<Control-f>", open_find_replace) # Raccourci classique de recherche
@@ -1815,10 +4871,259 @@ class DatEditor:
             messagebox.showerror("Erreur", f"Impossible de lire le fichier :\n{e}", parent=viewer)
             viewer.destroy()
 
+    def open_large_text_viewer(self, file_path, target_line=None):
+        """
+        Éditeur rapide pour fichier volumineux : le fichier reste en mmap, seule une fenêtre
+        de LARGE_TEXT_WINDOW lignes est chargée dans le widget (déplacée au défilement).
+        Recherche / remplacement sur les octets en arrière-plan, enregistrement par plages.
+        """
+        try:
+            large = LargeTextFile(file_path)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de lire le fichier :\n{e}")
+            return
+        filename = os.path.basename(file_path)
+        window = self.LARGE_TEXT_WINDOW
+        # Fenêtre affichée : lignes d'origine [first, last)
+        state = {"first": 0, "last": 0, "busy": False, "next_offset": 0}
+
+        viewer = tk.Toplevel(self.root)
+        viewer.title(f"Éditeur Rapide (gros fichier) - {filename}")
+        viewer.geometry("1000x700")
+
+        toolbar = tk.Frame(viewer, bg="#ecf0f1", pady=5, padx=5)
+        toolbar.pack(fill="x", side="top")
+        info_var = tk.StringVar()
+
+        frame_txt = tk.Frame(viewer)
+        frame_txt.pack(fill="both", expand=True)
+        txt_area = tk.Text(frame_txt, wrap="none", font=("Consolas", 10), undo=True)
+        vsb = ttk.Scrollbar(frame_txt, orient="vertical", command=txt_area.yview)
+        hsb = ttk.Scrollbar(frame_txt, orient="horizontal", command=txt_area.xview)
+        txt_area.tag_config("highlight_search", background="#ffeaa7", foreground="black")
+        txt_area.tag_config("found", background="yellow", foreground="black")
+        highlighter = SyntaxHighlighter(txt_area, SyntaxHighlighter.mode_for(file_path))
+
+        def update_info():
+            pending = " • modifications non enregistrées" if (large.patches or txt_area.edit_modified()) else ""
+            info_var.set(f"Lignes {state['first'] + 1}-{state['last']} / {large.line_count} "
+                         f"({large.size / (1024 * 1024):.0f} Mo){pending}")
+
+        def commit_window():
+            """Garde les modifications de la fenêtre affichée avant de la déplacer."""
+            if txt_area.edit_modified():
+                large.set_text(state["first"], state["last"], txt_area.get("1.0", "end-1c"))
+                txt_area.edit_modified(False)
+
+        def load_window(center_line):
+            """Charge la fenêtre de lignes autour de center_line (0-based) et y place le curseur."""
+            commit_window()
+            first = max(0, min(center_line - window // 2, large.line_count - window))
+            last = min(large.line_count, first + window)
+            first, last = large.covering(first, last)
+            state["first"], state["last"] = first, last
+            txt_area.delete("1.0", tk.END)
+            txt_area.insert("1.0", large.text(first, last))
+            txt_area.edit_reset()
+            txt_area.edit_modified(False)
+            highlighter.reset()
+            index = f"{center_line - first + 1}.0"
+            txt_area.mark_set("insert", index)
+            txt_area.see(index)
+            update_info()
+            return index
+
+        def on_yscroll(top, bottom):
+            vsb.set(top, bottom)
+            highlighter.schedule()
+            if state["busy"]:
+                return
+            # Bords de la fenêtre atteints : on charge la suite
+            if float(bottom) >= 0.999 and state["last"] < large.line_count:
+                state["busy"] = True
+                viewer.after_idle(lambda: (load_window(state["last"]), state.update(busy=False)))
+            elif float(top) <= 0.0 and state["first"] > 0:
+                state["busy"] = True
+                viewer.after_idle(lambda: (load_window(state["first"]), state.update(busy=False)))
+
+        txt_area.configure(yscrollcommand=on_yscroll, xscrollcommand=hsb.set)
+        vsb.pack(side="right", fill="y")
+        hsb.pack(side="bottom", fill="x")
+        txt_area.pack(side="left", fill="both", expand=True)
+        txt_area.bind("<<Modified>>", lambda e: update_info())
+        txt_area.bind("<KeyRelease>", highlighter.schedule)
+        txt_area.bind("<Configure>", highlighter.schedule)
+
+        def save_changes(event=None):
+            try:
+                commit_window()
+                count = large.save()
+                load_window(state["first"] + int(txt_area.index("insert").split(".")[0]) - 1)
+                messagebox.showinfo("Succès", f"Fichier '{filename}' enregistré ({count} zone(s) modifiée(s)).", parent=viewer)
+                return "break"
+            except Exception as e:
+                messagebox.showerror("Erreur", f"Impossible d'enregistrer :\n{e}", parent=viewer)
+
+        def go_to_line(event=None):
+            try:
+                line = int(entry_line.get())
+            except ValueError:
+                return
+            index = load_window(max(0, min(line, large.line_count) - 1))
+            txt_area.tag_remove("highlight_search", "1.0", tk.END)
+            txt_area.tag_add("highlight_search", index, f"{index} lineend")
+            txt_area.focus_set()
+
+        def open_find_replace(event=None):
+            top = tk.Toplevel(viewer)
+            top.title("Rechercher et Remplacer (fichier)")
+            top.geometry("400x190")
+            top.transient(viewer)
+            top.resizable(False, False)
+
+            tk.Label(top, text="Rechercher :").grid(row=0, column=0, padx=10, pady=10, sticky="e")
+            ent_find = tk.Entry(top, width=30)
+            ent_find.grid(row=0, column=1, padx=5, pady=10)
+            ent_find.focus_set()
+            tk.Label(top, text="Remplacer par :").grid(row=1, column=0, padx=10, pady=5, sticky="e")
+            ent_replace = tk.Entry(top, width=30)
+            ent_replace.grid(row=1, column=1, padx=5, pady=5)
+            status_var = tk.StringVar(value="Recherche sur le fichier enregistré (insensible à la casse).")
+            tk.Label(top, textvariable=status_var, fg="#7f8c8d", font=("Segoe UI", 8)).grid(row=3, column=0, columnspan=2)
+
+            def compile_target():
+                target = ent_find.get()
+                if not target:
+                    return None
+                return re.compile(re.escape(target.encode(LargeTextFile.ENCODING, errors="replace")), re.IGNORECASE)
+
+            def do_find():
+                pattern = compile_target()
+                if pattern is None or state["busy"]:
+                    return
+                state["busy"] = True
+                status_var.set("Recherche en cours...")
+                start = state["next_offset"]
+
+                def worker():
+                    offset = large.find(pattern, start)
+                    wrapped = False
+                    if offset is None and start > 0:
+                        offset, wrapped = large.find(pattern, 0), True
+                    viewer.after(0, lambda: show_match(offset, wrapped, len(ent_find.get().encode(LargeTextFile.ENCODING, errors="replace"))))
+
+                threading.Thread(target=worker, daemon=True).start()
+
+            def show_match(offset, wrapped, length):
+                state["busy"] = False
+                if not top.winfo_exists():
+                    return
+                if offset is None:
+                    status_var.set("Aucune occurrence.")
+                    return
+                line = large.line_at(offset)
+                column = offset - large.line_offset(line)
+                index = load_window(line)
+                start_idx = f"{index.split('.')[0]}.{column}"
+                end_idx = f"{start_idx}+{length}c"
+                txt_area.tag_remove("found", "1.0", tk.END)
+                txt_area.tag_remove("sel", "1.0", tk.END)
+                txt_area.tag_add("found", start_idx, end_idx)
+                txt_area.tag_add("sel", start_idx, end_idx)
+                txt_area.see(start_idx)
+                state["next_offset"] = offset + max(1, length)
+                status_var.set(f"Ligne {line + 1}" + (" (reprise au début)" if wrapped else ""))
+
+            def do_replace():
+                # Remplacement dans la fenêtre affichée (enregistré comme une modification de plage)
+                try:
+                    sel_start = txt_area.index("sel.first")
+                    sel_end = txt_area.index("sel.last")
+                    if txt_area.get(sel_start, sel_end).lower() == ent_find.get().lower():
+                        txt_area.delete(sel_start, sel_end)
+                        txt_area.insert(sel_start, ent_replace.get())
+                        highlighter.schedule()
+                except tk.TclError:
+                    pass
+                do_find()
+
+            def do_replace_all():
+                pattern = compile_target()
+                if pattern is None or state["busy"]:
+                    return
+                if not messagebox.askyesno("Tout remplacer",
+                                           "Le fichier est réécrit sur disque (modifications en cours enregistrées d'abord).\nContinuer ?",
+                                           parent=top):
+                    return
+                try:
+                    commit_window()
+                    large.save()
+                except Exception as e:
+                    messagebox.showerror("Erreur", f"Impossible d'enregistrer :\n{e}", parent=top)
+                    return
+                replacement = ent_replace.get().encode(LargeTextFile.ENCODING, errors="replace")
+                state["busy"] = True
+                txt_area.configure(state="disabled")
+                status_var.set("Remplacement en cours...")
+
+                def worker():
+                    try:
+                        count, error = large.replace_all(pattern, replacement), None
+                    except Exception as e:
+                        count, error = 0, e
+                    viewer.after(0, lambda: finish_replace_all(count, error))
+
+                threading.Thread(target=worker, daemon=True).start()
+
+            def finish_replace_all(count, error):
+                state["busy"] = False
+                txt_area.configure(state="normal")
+                state["next_offset"] = 0
+                load_window(state["first"])
+                if error is not None:
+                    messagebox.showerror("Erreur", str(error), parent=viewer)
+                elif top.winfo_exists():
+                    status_var.set(f"{count} remplacement(s) effectué(s).")
+
+            btn_frame = tk.Frame(top)
+            btn_frame.grid(row=2, column=0, columnspan=2, pady=10)
+            tk.Button(btn_frame, text="Rechercher Suivant", command=do_find, bg="#3498db", fg="white", relief="flat", padx=5).pack(side="left", padx=5)
+            tk.Button(btn_frame, text="Remplacer", command=do_replace, relief="flat", padx=5).pack(side="left", padx=5)
+            tk.Button(btn_frame, text="Remplacer Tout", command=do_replace_all, bg="#e67e22", fg="white", relief="flat", padx=5).pack(side="left", padx=5)
+            top.bind("<Return>", lambda e: do_find())
+
+        def close_viewer():
+            commit_window()
+            if large.patches and messagebox.askyesno("Modifications", "Enregistrer les modifications ?", parent=viewer):
+                save_changes()
+            large.close()
+            viewer.destroy()
+
+        tk.Button(toolbar, text="💾 Enregistrer", command=save_changes,
+                  bg=self.COLORS["success"], fg="white", font=("Segoe UI", 9, "bold"), relief="flat", padx=10).pack(side="left", padx=5)
+        tk.Button(toolbar, text="🔍 Rechercher / Remplacer", command=open_find_replace,
+                  bg="#3498db", fg="white", font=("Segoe UI", 9, "bold"), relief="flat", padx=10).pack(side="left", padx=5)
+        tk.Label(toolbar, text="Ligne :", bg="#ecf0f1").pack(side="left", padx=(10, 2))
+        entry_line = tk.Entry(toolbar, width=10)
+        entry_line.pack(side="left")
+        entry_line.bind("<Return>", go_to_line)
+        tk.Button(toolbar, text="Fermer", command=close_viewer, bg="#95a5a6", fg="white", relief="flat", padx=10).pack(side="right", padx=5)
+        tk.Label(toolbar, textvariable=info_var, bg="#ecf0f1", fg="#7f8c8d", font=("Segoe UI", 8)).pack(side="left", padx=10)
+
+        viewer.bind("<Control-s>", save_changes)
+        viewer.bind("<Control-f>", open_find_replace)
+        viewer.protocol("WM_DELETE_WINDOW", close_viewer)
+
+        if target_line:
+            entry_line.insert(0, str(target_line))
+            go_to_line()
+        else:
+            load_window(0)
+
     def load_file_direct(self, file_path, target_line=None):
         """
         Charge un fichier depuis la recherche globale.
-        - Si .dat/.csv/.xlsx -> Ouvre dans le TABLEAU PRINCIPAL (avec colonne Ligne).
+        - Si .dat/.csv/.xlsx -> Ouvre dans le TABLEAU PRINCIPAL (avec colonne virtuelle Ligne).
         - Sinon -> Ouvre dans le TEXT VIEWER (nouvelle fenêtre).
         """
         ext = os.path.splitext(file_path)[1].lower()
@@ -1834,6 +5139,10 @@ class DatEditor:
             return
 
         # === CAS FICHIER TABLEAU (Code précédent) ===
+        # Le module affiché reste en cache (modifications comprises, avec sa pile d'annulation)
+        if self.current_module is not None:
+            self._stash_current_module()
+            self.undo_stack = []
         try:
             self.current_file_path = file_path
             self.selected_folder = os.path.dirname(file_path)
@@ -1873,23 +5182,30 @@ class DatEditor:
                     elif len(row) > len(self.headers): # Cas CSV malformé
                          while len(self.headers) < len(row): self.headers.append(f"Col_{len(self.headers)+1}")
 
-                # === AJOUT COLONNE "LIGNE" (Seulement pour recherche globale) ===
-                if target_line is not None:
-                    self.headers.insert(0, "Ligne")
-                    for i, row in enumerate(self.data):
-                        row.insert(0, str(i + 1))
             else:
                 if not self.headers: self.headers = []
 
             # 3. Affichage
-            self.visible_columns = self.headers
+            self.data = RowStore(self.data)
+            self.selection = SelectionModel()
+            self.virtual_columns = {}
+            self.value_filters = {}
+            self.visible_columns = list(self.headers)
+            # Colonne "Ligne" (recherche globale) : virtuelle, les données restent celles du fichier
+            if target_line is not None:
+                self.virtual_columns["Ligne"] = self._virtual_line_numbers
+                self.visible_columns.insert(0, "Ligne")
+            for combobox in [self.column_filter1, self.column_filter2, self.column_filter3]:
+                combobox['values'] = self.visible_columns
             self.filtered_indices = list(range(len(self.data)))
+            self.current_module = None
+            self._on_structure_changed()
             self.refresh_tree()
-            
+
             self.root.title(f"Éditeur - {filename}")
             self.last_search_index = -1
             self.modified = False
-            
+
             # === SCROLL VERS LA CIBLE ===
             if target_line is not None:
                 try:
@@ -1904,6 +5220,8 @@ class DatEditor:
                 except: pass
 
         except Exception as e:
+            if not isinstance(self.data, RowStore):
+                self.data = RowStore(self.data)
             messagebox.showerror("Erreur", f"Impossible d'ouvrir le tableau :\n{e}")
 
     def open_global_search_window(self):
@@ -2139,21 +5457,47 @@ class DatEditor:
     def show_context_menu(self, event):
         row_id = self.tree.identify_row(event.y)
         col_id = self.tree.identify_column(event.x)
+        # Clic droit sur un titre : filtre par valeurs distinctes (façon Excel)
+        if self.tree.identify_region(event.x, event.y) == "heading":
+            try:
+                col_name = self.visible_columns[int(col_id.replace('#', '')) - 1]
+            except (ValueError, IndexError):
+                return
+            self.open_value_filter(col_name, event.x_root, event.y_root)
+            return
         if not row_id: return
 
-        if row_id not in self.tree.selection():
-            self.tree.selection_set(row_id)
+        if int(row_id) not in self.selection:
+            self.selection.replace([int(row_id)])
+            self._sync_tree_selection()
         
         try:
             col_num = int(col_id.replace('#', '')) - 1
         except: return
 
-        display_cols = [c for c in self.headers if c in self.visible_columns]
+        display_cols = list(self.visible_columns)
         if col_num < 0 or col_num >= len(display_cols): return
         col_name = display_cols[col_num]
 
         menu = tk.Menu(self.root, tearoff=0)
 
+        # --- 0. SÉLECTION LOGIQUE (toutes les lignes filtrées, même hors fenêtre) ---
+        menu.add_command(label=f"Sélectionner tout ({len(self.filtered_indices)} lignes filtrées)",
+                         command=self.select_all_filtered)
+        menu.add_command(label="Inverser la sélection", command=self.invert_selection)
+        menu.add_command(label=f"Exporter la sélection ({len(self.selection)} lignes)...",
+                         command=self.export_selection)
+        menu.add_separator()
+
+        if col_name in self.virtual_columns:
+            # Colonne virtuelle : lecture seule
+            menu.add_command(label=f"Copier colonne '{col_name}' (Sélection)",
+                             command=lambda: self.copy_block_to_clipboard(col_name, col_name))
+            menu.add_command(label=f"Retirer la colonne virtuelle '{col_name}'",
+                             command=lambda: self.remove_virtual_column(col_name))
+            menu.tk_popup(event.x_root, event.y_root)
+            return
+
         # --- 1. COPIE VERTICALE (NOUVEAU) ---
         # Astuce : On appelle copy_block avec start_col == end_col
         menu.add_command(label=f"Copier colonne '{col_name}' (Sélection)", 
@@ -2194,17 +5538,23 @@ class DatEditor:
         menu.add_separator()
         menu.add_command(label=f"Propager '{col_name}'", command=lambda: self.apply_bulk_edit(row_id, col_name, "copy"))
         menu.add_command(label=f"Incrémenter '{col_name}'", command=lambda: self.apply_bulk_edit(row_id, col_name, "increment"))
+        menu.add_command(label=f"Remplir '{col_name}' (modèle)...", command=lambda: self.open_fill_window(row_id, col_name))
         
         menu.add_separator()
-        menu.add_command(label=f"Rechercher/Remplacer dans '{col_name}'", 
+        menu.add_command(label=f"Rechercher/Remplacer dans '{col_name}'",
                          command=lambda: self.open_search_replace_popup(col_name))
+        menu.add_command(label=f"Statistiques '{col_name}'...", command=lambda: self.open_column_stats(col_name))
+
+        menu.add_separator()
+        menu.add_command(label="Où est utilisée cette variable ?",
+                         command=lambda: self.open_where_used(row_id, col_name))
         
         menu.tk_popup(event.x_root, event.y_root)
 
     def open_search_replace_popup(self, col_name):
         """Pop-up Rechercher/Remplacer ciblée sur la colonne et les lignes sélectionnées."""
-        selected_items = self.tree.selection()
-        if not selected_items: return
+        selected_positions = self._selected_positions()
+        if not selected_positions: return
 
         top = tk.Toplevel(self.root)
         top.title(f"Remplacer dans la colonne : {col_name}")
@@ -2224,7 +5574,7 @@ class DatEditor:
 
         # Données
         col_idx = self.headers.index(col_name)
-        self.search_indices = sorted([int(item) for item in selected_items])
+        self.search_indices = sorted(selected_positions)
         self.current_search_pos = 0
 
         def do_replace_next():
@@ -2243,24 +5593,26 @@ class DatEditor:
                     
                     if find_str in current_val:
                         # Petite sauvegarde undo unitaire pour le "pas à pas"
-                        self.undo_stack.append([(r_idx, col_idx, current_val)]) 
+                        self.undo_stack.append([("cell", self.data.rid(r_idx), col_idx, current_val)])
                         
                         # Remplacement
                         new_val = current_val.replace(find_str, repl_str, 1) # Remplace 1ère occurrence ou toutes ? Généralement toutes dans la cellule
                         new_val = current_val.replace(find_str, repl_str)
                         self.data[r_idx][col_idx] = new_val
+                        self._on_cell_changed(r_idx, col_idx, current_val, new_val)
                         
                         # Update Visuel
-                        if str(r_idx) in self.tree.get_children():
-                            vals = list(self.tree.item(str(r_idx), 'values'))
+                        iid = self._iid(r_idx)
+                        if self.tree.exists(iid):
+                            vals = list(self.tree.item(iid, 'values'))
                             # Trouver index visuel
-                            display_cols = [c for c in self.headers if c in self.visible_columns]
+                            display_cols = self.visible_columns
                             if col_name in display_cols:
                                 v_idx = display_cols.index(col_name)
                                 vals[v_idx] = new_val
-                                self.tree.item(str(r_idx), values=vals)
-                                self.tree.see(str(r_idx))
-                                self.tree.selection_set(str(r_idx))
+                                self.tree.item(iid, values=vals)
+                                self.tree.see(iid)
+                                self.tree.selection_set(iid)
                         
                         self.modified = True
                         self.current_search_pos = i + 1
@@ -2277,20 +5629,14 @@ class DatEditor:
             repl_str = entry_replace.get()
             if not find_str: return
 
-            count = 0
-            # SAUVEGARDE UNDO MASSIVE
-            self.save_full_state_for_undo()
-
-            for r_idx in self.search_indices:
-                if r_idx < len(self.data):
-                    current_val = str(self.data[r_idx][col_idx])
-                    if find_str in current_val:
-                        self.data[r_idx][col_idx] = current_val.replace(find_str, repl_str)
-                        count += 1
+            # Motif compilé une fois, limité à la colonne ; index Nom/Tagname utilisé s'il la couvre
+            engine = ReplaceEngine(find_str, repl_str, case_sensitive=True)
+            positions = [r for r in self.search_indices if r < len(self.data)]
+            changes, _ = engine.scan(self.data, positions, [col_idx], index=self.index)
+            count = len(changes)
             
             if count > 0:
-                self.modified = True
-                self.refresh_tree() # Refresh global pour être sûr
+                self._apply_replacements(changes)
                 messagebox.showinfo("Succès", f"{count} remplacements effectués.", parent=top)
                 top.destroy()
             else:
@@ -2308,29 +5654,27 @@ class DatEditor:
     def insert_rows(self, target_row_id, count, position='below'):
         """Insère des lignes vides avec support Undo."""
         try:
-            # 1. SAUVEGARDE UNDO AVANT MODIF
-            # On utilise votre méthode existante ou on crée une snapshot manuelle
-            self.save_full_state_for_undo() # Voir méthode ci-dessous si elle n'existe pas
-
-            target_idx = int(target_row_id)
+            target_idx = self._row_index(target_row_id)
             insert_idx = target_idx if position == 'above' else target_idx + 1
             
-            # 2. Création
+            # 1. Création
             empty_row = [""] * len(self.headers)
             new_rows = [list(empty_row) for _ in range(count)]
             
-            # 3. Insertion
-            self.data[insert_idx:insert_idx] = new_rows
+            # 2. Insertion en bloc (les rid des autres lignes ne bougent pas)
+            new_ids = self.data.insert_rows(insert_idx, new_rows)
+            self.undo_stack.append([("insert", rid) for rid in new_ids])
+            self._on_structure_changed()
             self.modified = True
             
-            # 4. Refresh complet nécessaire car les IDs changent
+            # 3. Refresh : les positions ont changé
             self.filtered_indices = list(range(len(self.data)))
-            self.refresh_tree()
+            self.refresh_tree(focus_idx=insert_idx)
             
-            # 5. Scroll
+            # 4. Scroll
             try:
-                self.tree.see(str(insert_idx))
-                self.tree.selection_set(str(insert_idx))
+                self.tree.see(str(new_ids[0]))
+                self.tree.selection_set(str(new_ids[0]))
             except: pass
             
             self.status_var.set(f"{count} lignes insérées.")
@@ -2341,19 +5685,25 @@ class DatEditor:
     def copy_block_to_clipboard(self, start_col, end_col):
         """Copie le bloc vers le presse-papier système."""
         try:
-            selected_items = self.tree.selection()
-            if not selected_items: return
+            selected_positions = self._selected_positions()
+            if not selected_positions: return
 
-            display_cols = [c for c in self.headers if c in self.visible_columns]
+            display_cols = list(self.visible_columns)
             idx_s = display_cols.index(start_col)
             idx_e = display_cols.index(end_col)
+
+            # Colonnes virtuelles : calculées en un lot pour toute la sélection
+            virtual = {c: self.virtual_columns[c](selected_positions)
+                       for c in display_cols[idx_s:idx_e + 1] if c in self.virtual_columns}
             
             lines = []
-            for item in selected_items:
-                r_idx = int(item)
+            for k, r_idx in enumerate(selected_positions):
                 row_vals = []
                 for i in range(idx_s, idx_e + 1):
                     c_name = display_cols[i]
+                    if c_name in virtual:
+                        row_vals.append(str(virtual[c_name][k]))
+                        continue
                     c_idx = self.headers.index(c_name)
                     val = str(self.data[r_idx][c_idx]) if c_idx < len(self.data[r_idx]) else ""
                     row_vals.append(val)
@@ -2369,18 +5719,16 @@ class DatEditor:
             messagebox.showerror("Erreur", f"Echec copie : {e}")
 
     def paste_from_clipboard(self, start_row_id, start_col_name):
-        """Collage avec Undo."""
+        """Collage avec Undo (anciennes valeurs des cellules touchées uniquement)."""
         try:
-            # 1. SAUVEGARDE UNDO
-            self.save_full_state_for_undo()
-
             content = self.root.clipboard_get()
             rows_to_paste = [line.split('\t') for line in content.splitlines()]
             if not rows_to_paste: return
 
-            start_r = int(start_row_id)
+            undo_batch = []
+            start_r = self._row_index(start_row_id)
             start_c = self.headers.index(start_col_name)
-            display_cols = [c for c in self.headers if c in self.visible_columns]
+            display_cols = self.visible_columns
 
             for r_off, row_data in enumerate(rows_to_paste):
                 curr_r = start_r + r_off
@@ -2392,17 +5740,23 @@ class DatEditor:
                     if val.startswith('"') and val.endswith('"'): val = val[1:-1]
                     
                     while len(self.data[curr_r]) <= curr_c: self.data[curr_r].append("")
+                    old = self.data[curr_r][curr_c]
+                    undo_batch.append(("cell", self.data.rid(curr_r), curr_c, old))
                     self.data[curr_r][curr_c] = val
+                    self._on_cell_changed(curr_r, curr_c, old, val)
                     
                     col_real_name = self.headers[curr_c]
                     if col_real_name in display_cols:
                         v_idx = display_cols.index(col_real_name)
-                        if self.tree.exists(str(curr_r)):
-                            vals = list(self.tree.item(str(curr_r), 'values'))
+                        iid = self._iid(curr_r)
+                        if self.tree.exists(iid):
+                            vals = list(self.tree.item(iid, 'values'))
                             if v_idx < len(vals):
                                 vals[v_idx] = val
-                                self.tree.item(str(curr_r), values=vals)
+                                self.tree.item(iid, values=vals)
             
+            if undo_batch:
+                self.undo_stack.append(undo_batch)
             self.modified = True
             self.status_var.set("Collage effectué (Undo possible).")
         except Exception as e:
@@ -2413,80 +5767,183 @@ class DatEditor:
         À appeler AVANT une grosse modification (Coller bloc, Insérer lignes).
         Sauvegarde une copie complète des données.
         """
-        # On fait une copie profonde (Deep Copy) des données
-        snapshot = [row[:] for row in self.data]
+        # On fait une copie profonde (Deep Copy) des données, rid compris
+        snapshot = self.data.copy()
         self.undo_stack.append(snapshot)
-        
-        # Limite de sécurité (ex: 20 derniers états) pour ne pas saturer la RAM
-        if len(self.undo_stack) > 20:
-            self.undo_stack.pop(0)
-            
-    def apply_bulk_edit(self, source_item_id, col_name, mode="copy"):
-        """Applique la modification de masse sur le tableau principal."""
-        try:
-            # 1. Index réel de la colonne
-            if col_name not in self.headers: return
-            col_index = self.headers.index(col_name)
-            
-            # 2. Valeur source
-            row_index = int(source_item_id)
-            source_value = self.data[row_index][col_index] if col_index < len(self.data[row_index]) else ""
-            
-            # Préparation pour incrémentation
-            start_num = 0
-            is_number = False
-            prefix = ""
-            
-            if mode == "increment":
-                if str(source_value).isdigit():
-                    start_num = int(source_value)
-                    is_number = True
-                else:
-                    # Gestion des suffixes (ex: Capteur_1 -> Capteur_2)
-                    match = re.search(r'(\d+)$', str(source_value))
-                    if match:
-                        start_num = int(match.group(1))
-                        prefix = str(source_value)[:match.start()]
-                        is_number = "suffix"
-                    else:
-                        messagebox.showwarning("Erreur", "Valeur non numérique, impossible d'incrémenter.", parent=self.root)
-                        return
-
-            # 3. Application à la sélection
-            selected_items = self.tree.selection()
+        
+        # Limite de sécurité (ex: 20 derniers états) pour ne pas saturer la RAM
+        if len(self.undo_stack) > 20:
+            self.undo_stack.pop(0)
             
-            for i, item_id in enumerate(selected_items):
-                target_idx = int(item_id) # L'ID du treeview correspond à l'index dans self.data
-                
-                # Calcul de la nouvelle valeur
-                new_val = source_value
-                if mode == "increment":
-                    if is_number == True:
-                        new_val = str(start_num + i)
-                    elif is_number == "suffix":
-                        new_val = f"{prefix}{start_num + i}"
+    def apply_bulk_edit(self, source_item_id, col_name, mode="copy"):
+        """Applique la modification de masse sur le tableau principal."""
+        try:
+            # 1. Index réel de la colonne
+            if col_name not in self.headers: return
+            col_index = self.headers.index(col_name)
+            
+            # 2. Valeur source
+            row_index = self._row_index(source_item_id)
+            source_value = self.data[row_index][col_index] if col_index < len(self.data[row_index]) else ""
+            
+            # Traduction en modèle de remplissage (copie ou incrémentation du suffixe numérique)
+            pattern = FillPattern(FillPattern.literal(source_value), self.headers)
+            if mode == "increment":
+                match = re.search(r'(\d+)$', str(source_value))
+                if not match:
+                    messagebox.showwarning("Erreur", "Valeur non numérique, impossible d'incrémenter.", parent=self.root)
+                    return
+                digits = match.group(1)
+                # Zéros de tête conservés (PMP_007 -> PMP_008)
+                spec = f":0{len(digits)}d" if digits.startswith("0") and len(digits) > 1 else ""
+                prefix = FillPattern.literal(str(source_value)[:match.start()])
+                pattern = FillPattern(prefix + "{n" + spec + "}", self.headers, start=int(digits))
 
-                # A. Mise à jour des données (Mémoire)
-                # On s'assure que la ligne est assez longue
-                while len(self.data[target_idx]) <= col_index:
-                    self.data[target_idx].append("")
-                
-                self.data[target_idx][col_index] = str(new_val)
-                
-                # B. Mise à jour visuelle (Treeview)
-                # On récupère les valeurs actuelles affichées pour ne changer que la cellule cible
-                current_values = list(self.tree.item(item_id, 'values'))
-                
-                # On doit trouver l'index VISUEL (car certaines colonnes peuvent être masquées)
-                display_cols = [c for c in self.headers if c in self.visible_columns]
-                if col_name in display_cols:
-                    visual_index = display_cols.index(col_name)
-                    if visual_index < len(current_values):
-                        current_values[visual_index] = str(new_val)
-                        self.tree.item(item_id, values=current_values)
+            # Application à la sélection logique (y compris les lignes hors fenêtre)
+            positions = self._selected_positions()
+            self._fill_column(col_index, positions, pattern.values(self.data, positions))
 
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la modification : {e}", parent=self.root)
+
+    def _fill_column(self, col_index, positions, values):
+        """
+        Écrit une série de valeurs dans une colonne : une seule entrée d'annulation,
+        et seules les lignes affichées dans le Treeview sont mises à jour.
+        """
+        undo_batch = []
+        changed = []
+        data = self.data
+        for pos, val in zip(positions, values):
+            row = data[pos]
+            while len(row) <= col_index:
+                row.append("")
+            old = row[col_index]
+            if old == val:
+                continue
+            undo_batch.append(("cell", data.rid(pos), col_index, old))
+            row[col_index] = val
+            self._on_cell_changed(pos, col_index, old, val)
+            changed.append((pos, val))
+        if not undo_batch:
+            return 0
+
+        self.undo_stack.append(undo_batch)
+        self.modified = True
+        col_name = self.headers[col_index]
+        if col_name in self.visible_columns:
+            displayed = set(self.tree.get_children())
+            for pos, val in changed:
+                iid = self._iid(pos)
+                if iid in displayed:
+                    self.tree.set(iid, col_name, val)
+        self.update_status_bar()
+        return len(changed)
+
+    def open_fill_window(self, source_item_id, col_name):
+        """Remplissage d'une colonne par un modèle (PMP_{n:03d}, {Nom}_DEF...) sur un ensemble de lignes."""
+        if col_name not in self.headers:
+            return
+        col_index = self.headers.index(col_name)
+        source_idx = self._row_index(source_item_id)
+        source_row = self.data[source_idx]
+        level_indices = level_column_indices(self.headers)
+        source_path = row_path(source_row, level_indices)
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Remplir la colonne : {col_name}")
+        win.geometry("520x380")
+        win.configure(bg="white")
+        win.transient(self.root)
+
+        form = tk.Frame(win, bg="white")
+        form.pack(fill='x', padx=10, pady=10)
+        tk.Label(form, text="Modèle :", bg="white").grid(row=0, column=0, sticky='e', padx=5, pady=5)
+        entry_template = tk.Entry(form, width=40)
+        entry_template.grid(row=0, column=1, columnspan=3, sticky='w', padx=5, pady=5)
+        source_value = source_row[col_index] if col_index < len(source_row) else ""
+        entry_template.insert(0, FillPattern.literal(source_value))
+        entry_template.focus_set()
+
+        tk.Label(form, text="Début :", bg="white").grid(row=1, column=0, sticky='e', padx=5)
+        entry_start = tk.Entry(form, width=8)
+        entry_start.insert(0, "1")
+        entry_start.grid(row=1, column=1, sticky='w', padx=5)
+        tk.Label(form, text="Pas :", bg="white").grid(row=1, column=2, sticky='e', padx=5)
+        entry_step = tk.Entry(form, width=8)
+        entry_step.insert(0, "1")
+        entry_step.grid(row=1, column=3, sticky='w', padx=5)
+        tk.Label(form, text="{n} compteur, {n:03d} sur 3 chiffres, {i} rang, {Colonne} valeur d'une autre colonne",
+                 bg="white", fg="#7f8c8d", font=("Segoe UI", 8)).grid(row=2, column=0, columnspan=4, sticky='w', pady=5)
+
+        # Ensemble de lignes visé
+        scope_var = tk.StringVar(value="selection" if len(self.selection) > 1 else "filter")
+        scope_frame = tk.LabelFrame(win, text="Lignes", bg="white")
+        scope_frame.pack(fill='x', padx=10, pady=5)
+        tk.Radiobutton(scope_frame, text=f"Sélection ({len(self._selected_positions())})",
+                       variable=scope_var, value="selection", bg="white").pack(anchor='w')
+        tk.Radiobutton(scope_frame, text=f"Lignes filtrées ({len(self.filtered_indices)})",
+                       variable=scope_var, value="filter", bg="white").pack(anchor='w')
+        branch_frame = tk.Frame(scope_frame, bg="white")
+        branch_frame.pack(anchor='w')
+        tk.Radiobutton(branch_frame, text="Branche de la ligne, niveaux n1 à n", variable=scope_var,
+                       value="branch", bg="white", state="normal" if source_path else "disabled").pack(side='left')
+        depth_var = tk.IntVar(value=max(1, len(source_path) - 1))
+        tk.Spinbox(branch_frame, from_=1, to=max(1, len(source_path)), textvariable=depth_var, width=3).pack(side='left')
+
+        preview_var = tk.StringVar(value="")
+        tk.Label(win, textvariable=preview_var, bg="white", fg="#2c3e50", justify='left',
+                 wraplength=480).pack(anchor='w', padx=10, pady=5)
+
+        def number(text):
+            text = text.strip() or "0"
+            return float(text) if "." in text else int(text)
+
+        def build():
+            """(modèle, positions) selon le formulaire ; lève ValueError si invalide."""
+            pattern = FillPattern(entry_template.get(), self.headers,
+                                  start=number(entry_start.get()), step=number(entry_step.get()))
+            scope = scope_var.get()
+            if scope == "selection":
+                positions = self._selected_positions()
+            elif scope == "branch":
+                positions = branch_positions(self.data, level_indices, source_path[:depth_var.get()])
+            else:
+                positions = list(self.filtered_indices)
+            return pattern, positions
+
+        def preview(event=None):
+            try:
+                pattern, positions = build()
+                sample = pattern.values(self.data, positions[:5])
+            except (ValueError, tk.TclError) as e:
+                preview_var.set(f"⚠ {e}")
+                return
+            more = " ..." if len(positions) > 5 else ""
+            preview_var.set(f"{len(positions)} ligne(s) : " + ", ".join(sample) + more)
+
+        def apply():
+            try:
+                pattern, positions = build()
+                values = pattern.values(self.data, positions)
+            except (ValueError, tk.TclError) as e:
+                messagebox.showerror("Modèle invalide", str(e), parent=win)
+                return
+            count = self._fill_column(col_index, positions, values)
+            self.status_var.set(f"Remplissage de '{col_name}' : {count} cellule(s) modifiée(s).")
+            win.destroy()
+
+        for widget in (entry_template, entry_start, entry_step):
+            widget.bind("<KeyRelease>", preview)
+        scope_var.trace_add("write", lambda *args: preview())
+        depth_var.trace_add("write", lambda *args: preview())
+        preview()
+
+        btn_frame = tk.Frame(win, bg="white")
+        btn_frame.pack(pady=10)
+        tk.Button(btn_frame, text="Remplir", bg=self.COLORS["warning"], fg="white", relief="flat",
+                  padx=10, command=apply).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Fermer", command=win.destroy).pack(side='left', padx=10)
             
     def _configure_styles(self):
         style = ttk.Style()
@@ -2604,7 +6061,9 @@ class DatEditor:
         self.tree["columns"] = self.visible_columns
     
         for col in self.visible_columns:
-            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c))
+            # ▼ : filtre par valeurs actif (clic droit sur le titre pour le modifier)
+            self.tree.heading(col, text=f"{col} ▼" if col in self.value_filters else col,
+                              command=lambda c=col: self.sort_by_column(c))
             self.tree.column(col, width=150, anchor='center', stretch=True)
     
         # === OPTIMISATION FENÊTRAGE ===
@@ -2626,22 +6085,34 @@ class DatEditor:
         
         # Sélection du morceau de données à afficher
         indices_to_display = self.filtered_indices[start_index:end_index]
+        module_issues = self.cell_issues.get(self.current_module, {})
         
+        # Accès par colonne calculé une fois : index réel, ou valeurs d'une colonne virtuelle
+        getters = []
+        for col in self.visible_columns:
+            if col in self.virtual_columns:
+                getters.append((None, self.virtual_columns[col](indices_to_display)))
+            else:
+                getters.append((self.headers.index(col) if col in self.headers else -1, None))
+
         count = start_index
-        for real_index in indices_to_display:
+        selected_iids = []
+        for k, real_index in enumerate(indices_to_display):
             row = self.data[real_index]
-            values = []
-            for col in self.visible_columns:
-                try:
-                    col_idx = self.headers.index(col)
-                    val = row[col_idx] if col_idx < len(row) else ""
-                    values.append(val)
-                except ValueError:
-                    values.append("")
+            values = [vals[k] if idx is None else (row[idx] if 0 <= idx < len(row) else "")
+                      for idx, vals in getters]
             
             tag = 'evenrow' if count % 2 == 0 else 'oddrow'
-            self.tree.insert("", "end", iid=str(real_index), values=values, tags=(tag,))
+            tags = (tag, 'issue') if real_index in module_issues else (tag,)
+            rid = self.data.rid(real_index)
+            self.tree.insert("", "end", iid=str(rid), values=values, tags=tags)
+            if rid in self.selection:
+                selected_iids.append(str(rid))
             count += 1
+
+        # La sélection logique est reflétée sur les lignes de la fenêtre affichée
+        self._pushed_selection = set(selected_iids)
+        self.tree.selection_set(selected_iids)
     
         # Mise à jour status bar avec info de pagination
         self.update_status_bar(display_info=(start_index, end_index))
@@ -2654,7 +6125,7 @@ class DatEditor:
     
         win = tk.Toplevel(self.root)
         win.title("Recherche / Remplacement")
-        win.geometry("500x200")
+        win.geometry("560x460")
         win.configure(bg="white")
     
         tk.Label(win, text="Rechercher :", bg="white").pack(anchor='w', padx=10, pady=5)
@@ -2664,21 +6135,75 @@ class DatEditor:
         tk.Label(win, text="Remplacer par (optionnel) :", bg="white").pack(anchor='w', padx=10, pady=5)
         replace_entry = ttk.Entry(win)
         replace_entry.pack(fill='x', padx=10)
+
+        # ---- Options ----
+        opt_frame = tk.Frame(win, bg="white")
+        opt_frame.pack(fill='x', padx=10, pady=8)
+        regex_var = tk.BooleanVar(value=False)
+        word_var = tk.BooleanVar(value=False)
+        case_var = tk.BooleanVar(value=False) # Recherche historique insensible à la casse
+        tk.Checkbutton(opt_frame, text="Regex", variable=regex_var, bg="white").pack(side='left')
+        tk.Checkbutton(opt_frame, text="Mot entier", variable=word_var, bg="white").pack(side='left', padx=5)
+        tk.Checkbutton(opt_frame, text="Respecter la casse", variable=case_var, bg="white").pack(side='left', padx=5)
+
+        all_cols = "(Toutes les colonnes)"
+        tk.Label(opt_frame, text="Colonne :", bg="white").pack(side='left', padx=(15, 2))
+        # Colonnes réelles seulement : les colonnes virtuelles ne sont ni cherchées ni remplacées
+        col_combo = ttk.Combobox(opt_frame, values=[all_cols] + [c for c in self.visible_columns if c in self.headers],
+                                 state="readonly", width=18)
+        col_combo.set(all_cols)
+        col_combo.pack(side='left')
+
+        # ---- Aperçu ----
+        summary_var = tk.StringVar(value="")
+        tk.Label(win, textvariable=summary_var, bg="white", fg="#2c3e50", font=("Segoe UI", 9, "bold")).pack(anchor='w', padx=10)
+        preview_list = tk.Listbox(win, height=8, font=("Consolas", 9))
+        preview_list.pack(fill='both', expand=True, padx=10, pady=5)
     
         # État de la recherche
         if not hasattr(self, "search_state"):
             self.search_state = {"search": None, "last_index": -1, "filtered_indices": []}
+
+        def build_engine():
+            """Compile le motif une seule fois selon les options ; None si invalide."""
+            search = search_entry.get()
+            if not search:
+                return None
+            try:
+                return ReplaceEngine(search, replace_entry.get(), regex=regex_var.get(),
+                                     whole_word=word_var.get(), case_sensitive=case_var.get())
+            except re.error as e:
+                messagebox.showerror("Regex invalide", str(e), parent=win)
+                return None
+
+        def target_columns():
+            col = col_combo.get()
+            return None if col == all_cols else ReplaceEngine.columns(self.headers, col)
+
+        def compute_preview():
+            """Calcule (sans rien modifier) les remplacements prévus et remplit l'aperçu."""
+            engine = build_engine()
+            if engine is None:
+                return None, []
+            changes, occurrences = engine.scan(self.data, self.filtered_indices, target_columns(), index=self.index)
+            rows = len({pos for pos, _, _, _ in changes})
+            summary_var.set(f"{occurrences} occurrence(s) dans {len(changes)} cellule(s) sur {rows} ligne(s)")
+            preview_list.delete(0, tk.END)
+            for line in ReplaceEngine.preview(changes, self.headers):
+                preview_list.insert(tk.END, line)
+            return engine, changes
     
         # ---- Recherche suivante ----
-        # ---- Recherche suivante (CORRIGÉE) ----
         def search_next():
-            search = search_entry.get().lower() # On met tout en minuscule pour la recherche
-            if not search:
+            engine = build_engine()
+            if engine is None:
                 return
+            cols = target_columns()
+            key = (engine.pattern.pattern, engine.pattern.flags, col_combo.get())
     
             # Nouvelle recherche ?
-            if self.search_state["search"] != search:
-                self.search_state["search"] = search
+            if self.search_state["search"] != key:
+                self.search_state["search"] = key
                 self.search_state["last_index"] = -1
                 self.search_state["filtered_indices"] = self.filtered_indices.copy()
     
@@ -2686,22 +6211,24 @@ class DatEditor:
             start = self.search_state["last_index"] + 1
             
             # Recherche dans les DONNÉES (pas juste l'affichage)
+            row_cols = range(len(self.headers)) if cols is None else cols
             for pos in range(start, len(self.search_state["filtered_indices"])):
                 real_index = self.search_state["filtered_indices"][pos]
-                row = self.data[real_index]
+                if real_index >= len(self.data):
+                    continue
                 
                 # Vérification si le terme existe dans la ligne
-                row_str = " ".join([str(x).lower() for x in row])
-                if search in row_str:
+                if engine.row_matches(self.data, real_index, row_cols):
                     # TROUVÉ !
                     
                     # 1. On "téléporte" l'affichage à cette position (pos)
                     self.refresh_tree(focus_idx=pos)
                     
                     # 2. On sélectionne la ligne
-                    if self.tree.exists(str(real_index)):
-                        self.tree.see(str(real_index))
-                        self.tree.selection_set(str(real_index))
+                    iid = self._iid(real_index)
+                    if self.tree.exists(iid):
+                        self.tree.see(iid)
+                        self.tree.selection_set(iid)
                     
                     self.search_state["last_index"] = pos
                     found = True
@@ -2713,37 +6240,511 @@ class DatEditor:
     
         # ---- Remplacer tout ----
         def replace_all():
-            search = search_entry.get()
-            replace = replace_entry.get()
-            if not search:
+            engine, changes = compute_preview()
+            if engine is None:
                 return
-    
-            undo_batch = []
-            for real_index in self.filtered_indices:
-                row = self.data[real_index]
-                new_row = row.copy()
-                changed = False
-                for i, val in enumerate(row):
-                    if search in str(val):
-                        new_row[i] = str(val).replace(search, replace)
-                        changed = True
-                if changed:
-                    undo_batch.append((real_index, row.copy()))
-                    self.data[real_index] = new_row
-    
-            if undo_batch:
-                self.undo_stack.append(undo_batch)
-                self.modified = True
-                self.apply_filter()
-                messagebox.showinfo("Remplacement", f"{len(undo_batch)} lignes modifiées")
+            if not changes:
+                messagebox.showinfo("Remplacement", "Aucune occurrence trouvée.", parent=win)
+                return
+            if not messagebox.askyesno("Remplacement", f"{summary_var.get()}.\n\nAppliquer ces remplacements ?", parent=win):
+                return
+
+            # Une seule entrée d'annulation et un seul rafraîchissement pour tout le lot
+            self._apply_replacements(changes)
+            rows = len({pos for pos, _, _, _ in changes})
+            messagebox.showinfo("Remplacement", f"{rows} lignes modifiées", parent=win)
     
         # ---- Boutons ----
         btn_frame = tk.Frame(win, bg="white")
-        btn_frame.pack(pady=15)
+        btn_frame.pack(pady=10)
     
         tk.Button(btn_frame, text="Exécuter / Suivant", bg=self.COLORS["accent"], fg="white", relief="flat", padx=10, command=search_next).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Aperçu", relief="flat", padx=10, command=compute_preview).pack(side='left', padx=10)
         tk.Button(btn_frame, text="Remplacer tout", bg=self.COLORS["warning"], fg="white", relief="flat", padx=10, command=replace_all).pack(side='left', padx=10)
         tk.Button(btn_frame, text="Fermer", command=win.destroy).pack(side='right', padx=10)
+
+    def _apply_replacements(self, changes):
+        """
+        Applique les changements calculés par ReplaceEngine.scan :
+        une seule entrée d'annulation et un seul rafraîchissement de la grille.
+        """
+        if not changes:
+            return
+        undo_batch = []
+        for row_idx, col_idx, old, new in changes:
+            self.data[row_idx][col_idx] = new
+            undo_batch.append(("cell", self.data.rid(row_idx), col_idx, old))
+            self._on_cell_changed(row_idx, col_idx, old, new)
+        self.undo_stack.append(undo_batch)
+        self.modified = True
+        self.apply_filter()
+
+    def add_virtual_column(self, name, provider):
+        """Ajoute (en tête de la vue) une colonne en lecture seule ; provider(positions) -> valeurs."""
+        self.virtual_columns[name] = provider
+        self.visible_columns = [name] + [c for c in self.visible_columns if c != name]
+        for combobox in [self.column_filter1, self.column_filter2, self.column_filter3]:
+            combobox['values'] = self.visible_columns
+        self.refresh_tree()
+
+    def _virtual_line_numbers(self, positions):
+        """Numéro de ligne dans le fichier (tel qu'il serait enregistré)."""
+        return [str(pos + 1) for pos in positions]
+
+    def _virtual_branch_paths(self, positions):
+        """Chemin complet n1\\n2\\...\\Nom de la variable."""
+        level_indices = level_column_indices(self.headers)
+        name_idx = self.headers.index("Nom") if "Nom" in self.headers else -1
+        values = []
+        for pos in positions:
+            row = self.data[pos]
+            path = row_path(row, level_indices)
+            if 0 <= name_idx < len(row) and str(row[name_idx]).strip():
+                path.append(str(row[name_idx]).strip())
+            values.append("\\".join(path))
+        return values
+
+    def _virtual_template_deviations(self, positions):
+        """Nombre de colonnes qui diffèrent des valeurs par défaut de la classe (VAREXP_TEMPLATES)."""
+        lower = [h.lower() for h in self.headers]
+        class_idx = lower.index("class") if "class" in lower else -1
+        if class_idx == -1:
+            return [""] * len(positions)
+        # Colonnes du modèle résolues une fois par classe
+        checks = {var_class: [(self.headers.index(col), val) for col, val in template.items() if col in self.headers]
+                  for var_class, template in self.VAREXP_TEMPLATES.items()}
+        values = []
+        for pos in positions:
+            row = self.data[pos]
+            var_class = str(row[class_idx]).strip().upper() if class_idx < len(row) else ""
+            if var_class not in checks:
+                values.append("")
+                continue
+            values.append(str(sum(1 for idx, val in checks[var_class]
+                                  if (str(row[idx]).strip() if idx < len(row) else "") != val)))
+        return values
+
+    def remove_virtual_column(self, name):
+        self.virtual_columns.pop(name, None)
+        self.visible_columns = [c for c in self.visible_columns if c != name]
+        for combobox in [self.column_filter1, self.column_filter2, self.column_filter3]:
+            combobox['values'] = self.visible_columns
+        self.refresh_tree()
+
+    def open_computed_column_window(self):
+        """Colonne calculée : écrit le résultat dans une colonne, ou l'affiche en colonne virtuelle."""
+        if not self.headers:
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Colonne calculée")
+        win.geometry("640x460")
+        win.configure(bg="white")
+        win.transient(self.root)
+
+        tk.Label(win, text="Expression :", bg="white").pack(anchor='w', padx=10, pady=(10, 2))
+        entry_expr = tk.Entry(win, font=("Consolas", 10))
+        entry_expr.pack(fill='x', padx=10)
+        entry_expr.focus_set()
+        tk.Label(win, text='Ex. : path("_")   ·   num(Eqt_Index) + 100   ·   Nom + " - " + col("Libellé")\n'
+                           'Fonctions : num int str upper lower strip len replace left right pad join path',
+                 bg="white", fg="#7f8c8d", justify='left', font=("Segoe UI", 8)).pack(anchor='w', padx=10, pady=2)
+
+        target_frame = tk.Frame(win, bg="white")
+        target_frame.pack(fill='x', padx=10, pady=8)
+        virtual_label = "(Colonne virtuelle)"
+        tk.Label(target_frame, text="Résultat dans :", bg="white").pack(side='left')
+        target_combo = ttk.Combobox(target_frame, values=[virtual_label] + list(self.headers), state="readonly", width=22)
+        target_combo.set(virtual_label)
+        target_combo.pack(side='left', padx=5)
+        tk.Label(target_frame, text="Nom :", bg="white").pack(side='left', padx=(10, 2))
+        entry_name = tk.Entry(target_frame, width=16)
+        entry_name.insert(0, "Calcul")
+        entry_name.pack(side='left')
+
+        summary_var = tk.StringVar(value="")
+        tk.Label(win, textvariable=summary_var, bg="white", fg="#2c3e50").pack(anchor='w', padx=10)
+        preview_list = tk.Listbox(win, height=10, font=("Consolas", 9))
+        preview_list.pack(fill='both', expand=True, padx=10, pady=5)
+
+        def compile_expression():
+            try:
+                return ColumnExpression(entry_expr.get(), self.headers)
+            except ValueError as e:
+                messagebox.showerror("Expression invalide", str(e), parent=win)
+                return None
+
+        def preview():
+            expr = compile_expression()
+            if expr is None:
+                return
+            sample = self.filtered_indices[:20]
+            values, errors, first_error = expr.evaluate(self.data, sample)
+            preview_list.delete(0, tk.END)
+            for pos, val in zip(sample, values):
+                preview_list.insert(tk.END, f"Ligne {pos + 1} : {val}")
+            summary_var.set(f"Aperçu sur {len(sample)} ligne(s), {errors} erreur(s)"
+                            + (f" - ligne {first_error[0] + 1} : {first_error[1]}" if first_error else ""))
+
+        def apply():
+            expr = compile_expression()
+            if expr is None:
+                return
+            target = target_combo.get()
+            if target == virtual_label:
+                name = entry_name.get().strip() or "Calcul"
+                if name in self.headers:
+                    messagebox.showwarning("Nom", f"'{name}' est déjà une colonne du fichier.", parent=win)
+                    return
+                # La colonne virtuelle suit les modifications : évaluée à chaque affichage
+                self.add_virtual_column(name, lambda positions, e=expr: e.evaluate(self.data, positions)[0])
+                win.destroy()
+                return
+
+            positions = list(self.filtered_indices)
+            start = time.perf_counter()
+            values, errors, first_error = expr.evaluate(self.data, positions)
+            elapsed = time.perf_counter() - start
+            if errors and not messagebox.askyesno(
+                    "Erreurs", f"{errors} ligne(s) en erreur (#ERR), ex. ligne {first_error[0] + 1} : {first_error[1]}\n"
+                               f"Écrire quand même ?", parent=win):
+                return
+            count = self._fill_column(self.headers.index(target), positions, values)
+            self.status_var.set(f"'{target}' calculée sur {len(positions)} ligne(s) en {elapsed:.2f} s : "
+                                f"{count} cellule(s) modifiée(s).")
+            win.destroy()
+
+        btn_frame = tk.Frame(win, bg="white")
+        btn_frame.pack(pady=10)
+        tk.Button(btn_frame, text="Aperçu", relief="flat", padx=10, command=preview).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Appliquer", bg=self.COLORS["warning"], fg="white", relief="flat",
+                  padx=10, command=apply).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Fermer", command=win.destroy).pack(side='left', padx=10)
+        entry_expr.bind("<Return>", lambda e: preview())
+
+    def open_column_stats(self, col_name=None):
+        """
+        Statistiques par colonne sur les lignes filtrées (valeurs distinctes, top, vides, min/max,
+        histogramme). Calcul en arrière-plan, colonne par colonne ; les résultats sont gardés
+        par version de colonne : après quelques éditions, seules les colonnes modifiées sont recalculées.
+        """
+        if not self.headers:
+            return
+        columns = [c for c in self.visible_columns if c in self.headers]
+        if not columns:
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Statistiques des colonnes")
+        win.geometry("900x600")
+        win.configure(bg="white")
+
+        positions = list(self.filtered_indices)
+        signature = (len(positions), hash(tuple(positions)))
+        data = self.data
+        rows = [data[p] for p in positions] # Références aux lignes : lecture seule dans le worker
+
+        left = tk.Frame(win, bg="white")
+        left.pack(side="left", fill="y", padx=10, pady=10)
+        tk.Label(left, text=f"Colonnes ({len(positions)} lignes filtrées)", bg="white", font=("Segoe UI", 9, "bold")).pack(anchor="w")
+        col_list = tk.Listbox(left, width=30, exportselection=False)
+        col_list.pack(fill="y", expand=True)
+        for c in columns:
+            col_list.insert(tk.END, c)
+
+        right = tk.Frame(win, bg="white")
+        right.pack(side="left", fill="both", expand=True, padx=10, pady=10)
+        summary_var = tk.StringVar(value="Calcul en cours...")
+        tk.Label(right, textvariable=summary_var, bg="white", justify="left", anchor="w", font=("Consolas", 10)).pack(fill="x")
+        top_tree = ttk.Treeview(right, columns=("Valeur", "Nombre", "%"), show="headings", height=12)
+        for c, w in (("Valeur", 300), ("Nombre", 90), ("%", 70)):
+            top_tree.heading(c, text=c)
+            top_tree.column(c, width=w, anchor="w" if c == "Valeur" else "e")
+        top_tree.pack(fill="both", expand=True, pady=5)
+        histogram_canvas = tk.Canvas(right, height=140, bg="white", highlightthickness=0)
+        histogram_canvas.pack(fill="x")
+
+        results = {}
+
+        def show(col):
+            stats = results.get(col)
+            top_tree.delete(*top_tree.get_children())
+            histogram_canvas.delete("all")
+            if stats is None:
+                summary_var.set(f"{col} : calcul en cours...")
+                return
+            if "error" in stats:
+                summary_var.set(f"{col} : erreur de calcul ({stats['error']})")
+                return
+            filled = stats["rows"] - stats["empty"]
+            text = (f"{col}\n"
+                    f"Lignes : {stats['rows']}   Vides : {stats['empty']}   Distinctes : {stats['distinct']}")
+            if stats["numeric"]:
+                text += (f"\nNumériques : {stats['numeric']}   Min : {ColumnExpression.text(stats['min'])}"
+                         f"   Max : {ColumnExpression.text(stats['max'])}")
+            summary_var.set(text)
+            for value, count in stats["top"]:
+                top_tree.insert("", "end", values=(value, count, f"{100.0 * count / filled:.1f}" if filled else ""))
+            histogram = stats["histogram"]
+            if histogram:
+                width = max(histogram_canvas.winfo_width(), 400)
+                peak = max(c for _, _, c in histogram) or 1
+                bar = width / len(histogram)
+                for k, (low, high, count) in enumerate(histogram):
+                    h = 110 * count / peak
+                    histogram_canvas.create_rectangle(k * bar + 2, 120 - h, (k + 1) * bar - 2, 120, fill="#3498db", outline="")
+                    histogram_canvas.create_text(k * bar + bar / 2, 130, text=ColumnExpression.text(round(low, 2)), font=("Segoe UI", 7))
+
+        def current():
+            sel = col_list.curselection()
+            return columns[sel[0]] if sel else None
+
+        def on_result(col, stats):
+            if not win.winfo_exists():
+                return
+            results[col] = stats
+            if col == current():
+                show(col)
+
+        # Colonnes déjà à jour : résultats du cache ; les autres sont calculées par le worker
+        todo = []
+        for col in columns:
+            col_idx = self.headers.index(col)
+            version = data.column_version(col_idx)
+            cached = self.column_stats_cache.get(col_idx)
+            if cached and cached[0] == version and cached[1] == signature:
+                results[col] = cached[2]
+            else:
+                todo.append((col, col_idx, version))
+        if col_name in columns:
+            # Colonne demandée calculée en premier
+            todo.sort(key=lambda item: item[0] != col_name)
+
+        def worker():
+            for col, col_idx, version in todo:
+                if not win.winfo_exists():
+                    return
+                try:
+                    stats = column_stats([row[col_idx] if col_idx < len(row) else "" for row in rows])
+                except Exception as e: # Une colonne en échec ne bloque pas les suivantes
+                    win.after(0, lambda c=col, msg=str(e): on_result(c, {"error": msg}))
+                    continue
+                self.column_stats_cache[col_idx] = (version, signature, stats)
+                win.after(0, lambda c=col, st=stats: on_result(c, st))
+
+        col_list.bind("<<ListboxSelect>>", lambda e: current() and show(current()))
+        start = columns.index(col_name) if col_name in columns else 0
+        col_list.selection_set(start)
+        col_list.see(start)
+        show(columns[start])
+        if todo:
+            threading.Thread(target=worker, daemon=True).start()
+
+    def open_upsert_import(self):
+        """
+        Import avec fusion d'un export partiel (CSV / XLSX, 1re ligne = titres) dans la table affichée :
+        aperçu des comptes, puis mises à jour et ajouts en une seule entrée d'annulation.
+        """
+        if not self.headers:
+            return
+        path = filedialog.askopenfilename(
+            parent=self.root, title="Fichier à fusionner (1re ligne = titres)",
+            filetypes=[("Tables", "*.csv *.xlsx *.xls"), ("Tous", "*.*")])
+        if not path:
+            return
+        try:
+            sheet = read_sheet_rows(path)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de lire le fichier :\n{e}")
+            return
+        if len(sheet) < 2:
+            messagebox.showwarning("Import fusion", "Aucune ligne à importer.")
+            return
+        incoming_headers, incoming_rows = [str(t).strip() for t in sheet[0]], sheet[1:]
+        keys = [k for k in UPSERT_KEYS if upsert_key_function(self.headers, k) and upsert_key_function(incoming_headers, k)]
+        if not keys:
+            messagebox.showerror("Import fusion", "Aucune colonne clé commune (Nom, Tagname ou n1..n11).")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Import fusion - {os.path.basename(path)}")
+        win.geometry("720x520")
+        win.configure(bg="white")
+        win.transient(self.root)
+
+        opt_frame = tk.Frame(win, bg="white")
+        opt_frame.pack(fill="x", padx=10, pady=(10, 5))
+        tk.Label(opt_frame, text="Clé :", bg="white").pack(side="left")
+        key_combo = ttk.Combobox(opt_frame, values=keys, state="readonly", width=16)
+        key_combo.set(keys[0])
+        key_combo.pack(side="left", padx=(2, 15))
+        insert_var = tk.BooleanVar(value=True)
+        flag_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(opt_frame, text="Ajouter les nouvelles lignes", variable=insert_var, bg="white").pack(side="left")
+        tk.Checkbutton(opt_frame, text="Signaler les lignes absentes du fichier", variable=flag_var, bg="white").pack(side="left", padx=5)
+
+        summary_var = tk.StringVar()
+        tk.Label(win, textvariable=summary_var, bg="white", justify="left", anchor="w",
+                 font=("Segoe UI", 10)).pack(fill="x", padx=10, pady=5)
+        preview_list = tk.Listbox(win, font=("Consolas", 9))
+        preview_list.pack(fill="both", expand=True, padx=10)
+        plan = {}
+
+        def compute_preview(*args):
+            t0 = time.perf_counter()
+            plan.clear()
+            plan.update(plan_upsert(self.headers, self.data, incoming_headers, incoming_rows, key_combo.get()))
+            elapsed = time.perf_counter() - t0
+            text = (f"{len(incoming_rows)} lignes lues, {plan['matched']} reconnues ({elapsed:.2f} s)\n"
+                    f"Lignes mises à jour : {plan['updated']} ({len(plan['changes'])} cellules)\n"
+                    f"Nouvelles lignes : {len(plan['new_rows'])}\n"
+                    f"Lignes de la table absentes du fichier : {len(plan['missing'])}")
+            if plan["ambiguous"] or plan["repeated"]:
+                text += f"\nIgnorées (clé en double dans la table) : {plan['ambiguous']} - Clés répétées dans le fichier : {plan['repeated']}"
+            if plan["ignored"]:
+                text += f"\nColonnes inconnues ignorées : {', '.join(plan['ignored'][:10])}"
+            summary_var.set(text)
+            preview_list.delete(0, tk.END)
+            for line in ReplaceEngine.preview(plan["changes"], self.headers):
+                preview_list.insert(tk.END, line)
+
+        def apply():
+            if not plan:
+                return
+            changes = plan["changes"]
+            new_rows = plan["new_rows"] if insert_var.get() else []
+            if not changes and not new_rows and not flag_var.get():
+                win.destroy()
+                return
+            undo_batch = []
+            data = self.data
+            for pos, col_idx, old, new in changes:
+                row = data[pos]
+                while len(row) <= col_idx:
+                    row.append("")
+                row[col_idx] = new
+                undo_batch.append(("cell", data.rid(pos), col_idx, old))
+
+            if new_rows:
+                width = len(self.headers)
+                schema = self._current_schema()
+                if schema is MODULE_SCHEMAS["varexp"]:
+                    # Varexp : modèle de la classe et Tagname suivant pour les nouvelles variables
+                    columns = self._variable_columns()
+                    class_idx, tag_idx = columns.get("class", -1), columns.get("tagname", -1)
+                    next_tag = max(self.get_last_tag_id(), self.index.max_tagname()) + 1
+                    rows = []
+                    for values in new_rows:
+                        row = self._build_variable_row(columns, values.get(class_idx, ""), "", [])
+                        for col_idx, value in values.items():
+                            row[col_idx] = value
+                        if tag_idx != -1 and not row[tag_idx]:
+                            row[tag_idx] = str(next_tag)
+                            self.last_tagname = next_tag
+                            next_tag += 1
+                        rows.append(row)
+                else:
+                    rows = [[values.get(i, "") for i in range(width)] for values in new_rows]
+                undo_batch.extend(("insert", rid) for rid in data.extend(rows))
+
+            # Modification en masse : index et caches reconstruits une seule fois
+            if undo_batch:
+                self.undo_stack.append(undo_batch)
+                self.modified = True
+            self._on_structure_changed()
+            if flag_var.get():
+                module_issues = self.cell_issues.setdefault(self.current_module, {})
+                column = self.visible_columns[0] if self.visible_columns else self.headers[0]
+                for pos in plan["missing"]:
+                    module_issues.setdefault(pos, {})[column] = "Absente du fichier importé"
+            win.destroy()
+            self.apply_filter()
+            self.status_var.set(f"Import fusion : {plan['updated']} ligne(s) mise(s) à jour, "
+                                f"{len(new_rows)} ajoutée(s), {len(plan['missing']) if flag_var.get() else 0} signalée(s) (F8).")
+
+        key_combo.bind("<<ComboboxSelected>>", compute_preview)
+        btns = tk.Frame(win, bg="white")
+        btns.pack(fill="x", padx=10, pady=10)
+        tk.Button(btns, text="Annuler", relief="flat", command=win.destroy).pack(side="right")
+        tk.Button(btns, text="Appliquer", bg=self.COLORS["success"], fg="white", relief="flat", command=apply).pack(side="right", padx=5)
+        compute_preview()
+
+    def open_bulk_rename(self):
+        """Renommage en masse depuis une table de correspondance (CSV / XLSX : ancien ; nouveau)."""
+        if not self.data:
+            return
+        path = filedialog.askopenfilename(
+            parent=self.root, title="Table de correspondance (ancien ; nouveau)",
+            filetypes=[("Tables", "*.csv *.xlsx *.xls"), ("Tous", "*.*")])
+        if not path:
+            return
+        try:
+            mapping = read_rename_mapping(path)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de lire la table :\n{e}")
+            return
+        if not mapping:
+            messagebox.showwarning("Renommage", "Aucune correspondance trouvée dans le fichier.")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Renommage en masse - {os.path.basename(path)}")
+        win.geometry("620x480")
+        win.configure(bg="white")
+        win.transient(self.root)
+
+        tk.Label(win, text=f"{len(mapping)} correspondances chargées", bg="white",
+                 font=("Segoe UI", 10, "bold")).pack(anchor='w', padx=10, pady=(10, 5))
+
+        opt_frame = tk.Frame(win, bg="white")
+        opt_frame.pack(fill='x', padx=10, pady=5)
+        mode_var = tk.StringVar(value="cell")
+        tk.Radiobutton(opt_frame, text="Cellule exacte", variable=mode_var, value="cell", bg="white").pack(side='left')
+        tk.Radiobutton(opt_frame, text="Sous-chaîne", variable=mode_var, value="substring", bg="white").pack(side='left', padx=5)
+
+        all_cols = "(Toutes les colonnes)"
+        tk.Label(opt_frame, text="Colonne :", bg="white").pack(side='left', padx=(15, 2))
+        # Colonnes réelles seulement : les colonnes virtuelles ne sont ni cherchées ni remplacées
+        col_combo = ttk.Combobox(opt_frame, values=[all_cols] + [c for c in self.visible_columns if c in self.headers],
+                                 state="readonly", width=18)
+        col_combo.set(all_cols)
+        col_combo.pack(side='left')
+
+        # Rapport : occurrences par correspondance
+        summary_var = tk.StringVar(value="")
+        tk.Label(win, textvariable=summary_var, bg="white", fg="#2c3e50").pack(anchor='w', padx=10)
+        report = ttk.Treeview(win, columns=("old", "new", "hits"), show="headings", height=12)
+        for col, text, width in (("old", "Ancien", 220), ("new", "Nouveau", 220), ("hits", "Occurrences", 90)):
+            report.heading(col, text=text)
+            report.column(col, width=width, stretch=(col != "hits"))
+        report.pack(fill='both', expand=True, padx=10, pady=5)
+
+        def fill_report(hits):
+            report.delete(*report.get_children())
+            for old, count in sorted(hits.items(), key=lambda kv: (-kv[1], kv[0])):
+                report.insert("", "end", values=(old, mapping[old], count))
+
+        def apply():
+            col = col_combo.get()
+            cols = None if col == all_cols else ReplaceEngine.columns(self.headers, col)
+            renamer = BulkRenamer(mapping, mode_var.get())
+            changes, occurrences = renamer.scan(self.data, self.filtered_indices, cols)
+            fill_report(renamer.hits)
+            unused = sum(1 for count in renamer.hits.values() if not count)
+            summary_var.set(f"{occurrences} remplacement(s) dans {len(changes)} cellule(s) - "
+                            f"{unused} correspondance(s) sans effet")
+            if not changes:
+                messagebox.showinfo("Renommage", "Aucune cellule concernée.", parent=win)
+                return
+            if not messagebox.askyesno("Renommage", f"Modifier {len(changes)} cellule(s) ?", parent=win):
+                return
+            # Une seule entrée d'annulation pour tout le renommage
+            self._apply_replacements(changes)
+
+        btn_frame = tk.Frame(win, bg="white")
+        btn_frame.pack(pady=10)
+        tk.Button(btn_frame, text="Appliquer", bg=self.COLORS["warning"], fg="white", relief="flat",
+                  padx=10, command=apply).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Fermer", command=win.destroy).pack(side='left', padx=10)
+        fill_report(dict.fromkeys(mapping, 0))
     
     def check_unsaved_changes(self):
         if self.modified:
@@ -2795,10 +6796,7 @@ class DatEditor:
         if widget and widget.winfo_class() in ("Entry", "TEntry"):
             return
     
-        self.clipboard_rows = []
-        for iid in self.tree.selection():
-            real_index = int(iid)
-            self.clipboard_rows.append(self.data[real_index].copy())
+        self.clipboard_rows = [self.data[real_index].copy() for real_index in self._selected_positions()]
     
         # [FIX] Suppression de la ligne qui bloquait l'UNDO
         # self.copy_undo_stack_size = len(self.undo_stack) 
@@ -2811,14 +6809,12 @@ class DatEditor:
         if not self.clipboard_rows:
             return
     
-        start_index = len(self.data)
+        undo_batch = []
         for row in self.clipboard_rows:
-            self.data.append(row.copy())
+            undo_batch.append(("insert", self.data.append(row.copy())))
+            self._on_row_appended(len(self.data) - 1)
     
-        self.undo_stack.append([
-            (start_index + i, row.copy())
-            for i, row in enumerate(self.clipboard_rows)
-        ])
+        self.undo_stack.append(undo_batch)
     
         # [FIX] Plus besoin de gérer copy_undo_stack_size
         # self.copy_undo_stack_size = None
@@ -2828,18 +6824,22 @@ class DatEditor:
 
     # ================= DELETE (FIXED) =================
     def delete_selected_rows(self, event=None):
-        selected = self.tree.selection()
+        widget = self.root.focus_get()
+        if widget and widget.winfo_class() in ("Entry", "TEntry"):
+            return
+        selected = self._selected_positions()
         if not selected:
             return
+        if len(selected) > len(self.tree.get_children()) and not messagebox.askyesno(
+                "Suppression", f"Supprimer les {len(selected)} lignes sélectionnées (y compris hors de la vue) ?"):
+            return
     
-        real_indices = sorted([int(iid) for iid in selected])
-    
-        # Undo
-        self.undo_stack.append([(idx, self.data[idx].copy()) for idx in real_indices])
-    
-        for idx in reversed(real_indices):
-            del self.data[idx]
+        # Compactage en une passe ; les lignes retirées (avec leur rid) servent à l'annulation
+        removed = self.data.delete_positions(selected)
+        self.undo_stack.append([("delete", removed)])
+        self.selection.clear()
     
+        self._on_structure_changed()
         self.apply_filter()
         self.modified = True
         # [FIX] Plus besoin de gérer copy_undo_stack_size
@@ -2855,69 +6855,62 @@ class DatEditor:
         last_action = self.undo_stack.pop()
 
         # --- CAS 1 : C'EST UN SNAPSHOT (Sauvegarde complète) ---
-        # On détecte si c'est une liste de listes (données brutes)
-        is_snapshot = False
-        if isinstance(last_action, list) and len(last_action) > 0:
-            # Si le premier élément est une liste, c'est un tableau de données entier
-            if isinstance(last_action[0], list):
-                is_snapshot = True
-        elif isinstance(last_action, list) and len(last_action) == 0:
-            # Cas rare : retour à un tableau vide
-            # Pour simplifier, on considère que si ce n'est pas des tuples, c'est un snapshot
-            is_snapshot = True
-
-        if is_snapshot:
+        if isinstance(last_action, RowStore):
             # Restauration complète brutale (Rapide pour les gros blocs)
             self.data = last_action
+            self._on_structure_changed()
             # On réinitialise les filtres pour éviter des index hors limites
             self.filtered_indices = list(range(len(self.data)))
             self.refresh_tree()
             if hasattr(self, 'status_var'): self.status_var.set("Restauration complète effectuée.")
             return
 
-        # --- CAS 2 : C'EST UNE LISTE D'ACTIONS (Votre logique existante) ---
-        # Si ce sont des tuples (row, col, val), on applique votre boucle
+        # --- CAS 2 : UN LOT D'ACTIONS ("cell", "insert", "delete") adressées par rid ---
+        inserted = []
         for action in reversed(last_action):
-            # Si action est une modification de cellule : 3 valeurs
-            if isinstance(action, tuple) and len(action) == 3:
-                row_idx, col_idx, old_value = action
-                # Sécurité dimensions
-                if row_idx < len(self.data):
-                    while len(self.data[row_idx]) <= col_idx:
-                        self.data[row_idx].append("")
-                    self.data[row_idx][col_idx] = old_value
-
-                    # Mise à jour Visuelle unitaire (Optimisation)
-                    if str(row_idx) in self.tree.get_children():
-                        values = []
-                        display_cols = [c for c in self.headers if c in self.visible_columns]
-                        for col in display_cols:
-                            try:
-                                idx_h = self.headers.index(col)
-                                val = self.data[row_idx][idx_h] if idx_h < len(self.data[row_idx]) else ""
-                                values.append(val)
-                            except ValueError:
-                                values.append("")
-                        self.tree.item(str(row_idx), values=values)
-
-                        # Restauration surlignage
-                        col_name = self.headers[col_idx] if col_idx < len(self.headers) else ""
-                        if col_name:
-                             self.cell_templates.setdefault(str(row_idx), {})[col_name] = old_value
-
-            # Sinon, action classique sur ligne entière : 2 valeurs
-            elif isinstance(action, tuple) and len(action) == 2:
-                idx, row_data = action
-                if row_data is None:
-                    # C'était un ajout -> on supprime
-                    if idx < len(self.data):
-                        del self.data[idx]
-                else:
-                    # C'était une suppression -> on remet
-                    if idx < len(self.data):
-                        self.data[idx] = row_data
-                    else:
-                        self.data.append(row_data)
+            kind = action[0]
+            if kind == "cell":
+                _, rid, col_idx, old_value = action
+                row_idx = self.data.position(rid)
+                if row_idx is None:
+                    continue # Ligne supprimée depuis
+                while len(self.data[row_idx]) <= col_idx:
+                    self.data[row_idx].append("")
+                current_value = self.data[row_idx][col_idx]
+                self.data[row_idx][col_idx] = old_value
+                self._on_cell_changed(row_idx, col_idx, current_value, old_value)
+
+                # Mise à jour Visuelle unitaire (Optimisation)
+                iid = str(rid)
+                if self.tree.exists(iid):
+                    values = []
+                    display_cols = self.visible_columns
+                    for col in display_cols:
+                        try:
+                            idx_h = self.headers.index(col)
+                            val = self.data[row_idx][idx_h] if idx_h < len(self.data[row_idx]) else ""
+                            values.append(val)
+                        except ValueError:
+                            values.append("")
+                    self.tree.item(iid, values=values)
+
+                    # Restauration surlignage
+                    col_name = self.headers[col_idx] if col_idx < len(self.headers) else ""
+                    if col_name:
+                         self.cell_templates.setdefault(iid, {})[col_name] = old_value
+
+            elif kind == "insert":
+                # C'était un ajout -> on supprime (en un seul compactage ci-dessous)
+                inserted.append(action[1])
+
+            elif kind == "delete":
+                # C'était une suppression -> on remet les lignes à leur place, avec leur rid
+                self.data.restore_rows(action[1])
+                self._on_structure_changed()
+
+        if inserted:
+            self.data.delete_ids(inserted)
+            self._on_structure_changed()
 
         # Finitions communes
         self.apply_filter()
@@ -2931,7 +6924,7 @@ class DatEditor:
         if not item or not column:
             return
     
-        real_index = int(item)
+        real_index = self._row_index(item)
         col_index = int(column.replace('#', '')) - 1
         
         if col_index < 0 or col_index >= len(self.visible_columns):
@@ -3001,10 +6994,12 @@ class DatEditor:
                 self.data[real_index].append("")
         
             # ====== UNDO STACK ======
-            self.undo_stack.append([(real_index, header_idx, self.data[real_index][header_idx])])
+            self.undo_stack.append([("cell", int(item), header_idx, self.data[real_index][header_idx])])
         
             # ====== Mise à jour self.data ======
+            previous_val = self.data[real_index][header_idx]
             self.data[real_index][header_idx] = new_val
+            self._on_cell_changed(real_index, header_idx, previous_val, new_val)
             
             # ====== Mise à jour interface ======
             # On met à jour directement l'item treeview sans tout recharger
@@ -3020,31 +7015,52 @@ class DatEditor:
         entry.bind("<FocusOut>", save_edit)
 
         
+    def _current_schema(self):
+        """Schéma du module affiché (ou du fichier ouvert directement s'il porte le nom d'un module)."""
+        if self.current_module in MODULE_SCHEMAS:
+            return MODULE_SCHEMAS[self.current_module]
+        name = os.path.basename(getattr(self, "current_file_path", None) or "").lower()
+        for key, filename in self.MODULE_FILES.items():
+            if filename.lower() == name:
+                return MODULE_SCHEMAS.get(key)
+        return None
+
+    def _is_numeric_column(self, col_name):
+        schema = self._current_schema()
+        return schema is not None and col_name in self.headers and schema.numeric(col_name)
+
     def sort_by_column(self, col_name):
-        idx = self.headers.index(col_name)
-    
         # Toggle asc / desc
         asc = self.sort_state.get(col_name, True)
         self.sort_state = {col_name: not asc}
-    
+
+        if self._is_numeric_column(col_name):
+            # Colonne typée du schéma : tri sur le tableau numérique (vides / invalides en dernier)
+            numbers = self.data.numbers(self.headers.index(col_name))
+            valid = [i for i in self.filtered_indices if numbers[i] == numbers[i]] # NaN : vide / invalide
+            invalid = [i for i in self.filtered_indices if numbers[i] != numbers[i]]
+            valid.sort(key=numbers.__getitem__, reverse=asc)
+            self.filtered_indices[:] = valid + invalid # En dernier dans les deux sens
+            self.refresh_tree()
+            return
+
+        if col_name in self.virtual_columns:
+            # Colonne virtuelle : valeurs calculées pour les lignes filtrées uniquement
+            values = self.virtual_columns[col_name](self.filtered_indices)
+            folded = dict(zip(self.filtered_indices, map(RowStore.fold, values)))
+        else:
+            # Valeurs déjà normalisées (strip + minuscules) : cache partagé avec filtre et recherche
+            folded = self.data.folded(self.headers.index(col_name))
+
         def sort_key(real_index):
-            row = self.data[real_index]
-            if idx >= len(row):
-                return (1, "")
-        
-            val = row[idx]
-        
-            if val is None:
-                return (1, "")
-        
-            val = str(val).strip()
+            val = folded[real_index]
             if val == "":
                 return (1, "")
         
             try:
                 return (0, float(val))
             except ValueError:
-                return (1, val.lower())
+                return (1, val)
     
         self.filtered_indices.sort(key=sort_key, reverse=asc)
         self.refresh_tree()
@@ -3066,9 +7082,15 @@ class DatEditor:
         if selection:
             try:
                 # On essaie de récupérer l'index réel
-                line_text = f"ID: {selection[0]}"
+                real_index = self._row_index(selection[0])
+                line_text = f"ID: {real_index}"
+                issues = self.cell_issues.get(self.current_module, {}).get(real_index)
+                if issues:
+                    line_text += " | ⚠ " + " ; ".join(f"{c} : {m}" for c, m in issues.items())
             except:
                 pass
+        if len(self.selection) > 1:
+            line_text += f" | Sélection : {len(self.selection)}"
     
         filter_active = any([self.filter_entry1.get().strip(), self.filter_entry2.get().strip(), self.filter_entry3.get().strip()])
         filter_text = "ACTIF" if filter_active else "Aucun"
@@ -3092,36 +7114,17 @@ class DatEditor:
             # mais on peut highlighter le bouton dossier si on veut
             self.buttons['folder'].config(bg=self.COLORS["accent"])
 
-    def _load_file_generic(self, path=None, force_headers=None, skip_first_line=False, button_key=None):
-        if not path:
-            path = filedialog.askopenfilename(filetypes=[("DAT files", "*.dat")])
-        if not path:
-            return
-        self.data = []
-        self.headers = []
-        self.first_line = None
-        try:
-            with open(path, 'r', encoding='latin-1') as f:
-                reader = csv.reader(f, delimiter=',', quotechar='"')
-                if skip_first_line:
-                    try:
-                        self.first_line = next(reader)
-                    except StopIteration:
-                        self.first_line = None
-                for row in reader:
-                    self.data.append(row)
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
-            return
-        if force_headers:
-            self.headers = force_headers
-        else:
-            for row in self.data:
-                if any(any(c.isalpha() for c in cell) for cell in row if isinstance(cell, str)):
-                    self.headers = row
-                    break
+    def _show_table(self, headers, first_line, data, button_key=None):
+        """Affiche une table déjà lue (titres, première ligne sautée, lignes) dans l'éditeur."""
+        self.headers = headers
+        self.first_line = first_line
+        self.data = data if isinstance(data, RowStore) else RowStore(data)
+        self.selection = SelectionModel()
+        self.virtual_columns = {}
+        self.value_filters = {}
         self.visible_columns = [h for h in self.headers if h and "unnamed" not in h.lower()]
         self.filtered_indices = list(range(len(self.data)))
+        self._on_structure_changed()
         
         # Initialisation du last_tagname à partir du fichier chargé
         col_tag = self.find_header("Tagname")
@@ -3146,6 +7149,8 @@ class DatEditor:
         # Highlight logic for Modules
         if button_key:
             self.highlight_module_button(button_key)
+        self.current_module = button_key
+        self.references.clear_overlay(button_key)
             
         self.modified = False
 
@@ -3155,10 +7160,12 @@ class DatEditor:
         RÈGLE STRICTE :
         - Si nom contient "varexp" -> On écrit les titres (headers).
         - Sinon -> On n'écrit PAS les titres (juste les données).
-        - Nettoie toujours la colonne "Ligne" (ajoutée par la recherche) si présente.
+        Les colonnes virtuelles (Ligne, Chemin...) ne sont pas dans self.data : rien à retirer.
         """
         if not self.data:
             return
+        if not self._check_duplicates_before_save():
+            return
         
         # Préparation du nom par défaut
         default_ext = ".dat"
@@ -3177,85 +7184,199 @@ class DatEditor:
             filetypes=[("DAT files", "*.dat"), ("CSV files", "*.csv"), ("Excel", "*.xlsx")]
         )
         
-        if not path:
-            return
+        if not path:
+            return
+        
+        try:
+            self._write_table_file(path, self.headers, self.first_line, self.data)
+
+            messagebox.showinfo("Succès", f"Fichier enregistré : {os.path.basename(path)}")
+            self.modified = False
+            state = self.module_cache.peek(self.current_module)
+            if state is not None and os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(state.path)):
+                self._rebase_module(state)
+            self.current_file_path = path
+            self.root.title(f"Éditeur - {os.path.basename(path)}")
+
+        except Exception as e:
+            messagebox.showerror("Erreur", str(e))
+
+    # ================= DOUBLONS (TAGNAME, NOM + CHEMIN, LIGNES) =================
+    def _duplicate_groups(self, whole_rows=False, headers=None, data=None):
+        """
+        Doublons de la table affichée (ou de headers/data donnés) : {intitulé: {clé: [positions]}}
+        pour le Tagname, le Nom (avec le chemin n1..n11 quand il existe) et, si whole_rows, les lignes entières.
+        """
+        headers = self.headers if headers is None else headers
+        data = self.data if data is None else data
+        lowered = [str(h).lower() for h in headers]
+        title_rows = [pos for pos, row in enumerate(data) if row == headers]
+        rows = list(data)
+        groups = {}
+        if "tagname" in lowered:
+            groups["Tagname"] = find_duplicates(rows, [lowered.index("tagname")], title_rows)
+        if "nom" in lowered:
+            levels = [idx for idx in level_column_indices(headers) if idx != -1]
+            label = "Nom + chemin" if levels else "Nom"
+            groups[label] = find_duplicates(rows, [lowered.index("nom")] + levels, title_rows)
+        if whole_rows:
+            groups["Ligne entière"] = find_duplicates(rows, None, title_rows)
+        return groups
+
+    def _renumber_duplicate_tagnames(self, tag_groups):
+        """Garde le Tagname de la 1re ligne de chaque groupe, les suivantes reçoivent de nouveaux numéros."""
+        tag_idx = self.headers.index(self.find_header("Tagname"))
+        existing = (str(row[tag_idx]).strip() for row in self.data if tag_idx < len(row))
+        next_tag = max([self.last_tagname or 0] + [int(v) for v in existing if v.isdigit()]) + 1
+        changes = []
+        for positions in tag_groups.values():
+            for pos in positions[1:]:
+                changes.append((pos, tag_idx, self.data[pos][tag_idx], str(next_tag)))
+                next_tag += 1
+        self._apply_replacements(changes) # Une seule entrée d'annulation
+        self.last_tagname = next_tag - 1
+        return len(changes)
+
+    def _check_duplicates_before_save(self):
+        """Applique la politique de doublons choisie ; False si l'enregistrement doit être annulé."""
+        groups = self._duplicate_groups()
+        if not any(groups.values()):
+            return True
+        policy = self.duplicate_policy.get()
+        if policy == self.DUPLICATE_POLICIES[2] and groups.get("Tagname"):
+            count = self._renumber_duplicate_tagnames(groups["Tagname"])
+            self.status_var.set(f"{count} Tagname(s) en double renuméroté(s) avant l'enregistrement.")
+            groups = self._duplicate_groups()
+            if not any(groups.values()):
+                return True
+        summary = "\n".join(f"- {label} : {len(found)} valeur(s) en double ({sum(len(g) for g in found.values())} lignes)"
+                            for label, found in groups.items() if found)
+        if policy == self.DUPLICATE_POLICIES[1]:
+            messagebox.showerror("Doublons", f"Enregistrement annulé, doublons trouvés :\n{summary}")
+            self.open_duplicate_finder(groups)
+            return False
+        return messagebox.askyesno("Doublons", f"Doublons trouvés :\n{summary}\n\nEnregistrer quand même ?")
+
+    def open_duplicate_finder(self, groups=None):
+        """Liste les doublons de la table affichée, groupés par clé (double-clic : aller à la ligne)."""
+        if not self.data:
+            return
+        t0 = time.perf_counter()
+        if groups is None:
+            groups = self._duplicate_groups(whole_rows=True)
+        elapsed = time.perf_counter() - t0
+
+        win = tk.Toplevel(self.root)
+        win.title("Doublons")
+        win.geometry("900x550")
+        win.configure(bg=self.COLORS["bg_light"])
+        total = sum(len(found) for found in groups.values())
+        tk.Label(win, text=f"{total} groupe(s) de doublons ({elapsed:.2f} s)",
+                 bg=self.COLORS["bg_light"], font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=5)
+
+        policy_frame = tk.Frame(win, bg=self.COLORS["bg_light"])
+        policy_frame.pack(fill="x", padx=10)
+        tk.Label(policy_frame, text="Avant l'enregistrement :", bg=self.COLORS["bg_light"]).pack(side="left")
+        for policy in self.DUPLICATE_POLICIES:
+            tk.Radiobutton(policy_frame, text=policy, value=policy, variable=self.duplicate_policy,
+                           bg=self.COLORS["bg_light"]).pack(side="left", padx=5)
+
+        frame = tk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+        cols = ("Ligne", "Valeur")
+        result_tree = ttk.Treeview(frame, columns=cols, show="tree headings")
+        result_tree.heading("#0", text="Doublon")
+        result_tree.column("#0", width=300)
+        result_tree.heading("Ligne", text="Ligne")
+        result_tree.column("Ligne", width=80, anchor="center")
+        result_tree.heading("Valeur", text="Valeur")
+        result_tree.column("Valeur", width=480)
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=result_tree.yview)
+        result_tree.configure(yscrollcommand=vsb.set)
+        result_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
+        DISPLAY_LIMIT = 2000 # Groupes affichés par type de doublon
+        for label, found in groups.items():
+            if not found:
+                continue
+            parent = result_tree.insert("", "end", text=f"{label} ({len(found)})", open=True)
+            for key, positions in itertools.islice(found.items(), DISPLAY_LIMIT):
+                shown = " / ".join(v for v in key if v) if label != "Ligne entière" else f"{len(positions)} lignes identiques"
+                node = result_tree.insert(parent, "end", text=shown, values=("", f"{len(positions)} lignes"))
+                for pos in positions:
+                    result_tree.insert(node, "end", text="", values=(pos + 1, ";".join(map(str, self.data[pos]))[:200]))
+
+        def on_double_click(event=None):
+            selection = result_tree.selection()
+            if selection:
+                line_num = result_tree.item(selection[0], "values")
+                if line_num and str(line_num[0]).isdigit():
+                    self.focus_row(int(line_num[0]) - 1)
+
+        result_tree.bind("<Double-1>", on_double_click)
+
+        if groups.get("Tagname"):
+            def renumber():
+                count = self._renumber_duplicate_tagnames(groups["Tagname"])
+                win.destroy()
+                messagebox.showinfo("Doublons", f"{count} Tagname(s) renuméroté(s).")
+            tk.Button(win, text="Renuméroter les Tagnames en double", bg=self.COLORS["warning"], fg="white",
+                      relief="flat", command=renumber).pack(anchor="e", padx=10, pady=(0, 10))
+
+    def _write_table_file(self, path, headers, first_line, data):
+        """
+        Écrit une table selon les règles de save_file (titres uniquement pour un varexp).
+        Lève une exception en cas d'échec.
+        """
+        # === 1. DONNÉES : écrites telles quelles (aucune colonne ajoutée à retirer) ===
+        data_to_save = list(data)
+
+        # === 2. GESTION DES TITRES (HEADERS) ===
+        headers_to_save = [] # Par défaut : VIDE (Pas de titres)
+        
+        filename_lower = os.path.basename(path).lower()
         
-        try:
-            # === 1. NETTOYAGE DES DONNÉES (Suppression colonne "Ligne") ===
-            # On travaille sur une copie pour ne pas modifier l'affichage
-            data_to_save = [list(row) for row in self.data]
+        # CONDITION : On ajoute les titres SEULEMENT si c'est un Varexp
+        if "varexp" in filename_lower:
+            # On récupère les titres (soit first_line, soit headers actuels)
+            raw_headers = list(first_line) if first_line else list(headers)
             
-            # On détecte si la colonne "Ligne" est présente (c'est toujours la colonne 0 si elle existe)
-            # On se base sur self.headers actuel pour le savoir
-            has_line_col = False
-            if self.headers and str(self.headers[0]) == "Ligne":
-                has_line_col = True
-            
-            # Si la colonne "Ligne" existe, on la retire des données
-            if has_line_col:
-                for row in data_to_save:
-                    if row: row.pop(0)
+            if raw_headers:
+                headers_to_save = raw_headers
 
-            # === 2. GESTION DES TITRES (HEADERS) ===
-            headers_to_save = [] # Par défaut : VIDE (Pas de titres)
+        # === 3. ÉCRITURE ===
+        save_ext = os.path.splitext(path)[1].lower()
+        
+        # A. Cas Excel
+        if save_ext == ".xlsx":
+            if pd is None:
+                raise RuntimeError("Pandas requis pour Excel.")
             
-            filename_lower = os.path.basename(path).lower()
+            df = pd.DataFrame(data_to_save)
             
-            # CONDITION : On ajoute les titres SEULEMENT si c'est un Varexp
-            if "varexp" in filename_lower:
-                # On récupère les titres (soit first_line, soit headers actuels)
-                raw_headers = list(self.first_line) if self.first_line else list(self.headers)
-                
-                # Si on a récupéré des titres, on doit aussi enlever "Ligne" s'il est dedans
-                if raw_headers:
-                    # Si le premier titre est "Ligne", on l'enlève
-                    if str(raw_headers[0]) == "Ligne":
-                        raw_headers.pop(0)
-                    # S'il reste des titres, on les garde pour la sauvegarde
-                    if raw_headers:
-                        headers_to_save = raw_headers
-
-            # === 3. ÉCRITURE ===
-            save_ext = os.path.splitext(path)[1].lower()
+            # Si on a des headers (donc c'est un varexp), on les met
+            if headers_to_save:
+                df.columns = headers_to_save
+                df.to_excel(path, index=False)
+            else:
+                # Sinon, on dit à Excel de ne pas mettre de header
+                df.to_excel(path, index=False, header=False)
             
-            # A. Cas Excel
-            if save_ext == ".xlsx":
-                if pd is None:
-                    messagebox.showerror("Erreur", "Pandas requis pour Excel.")
-                    return
-                
-                df = pd.DataFrame(data_to_save)
+        # B. Cas DAT / CSV
+        else:
+            delimiter = ',' if save_ext == '.dat' else ','
+            
+            with open(path, 'w', newline='', encoding='latin-1') as f:
+                writer = csv.writer(f, delimiter=delimiter, quotechar='"')
                 
-                # Si on a des headers (donc c'est un varexp), on les met
+                # On écrit les headers UNIQUEMENT si headers_to_save n'est pas vide
+                # (C'est-à-dire uniquement si c'est un varexp)
                 if headers_to_save:
-                    df.columns = headers_to_save
-                    df.to_excel(path, index=False)
-                else:
-                    # Sinon, on dit à Excel de ne pas mettre de header
-                    df.to_excel(path, index=False, header=False)
-                
-            # B. Cas DAT / CSV
-            else:
-                delimiter = ',' if save_ext == '.dat' else ','
+                    writer.writerow(headers_to_save)
                 
-                with open(path, 'w', newline='', encoding='latin-1') as f:
-                    writer = csv.writer(f, delimiter=delimiter, quotechar='"')
-                    
-                    # On écrit les headers UNIQUEMENT si headers_to_save n'est pas vide
-                    # (C'est-à-dire uniquement si c'est un varexp)
-                    if headers_to_save:
-                        writer.writerow(headers_to_save)
-                    
-                    # On écrit les données
-                    writer.writerows(data_to_save)
-
-            messagebox.showinfo("Succès", f"Fichier enregistré : {os.path.basename(path)}")
-            self.modified = False
-            self.current_file_path = path
-            self.root.title(f"Éditeur - {os.path.basename(path)}")
-
-        except Exception as e:
-            messagebox.showerror("Erreur", str(e))
+                # On écrit les données
+                writer.writerows(data_to_save)
 
     def close_all_popups(self):
         """
@@ -3304,6 +7425,10 @@ class DatEditor:
             return
 
         # 4. CAS FICHIER DONNÉES -> Chargement dans le tableau principal
+        # Le module affiché reste en cache (modifications comprises, avec sa pile d'annulation)
+        if self.current_module is not None:
+            self._stash_current_module()
+            self.undo_stack = []
         try:
             self.selected_folder = os.path.dirname(file_path)
             filename = os.path.basename(file_path)
@@ -3356,8 +7481,14 @@ class DatEditor:
                 self.headers = []
 
             # Finalisation Affichage
-            self.visible_columns = self.headers
+            self.data = RowStore(self.data)
+            self.selection = SelectionModel()
+            self.virtual_columns = {}
+            self.value_filters = {}
+            self.visible_columns = list(self.headers)
             self.filtered_indices = list(range(len(self.data)))
+            self.current_module = None
+            self._on_structure_changed()
             self.refresh_tree()
             
             self.root.title(f"Éditeur - {filename}")
@@ -3367,122 +7498,892 @@ class DatEditor:
             messagebox.showinfo("Ouverture", f"Fichier '{filename}' chargé dans l'éditeur.")
 
         except Exception as e:
+            if not isinstance(self.data, RowStore):
+                self.data = RowStore(self.data)
             messagebox.showerror("Erreur", f"Impossible d'ouvrir le fichier :\n{e}")
 
     # ================= SCROLLING FILES =================
-    def load_varexp(self):
+    def _load_module(self, key):
+        """Affiche un module : état gardé en cache (modifications, filtres, défilement) ou table du projet."""
         self.close_all_popups()
         if not self.selected_folder:
             messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
             return
-        if not self.check_unsaved_changes():
-            return
-        path = os.path.join(self.selected_folder, "varexp.dat")
-        if not os.path.exists(path):
-            messagebox.showerror("Erreur", f"Fichier varexp.dat non trouvé dans {self.selected_folder}")
+        if self.project is None or self.project.folder != self.selected_folder:
+            # Dossier changé (ex : fichier ouvert ailleurs) : nouveau projet
+            if not self._check_unsaved_modules():
+                return
+            self.open_project(self.selected_folder)
+        elif self.current_module is None:
+            if not self.check_unsaved_changes(): # Fichier quelconque ouvert hors module
+                return
+        else:
+            self._stash_current_module()
+
+        state = self.module_cache.get(key)
+        if state is None:
+            filename = self.MODULE_FILES[key]
+            path = os.path.join(self.selected_folder, filename)
+            if not os.path.exists(path):
+                messagebox.showerror("Erreur", f"Fichier {filename} non trouvé dans {self.selected_folder}")
+                return
+            try:
+                table = self.project.table(key)
+                if table is None: # Fichier apparu après l'ouverture du projet
+                    self.project.reload(key)
+                    table = self.project.table(key)
+            except Exception as e:
+                messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
+                return
+            state = ModuleState(key, path, table.headers, table.first_line, RowStore(table.data))
+            state.mtime, state.size, state.base = table.mtime, table.size, table.base
+            self.module_cache.put(state)
+        self._activate_module_state(state)
+
+    def _stash_current_module(self):
+        """Range la table affichée et l'état de sa vue dans le cache des modules."""
+        if self.current_module is None:
             return
-        self._load_file_generic(path=path, skip_first_line=True, button_key='varexp')
-        self.buttons['create_var'].config(state="normal")
-        self.buttons['create_event'].config(state="disabled")       # active création EVENT
-        self.buttons['create_exprv'].config(state="disabled")     # désactive création EXPRV
-        self.buttons['create_cyclic'].config(state="disabled")    # désactive création CYCLIC
-        self.buttons['create_vartreat'].config(state="disabled")
+        state = self.module_cache.peek(self.current_module)
+        if state is None:
+            path = os.path.join(self.project.folder if self.project else self.selected_folder,
+                                self.MODULE_FILES[self.current_module])
+            state = ModuleState(self.current_module, path, self.headers, self.first_line, self.data)
+        state.headers = self.headers
+        state.first_line = self.first_line
+        state.data = self.data
+        state.visible_columns = self.visible_columns
+        state.filtered_indices = self.filtered_indices
+        state.sort_state = self.sort_state
+        state.undo_stack = self.undo_stack
+        state.modified = self.modified
+        state.last_tagname = self.last_tagname
+        state.filters = [(cb.get(), entry.get()) for cb, entry in self._filter_widgets()]
+        state.logic_mode = self.logic_mode.get()
+        state.focus_idx = self._top_visible_position()
+        state.selection = self.selection
+        state.virtual_columns = self.virtual_columns
+        state.value_filters = self.value_filters
+        self.module_cache.put(state)
+
+    def _activate_module_state(self, state):
+        """Affiche un module du cache en restaurant filtres, tri, défilement, sélection et annulation."""
+        self.headers = state.headers
+        self.first_line = state.first_line
+        self.data = state.data
+        self.visible_columns = state.visible_columns
+        self.filtered_indices = state.filtered_indices
+        self.sort_state = state.sort_state
+        self.undo_stack = state.undo_stack
+        self.modified = state.modified
+        self.current_module = state.key
+        self.current_file_path = state.path
+        self.selection = state.selection
+        self.virtual_columns = state.virtual_columns
+        self.value_filters = state.value_filters
+        self.index.invalidate()
+        self.value_index.invalidate()
+
+        if state.last_tagname is None:
+            state.last_tagname = 0
+            col_tag = self.find_header("Tagname")
+            if col_tag:
+                idx = self.headers.index(col_tag)
+                for row in reversed(self.data):
+                    try:
+                        state.last_tagname = int(row[idx])
+                        break
+                    except (ValueError, IndexError):
+                        continue
+        self.last_tagname = state.last_tagname
 
-    def load_comm(self):
-        self.close_all_popups()
-        if not self.selected_folder:
-            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
+        for i, (combobox, entry) in enumerate(self._filter_widgets()):
+            combobox['values'] = self.visible_columns
+            entry.delete(0, tk.END)
+            if state.filters:
+                col, text = state.filters[i]
+                combobox.set(col)
+                entry.insert(0, text)
+            elif self.visible_columns:
+                combobox.current(0)
+        self.logic_mode.set(state.logic_mode)
+
+        self.refresh_tree(focus_idx=state.focus_idx)
+        children = self.tree.get_children()
+        if state.focus_idx is not None and state.focus_idx < len(self.filtered_indices):
+            iid = self._iid(self.filtered_indices[state.focus_idx])
+            if self.tree.exists(iid):
+                self.tree.yview_moveto(children.index(iid) / len(children))
+
+        self.highlight_module_button(state.key)
+        for module, button in self.MODULE_CREATE_BUTTONS.items():
+            self.buttons[button].config(state="normal" if module == state.key else "disabled")
+
+    def _filter_widgets(self):
+        return [(self.column_filter1, self.filter_entry1),
+                (self.column_filter2, self.filter_entry2),
+                (self.column_filter3, self.filter_entry3)]
+
+    def _top_visible_position(self):
+        """Position (dans filtered_indices) de la première ligne visible de l'arbre."""
+        children = self.tree.get_children()
+        if not children:
+            return None
+        top = children[min(len(children) - 1, int(self.tree.yview()[0] * len(children)))]
+        try:
+            return self.filtered_indices.index(self._row_index(top))
+        except ValueError:
+            return None
+
+    def _on_module_evicted(self, key):
+        """Module évincé du cache (non modifié) : sa table est aussi libérée dans le projet."""
+        if self.project:
+            self.project.drop(key)
+
+    def _check_unsaved_modules(self):
+        """Comme check_unsaved_changes, pour tous les modules modifiés gardés en mémoire."""
+        if self.current_module is None:
+            if not self.check_unsaved_changes():
+                return False
+        else:
+            self._stash_current_module()
+        dirty = self.module_cache.dirty()
+        if not dirty:
+            return True
+        names = ", ".join(os.path.basename(state.path) for state in dirty)
+        res = messagebox.askyesnocancel(
+            "Modifications non enregistrées",
+            f"Modules modifiés non enregistrés : {names}\nVoulez-vous tout enregistrer avant de continuer ?"
+        )
+        if res is None:  # Annuler
+            return False
+        elif res:
+            return self.save_all_modules()
+        return True
+
+    # ================= SURVEILLANCE DES FICHIERS DU PROJET =================
+    def _watch_project(self):
+        """Scrutation légère (date + taille) des fichiers du projet, sans API spécifique au système."""
+        try:
+            self._check_external_changes()
+        except Exception as e:
+            print(f"Surveillance des fichiers : {e}")
+        self.root.after(self.WATCH_INTERVAL_MS, self._watch_project)
+
+    def _check_external_changes(self):
+        project = self.project
+        if project is None or self.root.grab_current() is not None:
+            return # Pas de projet, ou fenêtre modale ouverte : on repasse plus tard
+        for key, filename in self.MODULE_FILES.items():
+            if key in self._watch_pending:
+                continue
+            state = self.module_cache.peek(key)
+            baseline = state if state is not None else project.loaded_table(key)
+            if baseline is None:
+                continue
+            try:
+                stat = os.stat(os.path.join(project.folder, filename))
+            except OSError:
+                continue # Fichier supprimé ou inaccessible : on garde la version en mémoire
+            if (stat.st_mtime, stat.st_size) == (baseline.mtime, baseline.size):
+                continue
+            if state is None:
+                project.reload(key) # Module jamais affiché : simple relecture
+                continue
+            self._watch_pending.add(key)
+            threading.Thread(target=self._read_external_change, args=(project, key, stat), daemon=True).start()
+
+    def _read_external_change(self, project, key, stat):
+        filename, _, skip_first_line, _ = project.specs[key]
+        try:
+            first_line, rows = read_dat_rows(os.path.join(project.folder, filename), skip_first_line)
+        except Exception as e:
+            print(f"Relecture impossible de {filename} : {e}")
+            first_line, rows = None, None
+        self.root.after(0, lambda: self._apply_external_changes(project, key, first_line, rows, stat))
+
+    def _rebase_module(self, state):
+        """Après enregistrement : la table en mémoire devient la nouvelle base de fusion."""
+        try:
+            stat = os.stat(state.path)
+        except OSError:
             return
-        if not self.check_unsaved_changes():
+        key_idx = key_column_index(state.headers, self._module_specs()[state.key][3])
+        state.base = keyed_row_hashes(state.data, key_idx)
+        state.mtime, state.size = stat.st_mtime, stat.st_size
+
+    def _apply_external_changes(self, project, key, first_line, rows, stat):
+        """Fusionne le nouveau contenu d'un fichier dans la table en mémoire (seules les lignes changées)."""
+        self._watch_pending.discard(key)
+        if project is not self.project or rows is None:
             return
-        path = os.path.join(self.selected_folder, "COMM.DAT")
-        if not os.path.exists(path):
-            messagebox.showerror("Erreur", f"Fichier COMM.DAT non trouvé dans {self.selected_folder}")
+        if key == self.current_module:
+            self._stash_current_module()
+        state = self.module_cache.peek(key)
+        if state is None:
+            project.reload(key) # Évincé entre-temps
             return
-        self._load_file_generic(path=path, force_headers=self.COMM_DEFAULT_HEADERS, skip_first_line=True, button_key='comm')
-        self.buttons['create_var'].config(state="disabled")       # désactive création VAREXP
-        self.buttons['create_event'].config(state="disabled")       # active création EVENT
-        self.buttons['create_exprv'].config(state="disabled")     # désactive création EXPRV
-        self.buttons['create_cyclic'].config(state="disabled")    # désactive création CYCLIC
-        self.buttons['create_vartreat'].config(state="disabled")
+
+        key_idx = key_column_index(state.headers, self._module_specs()[key][3])
+        mapping, conflicts, stats = merge_external_changes(state.base, state.data, rows, key_idx)
+        state.first_line = first_line
+        state.base = keyed_row_hashes(rows, key_idx)
+        state.mtime, state.size = stat.st_mtime, stat.st_size
+
+        if stats["added"] or stats["deleted"]:
+            # Positions décalées : on remappe la vue, l'historique d'annulation n'est plus applicable
+            first_new = len(state.data) - stats["added"]
+            state.filtered_indices = [mapping[i] for i in state.filtered_indices if i < len(mapping) and mapping[i] != -1]
+            state.filtered_indices.extend(range(first_new, len(state.data)))
+            state.focus_idx = None if state.focus_idx is None else min(state.focus_idx, max(0, len(state.filtered_indices) - 1))
+            del state.undo_stack[:]
+            self.cell_issues.pop(key, None)
+            self.lint_issues.pop(key, None)
+        elif stats["updated"]:
+            # Lignes remplacées sur place : une annulation rétablirait une valeur locale périmée
+            del state.undo_stack[:]
+        if stats["updated"] or stats["added"] or stats["deleted"]:
+            state.data.invalidate_folded()
+        if conflicts:
+            state.modified = True
+            module_issues = self.cell_issues.setdefault(key, {})
+            for pos, remote in conflicts.items():
+                local = state.data[pos]
+                if remote is None:
+                    column = state.visible_columns[0] if state.visible_columns else "Ligne"
+                    module_issues.setdefault(pos, {})[column] = "Conflit : ligne supprimée sur disque"
+                    continue
+                for c, h in enumerate(state.headers):
+                    local_val = local[c] if c < len(local) else ""
+                    remote_val = remote[c] if c < len(remote) else ""
+                    if local_val != remote_val:
+                        module_issues.setdefault(pos, {})[h] = f"Conflit, valeur sur disque : « {remote_val} »"
+
+        if key == self.current_module:
+            self._activate_module_state(state)
+        if any(stats.values()):
+            filename = self.MODULE_FILES[key]
+            self.status_var.set(
+                f"{filename} modifié sur disque : {stats['updated']} ligne(s) mise(s) à jour, "
+                f"{stats['added']} ajoutée(s), {stats['deleted']} supprimée(s), {stats['conflicts']} conflit(s)"
+            )
+            if conflicts:
+                messagebox.showwarning(
+                    "Changements externes",
+                    f"{filename} a été modifié par un autre outil.\n"
+                    f"{stats['conflicts']} ligne(s) modifiée(s) des deux côtés : la version de l'éditeur est conservée "
+                    f"et signalée en rouge."
+                )
+
+    def save_all_modules(self):
+        """Enregistre d'un coup tous les modules modifiés, chacun dans son fichier du projet."""
+        self._stash_current_module()
+        dirty = self.module_cache.dirty()
+        if not dirty:
+            messagebox.showinfo("Tout enregistrer", "Aucun module modifié.")
+            return True
+        original = self.current_module
+        saved, errors, blocked = [], [], []
+        for state in dirty:
+            if any(self._duplicate_groups(headers=state.headers, data=state.data).values()):
+                # Politique de doublons appliquée sur la table affichée (renumérotation, liste des doublons)
+                if state.key != self.current_module:
+                    self._stash_current_module()
+                    self._activate_module_state(state)
+                if not self._check_duplicates_before_save():
+                    blocked.append(os.path.basename(state.path))
+                    continue
+                self._stash_current_module()
+            try:
+                self._write_table_file(state.path, state.headers, state.first_line, state.data)
+            except Exception as e:
+                errors.append(f"{os.path.basename(state.path)} : {e}")
+                continue
+            state.modified = False
+            self._rebase_module(state)
+            self.references.clear_overlay(state.key)
+            saved.append(os.path.basename(state.path))
+            if state.key == self.current_module:
+                self.modified = False
+        if not blocked and original is not None and self.current_module != original:
+            self._stash_current_module()
+            previous = self.module_cache.get(original)
+            if previous is not None: # Sinon évincé (non modifié) : on reste sur le module affiché
+                self._activate_module_state(previous)
+        self.update_status_bar()
+        if blocked:
+            errors.append(f"Non enregistré(s) à cause des doublons : {', '.join(blocked)}")
+        if errors:
+            messagebox.showerror("Erreur", "Échec de l'enregistrement :\n" + "\n".join(errors))
+            return False
+        messagebox.showinfo("Succès", f"Modules enregistrés : {', '.join(saved)}")
+        return True
+
+    def on_close(self):
+        if self._check_unsaved_modules():
+            self.root.destroy()
+
+    def load_varexp(self):
+        self._load_module("varexp")
+
+    def load_comm(self):
+        self._load_module("comm")
 
     def load_event(self):
-        self.close_all_popups()
-        if not self.selected_folder:
-            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
+        self._load_module("event")
+
+    def load_exprv(self):
+        self._load_module("exprv")
+
+    def load_cyclic(self):
+        self._load_module("cyclic")
+
+    def load_vartreat(self):
+        self._load_module("vartreat")
+        
+    def find_header(self, name):
+        for h in self.headers:
+            if h.lower() == name.lower():
+                return h
+        return None
+
+    def _iid(self, real_index):
+        """iid Treeview d'une ligne : son identifiant stable (rid), pas sa position."""
+        return str(self.data.rid(real_index))
+
+    def _row_index(self, iid):
+        """Position actuelle dans self.data de la ligne d'iid donné."""
+        return self.data.position(int(iid))
+
+    # ================= SÉLECTION LOGIQUE =================
+    def _selected_positions(self):
+        """Positions des lignes sélectionnées parmi les lignes filtrées, dans l'ordre d'affichage."""
+        return self.selection.positions(self.data, self.filtered_indices)
+
+    def _sync_tree_selection(self):
+        """Reflète la sélection logique sur les lignes actuellement insérées dans le Treeview."""
+        selected = [iid for iid in self.tree.get_children() if int(iid) in self.selection]
+        self._pushed_selection = set(selected)
+        self.tree.selection_set(selected)
+        self.update_status_bar()
+
+    def _on_tree_click(self, event):
+        """Clic dans le tableau : Ctrl ajoute, Maj étend depuis l'ancre à travers toutes les lignes filtrées."""
+        row_id = self.tree.identify_row(event.y)
+        if not row_id:
             return
-        if not self.check_unsaved_changes():
+        rid = int(row_id)
+        shift = event.state & 0x0001
+        ctrl = event.state & 0x0004
+        if shift and self.selection.anchor is not None:
+            self.selection.select_range(self.data, self.filtered_indices, rid)
+            self._sync_tree_selection()
+            return "break"
+        self._additive_click = bool(ctrl)
+        self.selection.anchor = rid
+
+    def _on_tree_select(self, event=None):
+        current = set(self.tree.selection())
+        if current != self._pushed_selection:
+            # Sélection modifiée dans le Treeview (souris, clavier, code) : on la reprend
+            visible = [int(iid) for iid in self.tree.get_children()]
+            self.selection.sync_visible(visible, [int(iid) for iid in current], additive=self._additive_click)
+            self._pushed_selection = current
+        self._additive_click = False
+        self.update_status_bar()
+
+    def select_all_filtered(self):
+        """Sélectionne toutes les lignes du filtre courant, affichées ou non."""
+        self.selection.select_all(self.data, self.filtered_indices)
+        self._sync_tree_selection()
+        return "break"
+
+    def invert_selection(self):
+        self.selection.invert(self.data, self.filtered_indices)
+        self._sync_tree_selection()
+
+    def export_selection(self):
+        """
+        Exporte les lignes sélectionnées : CSV ';' avec les titres, ou .dat selon les règles
+        d'enregistrement du projet (',' et titres pour un varexp seulement), relisible tel quel.
+        """
+        positions = self._selected_positions()
+        if not positions:
+            messagebox.showinfo("Export", "Aucune ligne sélectionnée.")
             return
-        path = os.path.join(self.selected_folder, "EVENT.DAT")
-        if not os.path.exists(path):
-            messagebox.showerror("Erreur", f"Fichier EVENT.DAT non trouvé dans {self.selected_folder}")
+        path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("DAT", "*.dat")])
+        if not path:
             return
-        self._load_file_generic(path=path, force_headers=self.EVENT_DEFAULT_HEADERS, button_key='event')
-        self.buttons['create_var'].config(state="disabled")       # désactive création VAREXP
-        self.buttons['create_event'].config(state="normal")       # active création EVENT
-        self.buttons['create_exprv'].config(state="disabled")     # désactive création EXPRV
-        self.buttons['create_cyclic'].config(state="disabled")    # désactive création CYCLIC
-        self.buttons['create_vartreat'].config(state="disabled")
+        try:
+            if os.path.splitext(path)[1].lower() == ".dat":
+                self._write_table_file(path, self.headers, self.first_line, [self.data[p] for p in positions])
+            else:
+                with open(path, 'w', newline='', encoding='latin-1', errors='replace') as f:
+                    writer = csv.writer(f, delimiter=';')
+                    writer.writerow(self.headers)
+                    writer.writerows(self.data[p] for p in positions)
+            self.status_var.set(f"{len(positions)} lignes exportées vers {os.path.basename(path)}")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Export impossible :\n{e}")
+
+    # ================= INDEX (Nom / Tagname) =================
+    def _on_cell_changed(self, row_idx, col_idx, old_value, new_value):
+        """Point unique de notification après l'édition d'une cellule de self.data."""
+        self.index.cell_changed(row_idx, col_idx, old_value, new_value)
+        self.value_index.cell_changed(self.data.rid(row_idx), col_idx, old_value, new_value)
+        self.data.cell_changed(row_idx, col_idx)
+        self._revalidate_expression_cell(row_idx, col_idx, new_value)
+        self._relint_row(row_idx)
+
+    def _on_row_appended(self, row_idx):
+        """Point unique de notification après l'ajout d'une ligne en fin de self.data."""
+        row = self.data[row_idx]
+        self.index.row_appended(row_idx, row)
+        self.value_index.row_appended(self.data.rid(row_idx), row)
+        self._relint_row(row_idx)
+
+    def _on_structure_changed(self):
+        """Point unique de notification après insertion / suppression / remplacement de lignes."""
+        self.index.invalidate()
+        self.value_index.invalidate()
+        self.data.invalidate_folded()
+        # Les anomalies sont repérées par position : elles ne sont plus fiables
+        self.cell_issues.pop(self.current_module, None)
+        if self.lint_issues.pop(self.current_module, None) is not None and self._lint_pending is None:
+            # Contrôle du varexp actif : nouveau passage complet dès que l'interface est libre
+            self._lint_pending = self.current_module
+            self.root.after_idle(self._rerun_varexp_lint)
+
+    def is_duplicate_variable(self, var_name, path_elements=None):
+        """
+        Vrai si une ligne porte déjà ce Nom (et, si path_elements est fourni, la même branche n1..n11).
+        Seuls les candidats donnés par l'index Nom sont comparés : pas de parcours du tableau.
+        """
+        candidates = self.index.rows_for_name(var_name)
+        if not candidates or path_elements is None:
+            return bool(candidates)
+
+        n_indices = [self.headers.index(f"n{i}") if f"n{i}" in self.headers else -1 for i in range(1, 12)]
+        if all(idx == -1 for idx in n_indices):
+            return True
+
+        target = list(path_elements[:11]) + [""] * (11 - len(path_elements[:11]))
+        target = tuple("" if n_indices[k] == -1 else str(v).strip() for k, v in enumerate(target))
+        for r_idx in candidates:
+            row = self.data[r_idx]
+            row_path = tuple(str(row[idx]).strip() if idx != -1 and idx < len(row) else "" for idx in n_indices)
+            if row_path == target:
+                return True
+        return False
+
+    def focus_row(self, real_index):
+        """Centre la vue sur la ligne self.data[real_index] et la sélectionne."""
+        if real_index not in self.filtered_indices:
+            # La ligne est masquée par les filtres : on les réinitialise
+            self.reset_filters()
+        try:
+            pos = self.filtered_indices.index(real_index)
+        except ValueError:
+            return False
+        self.refresh_tree(focus_idx=pos)
+        iid = self._iid(real_index)
+        if self.tree.exists(iid):
+            self.tree.see(iid)
+            self.tree.selection_set(iid)
+            self.tree.focus(iid)
+        return True
 
-    def load_exprv(self):
-        self.close_all_popups()
-        if not self.selected_folder:
-            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
+    def open_goto_variable(self):
+        """Aller directement à une variable par son Nom ou son Tagname (lookup O(1))."""
+        if not self.data:
             return
-        if not self.check_unsaved_changes():
+        term = simpledialog.askstring("Aller à", "Nom ou Tagname de la variable :", parent=self.root)
+        if not term:
             return
-        path = os.path.join(self.selected_folder, "Exprv.DAT")
-        if not os.path.exists(path):
-            messagebox.showerror("Erreur", f"Fichier Exprv.DAT non trouvé dans {self.selected_folder}")
+        term = term.strip()
+
+        row_idx = self.index.row_for_tagname(term) if term.isdigit() else None
+        if row_idx is None:
+            rows = self.index.rows_for_name(term)
+            if rows:
+                row_idx = min(rows)
+                if len(rows) > 1:
+                    self.status_var.set(f"{len(rows)} lignes portent le nom '{term}' (première affichée).")
+
+        if row_idx is None:
+            messagebox.showinfo("Aller à", f"Aucune variable '{term}' trouvée.")
             return
-        self._load_file_generic(path=path, force_headers=self.EXPRV_DEFAULT_HEADERS, button_key='exprv')
-        self.buttons['create_var'].config(state="disabled")
-        self.buttons['create_event'].config(state="disabled")
-        self.buttons['create_exprv'].config(state="normal")
-        self.buttons['create_cyclic'].config(state="disabled")
-        self.buttons['create_vartreat'].config(state="disabled")
+        self.focus_row(row_idx)
 
-    def load_cyclic(self):
-        self.close_all_popups()
+    # ================= OÙ EST UTILISÉE (RÉFÉRENCES CROISÉES) =================
+    def _varexp_names(self, row, headers=None):
+        """Noms sous lesquels une ligne du varexp est référencée : chemin complet n1..n11 (sinon Nom)."""
+        headers = self.headers if headers is None else headers
+        path = []
+        for i in range(1, 12):
+            if f"n{i}" in headers:
+                idx = headers.index(f"n{i}")
+                val = str(row[idx]).strip() if idx < len(row) else ""
+                if val:
+                    path.append(val)
+        nom = ""
+        nom_col = next((h for h in headers if str(h).lower() == "nom"), None)
+        if nom_col:
+            idx = headers.index(nom_col)
+            nom = str(row[idx]).strip() if idx < len(row) else ""
+
+        names = set()
+        if path:
+            names.add(".".join(path))
+            if nom and path[-1] != nom:
+                names.add(".".join(path + [nom]))
+        elif nom:
+            names.add(nom)
+        return names
+
+    def open_where_used(self, row_id, col_name):
+        """Panneau listant toutes les références (event, exprv, cyclic, vartreat) à la variable cliquée."""
         if not self.selected_folder:
-            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
+            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier projet d'abord")
             return
-        if not self.check_unsaved_changes():
+
+        real_index = self._row_index(row_id)
+        row = self.data[real_index]
+        if self.current_module == "varexp":
+            names = self._varexp_names(row)
+        else:
+            col_idx = self.headers.index(col_name)
+            cell = str(row[col_idx]) if col_idx < len(row) else ""
+            names = set(ReferenceIndex.TOKEN_RE.findall(cell))
+        if not names:
+            messagebox.showinfo("Où est utilisée", "Aucun nom de variable dans la cellule sélectionnée.")
             return
-        path = os.path.join(self.selected_folder, "CYCLIC.DAT")
-        if not os.path.exists(path):
-            messagebox.showerror("Erreur", f"Fichier CYCLIC.DAT non trouvé dans {self.selected_folder}")
+
+        # Rafraîchissement incrémental (simple stat des fichiers si rien n'a changé)
+        self.references.set_folder(self.selected_folder)
+        self.references.refresh()
+        self._stash_current_module()
+        for state in self.module_cache.dirty():
+            self.references.set_overlay(state.key, state.data, state.headers)
+        hits = self.references.where_used(names)
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Où est utilisée : {', '.join(sorted(names))}")
+        win.geometry("900x450")
+        win.configure(bg=self.COLORS["bg_light"])
+
+        tk.Label(win, text=f"{len(hits)} référence(s) trouvée(s)", bg=self.COLORS["bg_light"],
+                 font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=5)
+
+        frame = tk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        result_tree = ttk.Treeview(frame, columns=("Module", "Ligne", "Colonne", "Reference"), show="headings")
+        result_tree.heading("Module", text="Module")
+        result_tree.column("Module", width=90, anchor="center")
+        result_tree.heading("Ligne", text="N° Ligne")
+        result_tree.column("Ligne", width=80, anchor="center")
+        result_tree.heading("Colonne", text="Colonne")
+        result_tree.column("Colonne", width=380)
+        result_tree.heading("Reference", text="Référence")
+        result_tree.column("Reference", width=300)
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=result_tree.yview)
+        result_tree.configure(yscrollcommand=vsb.set)
+        result_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
+        for key, r_idx, c_name, token in hits:
+            result_tree.insert("", "end", values=(key, r_idx + 1, c_name, token))
+
+        def on_double_click(event=None):
+            selection = result_tree.selection()
+            if not selection:
+                return
+            key, line_num = result_tree.item(selection[0], "values")[:2]
+            self.goto_module_row(key, int(line_num) - 1)
+
+        result_tree.bind("<Double-1>", on_double_click)
+
+    def goto_module_row(self, key, r_idx):
+        """Ouvre le module demandé (si besoin) puis centre la vue sur sa ligne r_idx."""
+        loaders = {
+            "varexp": self.load_varexp,
+            "comm": self.load_comm,
+            "event": self.load_event,
+            "exprv": self.load_exprv,
+            "cyclic": self.load_cyclic,
+            "vartreat": self.load_vartreat
+        }
+        if self.current_module != key:
+            loaders[key]()
+            if self.current_module != key:
+                return # Chargement annulé
+        if 0 <= r_idx < len(self.data):
+            self.focus_row(r_idx)
+
+    # ================= VALIDATION DES EXPRESSIONS =================
+    def _project_tables(self, keys, use_memory=True):
+        """
+        Données des modules demandés : {module: (headers, lignes)}.
+        Le module affiché et ceux gardés en cache sont pris en mémoire (modifications comprises),
+        les autres dans le projet chargé (ou sur disque à défaut).
+        use_memory=False : le module affiché n'est pas lu en mémoire (appel depuis un thread de fond).
+        """
+        specs = self._module_specs()
+        project = self.project if self.project and self.project.folder == self.selected_folder else None
+        tables = {}
+        for key in keys:
+            if use_memory and key == self.current_module:
+                tables[key] = (list(self.headers), list(self.data))
+                continue
+            if not self.selected_folder:
+                continue
+            state = self.module_cache.peek(key)
+            if state is not None and key != self.current_module:
+                tables[key] = (state.headers, state.data) # Module en cache, modifications comprises
+                continue
+            if project and key != self.current_module:
+                try:
+                    table = project.table(key)
+                except Exception as e:
+                    print(f"Lecture impossible de {self.MODULE_FILES[key]} : {e}")
+                    continue
+                if table is not None:
+                    tables[key] = (table.headers, table.data)
+                continue
+            filename, force_headers, skip_first_line, _ = specs[key]
+            path = os.path.join(self.selected_folder, filename)
+            if not os.path.exists(path):
+                continue
+            try:
+                _, rows = read_dat_rows(path, skip_first_line)
+            except Exception as e:
+                print(f"Lecture impossible de {path} : {e}")
+                continue
+            headers = force_headers or detect_dat_headers(rows, MODULE_SCHEMAS.get(key))
+            tables[key] = (headers, rows)
+        return tables
+
+    def _known_variable_names(self, varexp_table):
+        """Ensemble des noms de variables du varexp (chemins complets et Noms)."""
+        known = set()
+        if not varexp_table:
+            return known
+        headers, rows = varexp_table
+        nom_col = next((h for h in headers if str(h).lower() == "nom"), None)
+        nom_idx = headers.index(nom_col) if nom_col else -1
+        for row in rows:
+            if row is headers:
+                continue # Ligne de titres
+            known.update(self._varexp_names(row, headers))
+            if nom_idx != -1 and nom_idx < len(row) and row[nom_idx].strip():
+                known.add(row[nom_idx].strip())
+        return known
+
+    def _revalidate_expression_cell(self, row_idx, col_idx, new_value):
+        """Revalide une seule cellule "Expression" après édition (si une validation a déjà été faite)."""
+        if self._known_names is None or self.current_module not in self.EXPRESSION_COLUMNS:
             return
-        self._load_file_generic(path=path, force_headers=self.CYCLIC_DEFAULT_HEADERS, button_key='cyclic')
-        self.buttons['create_var'].config(state="disabled")
-        self.buttons['create_event'].config(state="disabled")
-        self.buttons['create_exprv'].config(state="disabled")
-        self.buttons['create_cyclic'].config(state="normal")
-        self.buttons['create_vartreat'].config(state="disabled")
+        col_name = self.headers[col_idx] if col_idx < len(self.headers) else None
+        if col_name not in self.EXPRESSION_COLUMNS[self.current_module]:
+            return
+        module_issues = self.cell_issues.setdefault(self.current_module, {})
+        messages = self.expr_parser.validate(new_value, self._known_names)
+        row_issues = module_issues.get(row_idx, {})
+        if messages:
+            row_issues[col_name] = messages[0]
+            module_issues[row_idx] = row_issues
+        else:
+            row_issues.pop(col_name, None)
+            if not row_issues:
+                module_issues.pop(row_idx, None)
+        self._refresh_issue_tag(row_idx)
+
+    def _refresh_issue_tag(self, row_idx):
+        """Met à jour le surlignage 'issue' d'une ligne affichée."""
+        iid = self._iid(row_idx)
+        if self.tree.exists(iid):
+            tags = [t for t in self.tree.item(iid, "tags") if t != 'issue']
+            if row_idx in self.cell_issues.get(self.current_module, {}):
+                tags.append('issue')
+            self.tree.item(iid, tags=tags)
+
+    # ================= CONTRÔLE DU VAREXP =================
+    def _merge_lint_issues(self, key, old, new):
+        """Remplace dans cell_issues les anomalies de contrôle old par new (autres anomalies conservées)."""
+        module_issues = self.cell_issues.setdefault(key, {})
+        for pos, cols in old.items():
+            row_issues = module_issues.get(pos)
+            if row_issues is None:
+                continue
+            for col in cols:
+                row_issues.pop(col, None)
+            if not row_issues:
+                del module_issues[pos]
+        for pos, cols in new.items():
+            module_issues.setdefault(pos, {}).update(cols)
+
+    def _run_varexp_lint(self):
+        """Passage complet des règles sur le varexp affiché ; retourne {ligne: {colonne: message}}."""
+        key = self.current_module
+        issues = self.varexp_linter.check_table(self.headers, self.data)
+        self._merge_lint_issues(key, self.lint_issues.get(key, {}), issues)
+        self.lint_issues[key] = issues
+        self.refresh_tree()
+        return issues
 
-    def load_vartreat(self):
-        self.close_all_popups()
-        if not self.selected_folder:
-            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
+    def _rerun_varexp_lint(self):
+        key, self._lint_pending = self._lint_pending, None
+        if key == self.current_module and self._current_schema() is MODULE_SCHEMAS["varexp"]:
+            self._run_varexp_lint()
+
+    def _relint_row(self, row_idx):
+        """Revalide une seule ligne après édition ou ajout (si le contrôle du varexp a été lancé)."""
+        module_lint = self.lint_issues.get(self.current_module)
+        if module_lint is None:
             return
-        if not self.check_unsaved_changes():
+        old = module_lint.pop(row_idx, {})
+        new = self.varexp_linter.check_row(self.headers, self.data[row_idx])
+        if new:
+            module_lint[row_idx] = new
+        self._merge_lint_issues(self.current_module, {row_idx: old}, {row_idx: new} if new else {})
+        self._refresh_issue_tag(row_idx)
+
+    def goto_next_issue(self, step=1):
+        """Sélectionne la ligne suivante (step=1) ou précédente (step=-1) portant une anomalie."""
+        module_issues = self.cell_issues.get(self.current_module)
+        if not module_issues:
+            self.status_var.set("Aucune anomalie.")
             return
-        path = os.path.join(self.selected_folder, "VARTREAT.DAT")
-        if not os.path.exists(path):
-            messagebox.showerror("Erreur", f"Fichier VARTREAT.DAT non trouvé dans {self.selected_folder}")
+        positions = sorted(module_issues)
+        current = -1
+        selection = self.tree.selection()
+        if selection:
+            try:
+                current = self._row_index(selection[0])
+            except (ValueError, KeyError):
+                pass
+        if step > 0:
+            target = positions[bisect.bisect_right(positions, current) % len(positions)]
+        else:
+            target = positions[bisect.bisect_left(positions, current) - 1]
+        self.focus_row(target)
+        self.update_status_bar()
+
+    def open_varexp_lint(self):
+        """Contrôle toutes les lignes du varexp affiché puis liste les anomalies (F8 : anomalie suivante)."""
+        if self._current_schema() is not MODULE_SCHEMAS["varexp"]:
+            messagebox.showwarning("Avertissement", "Veuillez d'abord ouvrir le varexp.")
             return
-        self._load_file_generic(path=path, force_headers=self.VARTREAT_DEFAULT_HEADERS, button_key='vartreat')
-        self.buttons['create_var'].config(state="disabled")
-        self.buttons['create_event'].config(state="disabled")
-        self.buttons['create_exprv'].config(state="disabled")
-        self.buttons['create_cyclic'].config(state="disabled")
-        self.buttons['create_vartreat'].config(state="normal")
-        
-    def find_header(self, name):
-        for h in self.headers:
-            if h.lower() == name.lower():
-                return h
-        return None
+        t0 = time.perf_counter()
+        issues = self._run_varexp_lint()
+        elapsed = time.perf_counter() - t0
+        count = sum(len(cols) for cols in issues.values())
+        self.status_var.set(f"Contrôle terminé : {count} anomalie(s) sur {len(issues)} ligne(s) en {elapsed:.2f} s.")
+
+        win = tk.Toplevel(self.root)
+        win.title("Contrôle du varexp")
+        win.geometry("1000x500")
+        win.configure(bg=self.COLORS["bg_light"])
+        tk.Label(win, text=f"{count} anomalie(s) sur {len(issues)} ligne(s) ({elapsed:.2f} s) - F8 / Maj+F8 : anomalie suivante / précédente",
+                 bg=self.COLORS["bg_light"], font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=5)
+
+        frame = tk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        cols = ("Ligne", "Colonne", "Valeur", "Message")
+        result_tree = ttk.Treeview(frame, columns=cols, show="headings")
+        widths = {"Ligne": 70, "Colonne": 180, "Valeur": 200, "Message": 450}
+        for c in cols:
+            result_tree.heading(c, text=c)
+            result_tree.column(c, width=widths[c], anchor="center" if c == "Ligne" else "w")
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=result_tree.yview)
+        result_tree.configure(yscrollcommand=vsb.set)
+        result_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
+        for pos in sorted(issues):
+            row = self.data[pos]
+            for col, message in issues[pos].items():
+                idx = self.headers.index(col)
+                result_tree.insert("", "end", values=(pos + 1, col, row[idx] if idx < len(row) else "", message))
+
+        def on_double_click(event=None):
+            selection = result_tree.selection()
+            if selection:
+                line_num = result_tree.item(selection[0], "values")[0]
+                self.focus_row(int(line_num) - 1)
+
+        result_tree.bind("<Double-1>", on_double_click)
+        win.bind("<F8>", lambda e: self.goto_next_issue())
+        win.bind("<Shift-F8>", lambda e: self.goto_next_issue(-1))
+
+    def open_expression_validation(self):
+        """Valide en lot toutes les expressions du projet (thread de fond) puis affiche les anomalies."""
+        if not self.selected_folder and self.current_module is None:
+            messagebox.showwarning("Avertissement", "Veuillez sélectionner un dossier d'abord")
+            return
+
+        self.status_var.set("Validation des expressions en cours...")
+        # Lecture des tables dans le thread principal pour le module affiché, sur disque pour les autres
+        current_snapshot = (self.current_module, list(self.headers), list(self.data))
+
+        def worker():
+            t0 = time.perf_counter()
+            keys = ["varexp"] + list(self.EXPRESSION_COLUMNS)
+            tables = {}
+            for key in keys:
+                if key == current_snapshot[0]:
+                    tables[key] = (current_snapshot[1], current_snapshot[2])
+            missing = [k for k in keys if k not in tables]
+            tables.update(self._project_tables(missing, use_memory=False))
+
+            known = self._known_variable_names(tables.pop("varexp", None))
+            issues = self.expr_parser.validate_tables(tables, known, self.EXPRESSION_COLUMNS)
+            elapsed = time.perf_counter() - t0
+            self.root.after(0, lambda: show_results(issues, known, elapsed, sum(len(r) for _, r in tables.values())))
+
+        def show_results(issues, known, elapsed, row_count):
+            self._known_names = known
+            self.cell_issues = {}
+            for key, r_idx, c_name, _, msg in issues:
+                self.cell_issues.setdefault(key, {}).setdefault(r_idx, {})[c_name] = msg
+            self.refresh_tree()
+            self.status_var.set(f"Validation terminée : {len(issues)} anomalie(s) en {elapsed:.2f} s.")
+            if not known:
+                messagebox.showwarning("Validation", "varexp.dat introuvable : les variables ne peuvent pas être vérifiées.")
+
+            win = tk.Toplevel(self.root)
+            win.title("Validation des expressions")
+            win.geometry("1100x500")
+            win.configure(bg=self.COLORS["bg_light"])
+            tk.Label(win, text=f"{len(issues)} anomalie(s) sur {row_count} lignes analysées ({elapsed:.2f} s)",
+                     bg=self.COLORS["bg_light"], font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=5)
+
+            frame = tk.Frame(win)
+            frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+            cols = ("Module", "Ligne", "Colonne", "Expression", "Message")
+            result_tree = ttk.Treeview(frame, columns=cols, show="headings")
+            widths = {"Module": 80, "Ligne": 70, "Colonne": 160, "Expression": 420, "Message": 350}
+            for c in cols:
+                result_tree.heading(c, text=c)
+                result_tree.column(c, width=widths[c], anchor="center" if c in ("Module", "Ligne") else "w")
+            vsb = ttk.Scrollbar(frame, orient="vertical", command=result_tree.yview)
+            result_tree.configure(yscrollcommand=vsb.set)
+            result_tree.pack(side="left", fill="both", expand=True)
+            vsb.pack(side="right", fill="y")
+
+            for key, r_idx, c_name, text, msg in issues:
+                result_tree.insert("", "end", values=(key, r_idx + 1, c_name, text, msg))
+
+            def on_double_click(event=None):
+                selection = result_tree.selection()
+                if selection:
+                    key, line_num = result_tree.item(selection[0], "values")[:2]
+                    self.goto_module_row(key, int(line_num) - 1)
+
+            result_tree.bind("<Double-1>", on_double_click)
+
+        threading.Thread(target=worker, daemon=True).start()
     
     # ================= CREATION EVENT / EXPRV / CYCLIC =================
     def open_create_generic(self, filetype):
@@ -3520,16 +8421,11 @@ class DatEditor:
                 return ""
             return ""
     
-        # Récupération des Noms existants
+        # Récupération des Noms existants (liste triée maintenue par l'index)
         name_col = self.find_header("Nom")
         existing_names = []
         if name_col:
-            name_idx = self.headers.index(name_col)
-            existing_names = sorted({
-                row[name_idx]
-                for row in self.data
-                if len(row) > name_idx and row[name_idx].strip()
-            })
+            existing_names = self.index.names()
     
         # Frame scrollable
         container = tk.Frame(win, bg="white")
@@ -3593,14 +8489,10 @@ class DatEditor:
             selected_name = existing_name_cb.get()
             if not selected_name or not name_col:
                 return
-            name_idx = self.headers.index(name_col)
-            model_row = None
-            for row in self.data:
-                if len(row) > name_idx and row[name_idx] == selected_name:
-                    model_row = row
-                    break
-            if not model_row:
+            rows = self.index.rows_for_name(selected_name)
+            if not rows:
                 return
+            model_row = self.data[min(rows)]
             for col, entry in entries.items():
                 if col in self.headers:
                     idx = self.headers.index(col)
@@ -3625,12 +8517,16 @@ class DatEditor:
                 if col in self.headers:
                     idx = self.headers.index(col)
                     new_row[idx] = entry.get().strip()
+
+            # Refus immédiat des doublons de Nom (index de hachage)
+            new_name = entries["Nom"].get().strip() if "Nom" in entries else ""
+            if new_name and self.index.has_name(new_name):
+                messagebox.showerror("Erreur", f"Le nom '{new_name}' existe déjà.", parent=win)
+                return
     
-            # Undo
-            self.undo_stack.append([(len(self.data), None)])
-    
-            # Ajout data
-            self.data.append(new_row)
+            # Ajout data + Undo
+            self.undo_stack.append([("insert", self.data.append(new_row))])
+            self._on_row_appended(len(self.data) - 1)
             self.modified = True
     
             # Update View
@@ -3691,9 +8587,9 @@ class DatEditor:
             dst_entries.append(e_dst)
 
         # --- Pré-remplissage intelligent ---
-        selected = self.tree.selection()
+        selected = self._selected_positions()
         if selected:
-            idx = int(selected[0])
+            idx = selected[0]
             row = self.data[idx]
             for i in range(11):
                 col_name = f"n{i+1}"
@@ -3756,17 +8652,8 @@ class DatEditor:
                 return
 
             # 2. Identification des colonnes n1..n11 et TagName
-            n_indices = []
-            col_found = False
-            for i in range(1, 12): 
-                found_idx = -1
-                possible_names = [f"n{i}", f"Chemin n{i}", f"N{i}", f"Level {i}"]
-                for name in possible_names:
-                    if name in self.headers:
-                        found_idx = self.headers.index(name)
-                        col_found = True
-                        break
-                n_indices.append(found_idx)
+            n_indices = level_column_indices(self.headers)
+            col_found = any(idx != -1 for idx in n_indices)
 
             if not col_found:
                 messagebox.showerror("Erreur", "Aucune colonne de niveau (n1..) trouvée dans le fichier.")
@@ -3850,6 +8737,7 @@ class DatEditor:
             # 5. Finalisation
             if count_copied > 0:
                 self.data.extend(new_rows)
+                self._on_structure_changed()
                 
                 # Mise à jour affichage
                 self.filtered_indices = list(range(len(self.data)))
@@ -3962,77 +8850,7 @@ class DatEditor:
                                   "104_WriteTimeTag", "104_MappingBit", "104_ReadTimeTag"]
         }
         
-        CATEGORY_DESCRIPTIONS = {
-                "Description": "Description de la variable",
-                "Inhibited": "Variable inhibée (I ou vide)",
-                "Simulated": "Variable simulée (S ou vide)",
-                "Saved": "Variable sauvegardée (P ou vide)",
-                "Broadcast": "Accès distant (0 ou 1)",
-                "PermanentScan" : "Scrutation permanente pour synoptique (tous postes = 0, poste serveur = 2, aucun = 1)",
-                "Recorder": "Variable magnétorisée (1 ou 0)", 
-                "Log0_1": "Variable consignée de 0 vers 1 (1 ou 0)", 
-                "Log1_0": "Variable consignée de 1 vers 0 (1 ou 0)", 
-                "WithInitialValue": "Variable avec valeur initiale (1 ou 0)",
-                "InitialValue": "Valeur initiale (float)",
-                "ServerListName": "Nom de la liste serveur", 
-                "ClientListName": "Nom de la liste client", 
-                "Source": "Source de la variable (Interne = I, OPCUA = U, SNMP = S, Equipement = E, ...)", 
-                "BrowsingLevel": "Niveau de recherche (entre 0 et 29)",
-                "AlarmAcknowledgmentLevel": "Niveau d'acquittement (entre 0 et 29)", 
-                "AlarmMaskLevel": "Niveau de masquage (entre 0 et 29)", 
-                "AlarmMaintenanceLevel": "Niveau de prise en compte (entre 0 et 29)", 
-                "Eqt_NetworkName": "Nom du réseau", 
-                "Eqt_EqtName": "Nom de l'équipement", 
-                "Eqt_FrameName": "Nom de la trame", 
-                "Eqt_Type": "Type de la trame (bit = B, mot = M, I, U)", 
-                "Eqt_Index": "Offset octet", 
-                "Eqt_IndexComp": "Offset bit", 
-                "Eqt_SizeBit": "Taille de la varible en bit (1 si B, 32 si M, 16 si I ou U)", 
-                "ExtBinary": "Enable les attributs étendus (0 ou vide)", 
-                "AlarmLevel": "Priorité (entre 0 et 29)", 
-                "AlarmActiveAt1": "Déclenchement Positive ou Négative (1 ou 0)", 
-                "AlarmTemporization": "Temporisation en secondes des alarmes (int)",
-                "Unit": "Unité de la mesure", 
-                "MinimumValue": "Valeur min", 
-                "MaximumValue": "Valeur max", 
-                "Format": "Format du rendu de la mesure", 
-                "ControlMinimumValue": "Valeur minimale de commande de registre", 
-                "ControlMaximumValue": "Valeur maximale de commande de registre",
-                "RegisterCommandLevel": "Niveau de commande de registre", 
-                "Counter_StepSize": "Valeur de pas (int)", 
-                "Counter_Type": "Type de compteur : Décrémental ou Incrémental (0 ou 1)", 
-                "Counter_CountBitName": "Variable état associé (nom)", 
-                "Counter_CountBitTransition": "Enclenchement de l'état associé (à 0 ou à 1)", 
-                "Counter_ResetBitName": "Variable bit d'initialisation (nom)", 
-                "Counter_ResetBitTransition": "Enclenchement du bit d'initialisation (à 0 ou à 1)",
-                "Chrono_Period": "Période d'incrémentation du chrono (100 = 1 sec, 6000 = 1 min, ...)", 
-                "Chrono_Type": "Type du chrono (1)", 
-                "Chrono_EnableBitName": "Variable de déclenchement (nom)", 
-                "Chrono_EnableBitTransition": "Enclenchement du chrono sur la variable de déclenchement à 1 ou 0 (1 ou 0)", 
-                "Chrono_ResetBitName": "Variable d'initialisation (nom)", 
-                "Chrono_ResetBitTransition": "Initialisation du chrono sur la variable d'initialisation à 1 ou 0 (1 ou 0)",
-                "ThresholdHysterisis": "Hysteresis (float)", 
-                "ThresholdValue": "Valeur de seuil (float)", 
-                "ThresholdHigh": "Seuil haut (1 ou 0)", 
-                "ThresholdSource": "Variable reliée au seuil", 
-                "ThresholdSystem": "Type de seuil (ppphaut|pphaut|phaut|haut = 0, pphaut|phaut|haut|bas = 1, phaut|haut|bas|pbas = 2, haut|bas|pbas|ppbas = 3 sinon 4)", 
-                "ThresholdTypeInSystem": "Type de variable seuil (de 0 à 3 du seuil le plus haut à celui le plus bas)",
-                "TextSize": "Taille maximum de la chaîne de caractère en octets (int)", 
-                "TextCommandLevel": "Niveau de commande (entre 0 et 29)",
-                "OPCUA_NetworkName": "Nom du réseau OPCUA", 
-                "OPCUA_ClientName": "Nom du client OPCUA", 
-                "OPCUA_MonitoringName": "Nom groupe de scrutation", 
-                "OPCUA_Identifier": "Identificateur de la variable sur le serveur OPCUA", 
-                "SNMP_NetworkName": "Nom du réseau SNMP", 
-                "SNMP_DeviceName": "Nom de l'équipement", 
-                "SNMP_ScanGroupName": "Nom du groupe de scrutation", 
-                "SNMP_DataType": "Type de données SNMP", 
-                "SNMP_OID": "OID SNMP", 
-                "SNMP_DisableReading": "Désactivation lecture (0 ou 1)", 
-                "SNMP_WithInitialValue": "SNMP avec valeur initiale (0 ou 1)", 
-                "SNMP_InitialValue": "Valeur Initiale (int ou vide)", 
-                "SNMP_RemoveNoPrintableCharacters": "Suppression des caractère spéciaux (0 ou 1)",
-                }
+        CATEGORY_DESCRIPTIONS = MODULE_SCHEMAS["varexp"].descriptions()
 
         def open_advanced():
             EXCLUDED_COLUMNS = {"Class", "Tagname", "Nom"} | {f"n{i}" for i in range(1, 13)}
@@ -4236,13 +9054,9 @@ class DatEditor:
         
             # ===================== CHARGEMENT MODELE =====================
             def extract_model_params(tagname):
-                tag_col = self.headers.index("Tagname")
-                model_row = None
-        
-                for row in self.data:
-                    if len(row) > tag_col and row[tag_col] == str(tagname):
-                        model_row = row
-                        break
+                # Recherche O(1) via l'index Tagname -> ligne
+                row_idx = self.index.row_for_tagname(tagname)
+                model_row = self.data[row_idx] if row_idx is not None else None
         
                 if not model_row:
                     messagebox.showerror("Erreur", f"Tagname {tagname} introuvable")
@@ -4309,7 +9123,7 @@ class DatEditor:
                 )
                 win.attributes('-topmost', False)
                 return
-            if not re.match(r'^[A-Za-z0-9_]+$', var_name):
+            if not VAREXP_NAME_RE.match(var_name):
                 win.attributes('-topmost', True)
                 messagebox.showerror(
                     "Erreur",
@@ -4324,7 +9138,7 @@ class DatEditor:
         
             # ----- Vérification des éléments de chemin -----
             for elem in raw_path:
-                if not re.match(r'^[A-Za-z0-9_]+$', elem):
+                if not VAREXP_NAME_RE.match(elem):
                     win.attributes('-topmost', True)
                     messagebox.showerror(
                         "Erreur",
@@ -4346,6 +9160,15 @@ class DatEditor:
                 )
                 win.attributes('-topmost', False)
                 return
+
+            # ----- Refus des doublons (lookup dans l'index Nom) -----
+            if self.is_duplicate_variable(var_name, path_elements):
+                win.attributes('-topmost', True)
+                messagebox.showerror(
+                    "Erreur", f"La variable '{var_name}' existe déjà sur cette branche.", parent=win
+                )
+                win.attributes('-topmost', False)
+                return
         
             # ===== Gestion des paramètres avancés =====
             if save_adv_var.get():
@@ -4392,7 +9215,17 @@ class DatEditor:
                   font=("Segoe UI", 11, "bold")
         ).pack(side='left', padx=20, expand=True)
 
-        # 2. Le bouton "Duplication de branche"
+        # 2. Le bouton "Création en lot" (feuille CSV / XLSX)
+        tk.Button(btn_frame,
+                  text="Création en lot...",
+                  command=self.open_bulk_variable_import,
+                  bg=self.COLORS["accent"],
+                  fg="white",
+                  relief="flat",
+                  font=("Segoe UI", 11, "bold")
+        ).pack(side='left', padx=20, expand=True)
+
+        # 3. Le bouton "Duplication de branche"
         tk.Button(btn_frame, 
                   text="Duplication de branche", 
                   command=self.open_duplicate_branch_window,
@@ -4402,6 +9235,134 @@ class DatEditor:
                   font=("Segoe UI", 11, "bold")
         ).pack(side='right', padx=20, expand=True) 
             
+    # Titres reconnus dans une feuille de création en lot (en minuscules)
+    BULK_CLASS_HEADERS = ("class", "classe")
+    BULK_NAME_HEADERS = ("nom", "name")
+
+    def _read_variable_sheet(self, path):
+        """
+        Lit une feuille de création en lot (1re ligne = titres : Class, Nom, n1..n11, colonnes avancées
+        portant le nom d'une colonne du varexp). Retourne (variables, erreurs) :
+        variables = [(n° de ligne, classe, nom, chemin, valeurs avancées)], erreurs = [(n° de ligne, message)].
+        """
+        rows = read_sheet_rows(path)
+        if not rows:
+            return [], [(1, "Feuille vide")]
+        titles = [str(t).strip() for t in rows[0]]
+        lowered = [t.lower() for t in titles]
+        class_idx = next((i for i, t in enumerate(lowered) if t in self.BULK_CLASS_HEADERS), -1)
+        name_idx = next((i for i, t in enumerate(lowered) if t in self.BULK_NAME_HEADERS), -1)
+        if class_idx == -1 or name_idx == -1:
+            return [], [(1, "Colonnes 'Class' et 'Nom' obligatoires dans la ligne de titres")]
+        level_idx = [lowered.index(f"n{i}") if f"n{i}" in lowered else -1 for i in range(1, 12)]
+        reserved = {class_idx, name_idx, *level_idx}
+        advanced = [(i, t) for i, t in enumerate(titles)
+                    if i not in reserved and t in self.headers and t.lower() != "tagname"]
+
+        variables, errors = [], []
+        seen = set()
+        for line, row in enumerate(rows[1:], start=2):
+            cell = lambda i: str(row[i]).strip() if 0 <= i < len(row) else ""
+            var_class, var_name = cell(class_idx).upper(), cell(name_idx)
+            if not var_class and not var_name:
+                continue # Ligne vide
+            path = [e for e in (cell(i) for i in level_idx) if e] # Niveaux vides ignorés, comme à la saisie
+            if var_class not in self.VAREXP_TEMPLATES:
+                errors.append((line, f"Classe inconnue : '{var_class}'"))
+                continue
+            if not VAREXP_NAME_RE.match(var_name):
+                errors.append((line, f"Nom de variable invalide : '{var_name}'"))
+                continue
+            bad = next((e for e in path if not VAREXP_NAME_RE.match(e)), None)
+            if bad is not None:
+                errors.append((line, f"Élément de chemin invalide : '{bad}'"))
+                continue
+            path_elements = path + [var_name]
+            key = (var_name, tuple(path))
+            if key in seen:
+                errors.append((line, f"'{var_name}' figure deux fois sur cette branche dans la feuille"))
+                continue
+            if self.is_duplicate_variable(var_name, path_elements):
+                errors.append((line, f"La variable '{var_name}' existe déjà sur cette branche"))
+                continue
+            seen.add(key)
+            adv_values = {t: cell(i) for i, t in advanced if cell(i)}
+            variables.append((line, var_class, var_name, path_elements, adv_values))
+        return variables, errors
+
+    def open_bulk_variable_import(self):
+        """
+        Création en lot de variables depuis une feuille CSV / XLSX : toutes les lignes sont validées
+        ensemble, reçoivent les valeurs du modèle de leur classe et un bloc contigu de Tagnames,
+        puis sont ajoutées avec une seule entrée d'annulation et un seul rafraîchissement.
+        """
+        if not self.headers:
+            messagebox.showwarning("Avertissement", "Veuillez d'abord ouvrir le varexp.")
+            return
+        path = filedialog.askopenfilename(
+            parent=self.root, title="Feuille de variables (Class ; Nom ; n1..n11 ; colonnes avancées)",
+            filetypes=[("Tables", "*.csv *.xlsx *.xls"), ("Tous", "*.*")])
+        if not path:
+            return
+        try:
+            variables, errors = self._read_variable_sheet(path)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de lire la feuille :\n{e}")
+            return
+
+        columns = self._variable_columns()
+        first_tag = max(self.get_last_tag_id(), self.index.max_tagname()) + 1
+        new_rows = [self._build_variable_row(columns, var_class, var_name, path_elements, adv_values, first_tag + k)
+                    for k, (_, var_class, var_name, path_elements, adv_values) in enumerate(variables)]
+        # Règles du contrôle du varexp : signalées, sans bloquer la création
+        warnings = self.varexp_linter.check_table(self.headers, new_rows)
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Création en lot - {os.path.basename(path)}")
+        win.geometry("800x500")
+        win.configure(bg="white")
+        win.transient(self.root)
+        summary = f"{len(new_rows)} variable(s) à créer"
+        if new_rows:
+            summary += f" (Tagnames {first_tag} à {first_tag + len(new_rows) - 1})"
+        summary += f", {len(errors)} ligne(s) rejetée(s), {len(warnings)} avertissement(s)"
+        tk.Label(win, text=summary, bg="white", font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=(10, 5))
+
+        frame = tk.Frame(win)
+        frame.pack(fill="both", expand=True, padx=10)
+        cols = ("Ligne", "Statut", "Message")
+        report = ttk.Treeview(frame, columns=cols, show="headings")
+        for c, w in (("Ligne", 70), ("Statut", 110), ("Message", 560)):
+            report.heading(c, text=c)
+            report.column(c, width=w, anchor="center" if c == "Ligne" else "w")
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=report.yview)
+        report.configure(yscrollcommand=vsb.set)
+        report.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        for line, message in errors:
+            report.insert("", "end", values=(line, "Rejetée", message))
+        for k, issues in sorted(warnings.items()):
+            line = variables[k][0]
+            for col, message in issues.items():
+                report.insert("", "end", values=(line, "Avertissement", f"{col} : {message}"))
+
+        def create():
+            win.destroy()
+            new_ids = self.data.extend(new_rows)
+            self.undo_stack.append([("insert", rid) for rid in new_ids])
+            self._on_structure_changed()
+            self.last_tagname = first_tag + len(new_rows) - 1
+            self.modified = True
+            self.filtered_indices = list(range(len(self.data)))
+            self.scroll_bottom()
+            self.status_var.set(f"{len(new_rows)} variable(s) créée(s).")
+
+        btns = tk.Frame(win, bg="white")
+        btns.pack(fill="x", padx=10, pady=10)
+        tk.Button(btns, text="Annuler", relief="flat", command=win.destroy).pack(side="right")
+        tk.Button(btns, text=f"Créer {len(new_rows)} variable(s)", bg=self.COLORS["success"], fg="white", relief="flat",
+                  state="normal" if new_rows else "disabled", command=create).pack(side="right", padx=5)
+
     def get_last_tag_id(self):
         """
         Renvoie le DERNIER ID trouvé en bas du tableau (sans ajouter +1).
@@ -4439,42 +9400,55 @@ class DatEditor:
         # 4. Retourner l'ID tel quel (ou le défaut)
         return last_id if last_id is not None else 99999
     
+    def _variable_columns(self):
+        """Index des colonnes utilisées pour construire une ligne de variable (calculés une fois par lot)."""
+        columns = {h: i for i, h in enumerate(self.headers)}
+        for i, h in enumerate(self.headers):
+            h_low = h.lower()
+            if h_low in ("nom", "class", "tagname"):
+                columns.setdefault(h_low, i)
+        return columns
+
+    def _build_variable_row(self, columns, var_class, var_name, path_elements, adv_values=None, tagname=None):
+        """Nouvelle ligne du varexp : Nom, Classe, chemin n1..n11, modèle de la classe, valeurs avancées, Tagname."""
+        new_row = [""] * len(self.headers)
+
+        # Remplissage Nom et Classe
+        if "nom" in columns: new_row[columns["nom"]] = var_name
+        if "class" in columns: new_row[columns["class"]] = var_class
+
+        # Remplissage n1..n11
+        for i, elem in enumerate(path_elements[:11]):
+            col_h = f"n{i+1}"
+            if col_h in columns:
+                new_row[columns[col_h]] = elem
+
+        # Templates par défaut
+        template = self.VAREXP_TEMPLATES.get(var_class, {})
+        for col, val in template.items():
+            if col in columns:
+                new_row[columns[col]] = val
+
+        # Valeurs avancées
+        if adv_values:
+            for col, val in adv_values.items():
+                if col in columns:
+                    new_row[columns[col]] = val
+
+        if tagname is not None and "tagname" in columns:
+            new_row[columns["tagname"]] = str(tagname)
+        return new_row
+
     def create_variable(self, var_class, var_name, path_elements, adv_values=None):
         try:
-            # Recherche des index de colonnes
-            col_name_idx = -1
-            col_class_idx = -1
-            col_tag_idx = -1
-            
-            for i, h in enumerate(self.headers):
-                h_low = h.lower()
-                if h_low == "nom": col_name_idx = i
-                elif h_low == "class": col_class_idx = i
-                elif h_low == "tagname": col_tag_idx = i
+            columns = self._variable_columns()
+            col_tag_idx = columns.get("tagname", -1)
+            new_row = self._build_variable_row(columns, var_class, var_name, path_elements, adv_values)
 
-            new_row = [""] * len(self.headers)
-            
-            # Remplissage Nom et Classe
-            if col_name_idx != -1: new_row[col_name_idx] = var_name
-            if col_class_idx != -1: new_row[col_class_idx] = var_class
-            
-            # Remplissage n1..n11
-            for i, elem in enumerate(path_elements[:11]):
-                col_h = f"n{i+1}"
-                if col_h in self.headers:
-                    new_row[self.headers.index(col_h)] = elem
-            
-            # Templates par défaut
-            template = self.VAREXP_TEMPLATES.get(var_class, {})
-            for col, val in template.items():
-                if col in self.headers:
-                    new_row[self.headers.index(col)] = val
-            
-            # Valeurs avancées
-            if adv_values:
-                for col, val in adv_values.items():
-                    if col in self.headers:
-                        new_row[self.headers.index(col)] = val
+            # Doublon : même Nom sur la même branche
+            if self.is_duplicate_variable(var_name, path_elements):
+                messagebox.showerror("Erreur Création", f"La variable '{var_name}' existe déjà sur cette branche.")
+                return False
             
             # === C'EST ICI LA CORRECTION IMPORTANTE ===
             if col_tag_idx != -1:
@@ -4492,6 +9466,7 @@ class DatEditor:
 
             # Ajout au tableau
             self.data.append(new_row)
+            self._on_row_appended(len(self.data) - 1)
             self.modified = True
             
             # Mise à jour affichage
@@ -4500,9 +9475,11 @@ class DatEditor:
             self.scroll_bottom()
             
             #messagebox.showinfo("Succès", f"Variable '{var_name}' créée (ID: {new_row[col_tag_idx]}).")
+            return True
 
         except Exception as e:
             messagebox.showerror("Erreur Création", f"Impossible de créer la variable :\n{e}")
+            return False
 
     # ================= COLONNES =================
     def select_columns(self):
@@ -4527,7 +9504,12 @@ class DatEditor:
                 var.set(False)
 
         def validate():
-            self.visible_columns[:] = [c for c, v in col_vars.items() if v.get()]
+            # Colonnes virtuelles prédéfinies cochées : enregistrées à la demande
+            for name, method in self.BUILTIN_VIRTUAL_COLUMNS.items():
+                if name in col_vars and col_vars[name].get() and name not in self.virtual_columns:
+                    self.virtual_columns[name] = getattr(self, method)
+            # Nouvelle liste : visible_columns peut être la liste des titres elle-même
+            self.visible_columns = [c for c, v in col_vars.items() if v.get()]
             self.refresh_tree()
             for combobox in [self.column_filter1, self.column_filter2, self.column_filter3]:
                 combobox['values'] = self.visible_columns
@@ -4549,6 +9531,13 @@ class DatEditor:
         frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
         canvas.configure(yscrollcommand=scrollbar.set)
 
+        # Colonnes virtuelles (lecture seule) en tête, puis les colonnes du fichier
+        virtual_names = list(self.virtual_columns)
+        virtual_names += [n for n in self.BUILTIN_VIRTUAL_COLUMNS if n not in self.virtual_columns and n not in self.headers]
+        for col in virtual_names:
+            var = tk.BooleanVar(value=(col in self.visible_columns))
+            tk.Checkbutton(frame, text=f"ƒ {col}", variable=var, bg="white", fg="#8e44ad").pack(anchor='w')
+            col_vars[col] = var
         for col in self.headers:
             if col and "unnamed" not in col.lower():
                 var = tk.BooleanVar(value=(col in self.visible_columns))
@@ -4556,6 +9545,100 @@ class DatEditor:
                 col_vars[col] = var
 
     # ================= FILTRAGE (OPTIMISÉ) =================
+    def _value_filter_positions(self):
+        """Positions admises par les filtres par valeurs (intersection entre colonnes), None si aucun."""
+        allowed = None
+        for col_name, values in self.value_filters.items():
+            if col_name not in self.headers:
+                continue
+            positions = self.value_index.positions(self.headers.index(col_name), values)
+            allowed = positions if allowed is None else allowed & positions
+        return allowed
+
+    def open_value_filter(self, col_name, x=None, y=None):
+        """Liste des valeurs distinctes de la colonne (avec leur nombre) à cocher pour filtrer."""
+        if col_name not in self.headers:
+            return # Colonne virtuelle : pas de dictionnaire de valeurs
+        counts = self.value_index.counts(self.headers.index(col_name))
+        all_values = sorted(counts, key=lambda v: (v != "", v.lower()))
+        current = self.value_filters.get(col_name)
+        checked = set(all_values) if current is None else set(current) & set(all_values)
+        DISPLAY_LIMIT = 2000
+
+        top = tk.Toplevel(self.root)
+        top.title(f"Filtrer : {col_name}")
+        top.transient(self.root)
+        top.configure(bg="white")
+        if x is not None:
+            top.geometry(f"320x420+{x}+{y}")
+
+        search_var = tk.StringVar()
+        tk.Entry(top, textvariable=search_var).pack(fill="x", padx=8, pady=(8, 4))
+        listbox = tk.Listbox(top, activestyle="none", font=("Consolas", 9))
+        listbox.pack(fill="both", expand=True, padx=8)
+        info_var = tk.StringVar()
+        tk.Label(top, textvariable=info_var, bg="white", fg="#7f8c8d", font=("Segoe UI", 8)).pack(anchor="w", padx=8)
+        shown = []
+
+        def label(value):
+            mark = "☑" if value in checked else "☐"
+            return f"{mark} {value if value else '(vide)'}  ({counts[value]})"
+
+        def fill():
+            needle = search_var.get().strip().lower()
+            shown[:] = [v for v in all_values if needle in v.lower()] if needle else all_values
+            listbox.delete(0, tk.END)
+            for value in shown[:DISPLAY_LIMIT]:
+                listbox.insert(tk.END, label(value))
+            info_var.set(f"{len(checked)} / {len(all_values)} valeur(s) cochée(s)"
+                         + (f" - {DISPLAY_LIMIT} premières affichées" if len(shown) > DISPLAY_LIMIT else ""))
+
+        def toggle(event):
+            k = listbox.nearest(event.y)
+            if not 0 <= k < min(len(shown), DISPLAY_LIMIT):
+                return "break"
+            value = shown[k]
+            checked.symmetric_difference_update({value})
+            listbox.delete(k)
+            listbox.insert(k, label(value))
+            info_var.set(f"{len(checked)} / {len(all_values)} valeur(s) cochée(s)")
+            return "break"
+
+        def set_shown(value):
+            # Agit sur les valeurs affichées par la recherche (comme Excel)
+            if value:
+                checked.update(shown)
+            else:
+                checked.difference_update(shown)
+            fill()
+
+        def apply():
+            if checked >= set(all_values):
+                self.value_filters.pop(col_name, None)
+            else:
+                self.value_filters[col_name] = set(checked)
+            top.destroy()
+            self.apply_filter()
+
+        def clear():
+            self.value_filters.pop(col_name, None)
+            top.destroy()
+            self.apply_filter()
+
+        listbox.bind("<Button-1>", toggle)
+        search_var.trace_add("write", lambda *a: fill())
+        btns = tk.Frame(top, bg="white")
+        btns.pack(fill="x", padx=8, pady=4)
+        tk.Button(btns, text="Tout cocher", relief="flat", command=lambda: set_shown(True)).pack(side="left")
+        tk.Button(btns, text="Tout décocher", relief="flat", command=lambda: set_shown(False)).pack(side="left", padx=4)
+        btns2 = tk.Frame(top, bg="white")
+        btns2.pack(fill="x", padx=8, pady=(0, 8))
+        tk.Button(btns2, text="OK", bg=self.COLORS["success"], fg="white", relief="flat", padx=12, command=apply).pack(side="right")
+        tk.Button(btns2, text="Effacer le filtre", relief="flat", command=clear).pack(side="right", padx=4)
+        top.bind("<Return>", lambda e: apply())
+        top.bind("<Escape>", lambda e: top.destroy())
+        fill()
+
     def reset_filters(self):
         # Vider les champs texte
         self.filter_entry1.delete(0, tk.END)
@@ -4567,7 +9650,8 @@ class DatEditor:
             if self.visible_columns:
                 cb.current(0)
     
-        # Désactiver le filtrage
+        # Désactiver le filtrage (filtres par valeurs compris)
+        self.value_filters = {}
         self.filtered_indices = list(range(len(self.data)))
         self.refresh_tree()
     
@@ -4583,6 +9667,14 @@ class DatEditor:
         active_filters = []
         for col_name, text in raw_filters:
             if col_name and text:
+                if col_name in self.virtual_columns:
+                    active_filters.append((col_name, text))
+                    continue
+                # Colonne numérique du schéma : "10..20", ">5", "<=3", "=0"...
+                in_range = parse_range_filter(text) if self._is_numeric_column(col_name) else None
+                if in_range is not None:
+                    active_filters.append((self.headers.index(col_name), in_range))
+                    continue
                 try:
                     idx = self.headers.index(col_name)
                     active_filters.append((idx, text))
@@ -4592,29 +9684,30 @@ class DatEditor:
         mode = self.logic_mode.get()
         new_filtered_indices = []
 
-        # 2. Si aucun filtre, on prend tout (plus rapide)
+        # Filtres par valeurs (titres) : union des listes de lignes de chaque valeur retenue
+        allowed = self._value_filter_positions()
+        candidates = range(len(self.data)) if allowed is None else sorted(allowed)
+
+        # 2. Si aucun filtre texte, on prend toutes les lignes admises (plus rapide)
         if not active_filters:
-            self.filtered_indices = list(range(len(self.data)))
+            self.filtered_indices = list(candidates)
             self.refresh_tree()
             return
 
-        # 3. Boucle optimisée sur les index entiers
-        for i, row in enumerate(self.data):
-            matches = []
-            for col_idx, text in active_filters:
-                # Vérification directe par index
-                if col_idx < len(row):
-                    val = str(row[col_idx]).lower()
-                    matches.append(text in val)
-                else:
-                    matches.append(False)
-            
-            if mode == "ET":
-                if all(matches):
-                    new_filtered_indices.append(i)
-            else: # OU
-                if any(matches):
-                    new_filtered_indices.append(i)
+        # 3. Boucle sur les colonnes normalisées (cache partagé, aucune chaîne temporaire)
+        # (colonne virtuelle : évaluée une fois sur toutes les lignes ; plage : masque sur le tableau numérique)
+        all_positions = range(len(self.data))
+        columns = []
+        for col_idx, text in active_filters:
+            if callable(text):
+                columns.append(([text(v) for v in self.data.numbers(col_idx)], None))
+                continue
+            columns.append(([RowStore.fold(v) for v in self.virtual_columns[col_idx](all_positions)]
+                            if col_idx in self.virtual_columns else self.data.folded(col_idx), text))
+        test = all if mode == "ET" else any # OU
+        for i in candidates:
+            if test(col[i] if text is None else text in col[i] for col, text in columns):
+                new_filtered_indices.append(i)
 
         self.filtered_indices = new_filtered_indices
         self.refresh_tree()